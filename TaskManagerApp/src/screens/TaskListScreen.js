@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { View, StyleSheet, FlatList, RefreshControl, Alert } from 'react-native';
 import { FAB, Text, Card, Title, Paragraph, Chip, Button, ActivityIndicator, Divider, Menu } from 'react-native-paper';
 import { useFocusEffect } from '@react-navigation/native';
@@ -13,7 +13,9 @@ const TaskListScreen = ({ navigation }) => {
   const [statusFilter, setStatusFilter] = useState('all');
   const [menuVisible, setMenuVisible] = useState(false);
   const [selectedTask, setSelectedTask] = useState(null);
-  const { getTasks, updateTask, deleteTask, loading, error } = useTaskService();
+  // Tasks and watermark of the last sync, so a refresh only loads what changed
+  const synced = useRef({ tasks: [], watermark: null });
+  const { syncTasks, updateTask, deleteTask, loading, error } = useTaskService();
   const { logout } = useAuthService();
 
   // Fetch tasks when screen is focused
@@ -26,8 +28,9 @@ const TaskListScreen = ({ navigation }) => {
   const fetchTasks = async () => {
     try {
       setRefreshing(true);
-      const data = await getTasks();
-      setTasks(data);
+      const result = await syncTasks(synced.current.tasks, synced.current.watermark);
+      synced.current = result;
+      setTasks(result.tasks);
     } catch (error) {
       console.error('Error fetching tasks:', error);
     } finally {
@@ -49,8 +49,62 @@ export const useTaskService = () => {
     setError(null);
     
     try {
-      const response = await api.get('/tasks');
-      return response.data;
+      // Follow the cursor so each response stays bounded
+      const tasks = [];
+      let nextToken = null;
+      do {
+        const response = await api.get('/tasks', {
+          params: nextToken ? { next_token: nextToken } : undefined,
+        });
+        tasks.push(...response.data.items);
+        nextToken = response.data.next_token;
+      } while (nextToken);
+      return tasks;
+    } catch (err) {
+      const errorMessage = err.response?.data?.message || 'Failed to fetch tasks';
+      setError(errorMessage);
+      throw err;
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
+  /**
+   * Bring a task list up to date with the changes made since a watermark
+   * @param {Task[]} tasks - List as of the watermark
+   * @param {string|null} watermark - Watermark of the last sync, null for a full sync
+   * @returns {Promise<{tasks: Task[], watermark: string}>}
+   */
+  const syncTasks = useCallback(async (tasks, watermark) => {
+    setLoading(true);
+    setError(null);
+    
+    try {
+      const byId = new Map(watermark ? tasks.map(task => [task.task_id, task]) : []);
+      let since = watermark;
+      let hasMore = true;
+      while (hasMore) {
+        let response;
+        try {
+          response = await api.get('/tasks/changes', {
+            params: since ? { since } : undefined,
+          });
+        } catch (err) {
+          // Deletes older than the server keeps: start over with a full sync
+          if (err.response?.status !== 410 || !since) {
+            throw err;
+          }
+          byId.clear();
+          since = null;
+          continue;
+        }
+        response.data.changes.forEach(task => byId.set(task.task_id, task));
+        response.data.deleted.forEach(({ task_id }) => byId.delete(task_id));
+        since = response.data.watermark;
+        hasMore = response.data.has_more;
+      }
+      const synced = [...byId.values()].sort((a, b) => (a.created_at || '').localeCompare(b.created_at || ''));
+      return { tasks: synced, watermark: since };
     } catch (err) {
       const errorMessage = err.response?.data?.message || 'Failed to fetch tasks';
       setError(errorMessage);
@@ -173,6 +227,7 @@ export const useTaskService = () => {
     loading,
     error,
     getTasks,
+    syncTasks,
     getTaskById,
     createTask,
     updateTask,
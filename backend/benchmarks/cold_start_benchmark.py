@@ -0,0 +1,385 @@
+"""
+Cold-start benchmark of the Lambda handlers, one fresh process per start
+
+Every sample starts a new interpreter the way Lambda starts a new execution
+environment: the handler module is imported (init), invoked once (first
+request) and then a few more times (warm requests). Imports are recorded with
+-X importtime and their self time summed per top-level package, for the init
+phase and the first request, showing what each handler loads and when.
+
+With DynamoDB Local (--endpoint) the tables are seeded once by this process
+and the first request of every sample includes importing boto3 and building
+its client. With moto, the default, each process starts moto after its init
+phase; moto imports botocore itself, so the first request then leaves that
+import out.
+
+--site-packages runs the processes on a directory holding only what a
+function is deployed with, instead of the development packages installed
+here (PyJWT imports cryptography whenever it is installed, for one):
+
+    pip install -t .lambda-packages -r requirements-lambda.txt \
+        -r requirements-auth.txt boto3==1.26.129
+    python benchmarks/cold_start_benchmark.py --site-packages .lambda-packages
+
+Example:
+    python benchmarks/cold_start_benchmark.py --runs 10 --output cold-start.json
+"""
+# The sampled processes run this module too, so at the top it only imports
+# what the Lambda runtime has loaded before the handler; the rest is imported
+# where it is used
+import json
+import os
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARK_DIR, '..')
+sys.path.insert(0, BACKEND_DIR)
+
+# Handler modules, the functions of serverless.yml
+HANDLERS = {
+    'register': 'src_backup.auth.register',
+    'login': 'src_backup.auth.login',
+    'get_tasks': 'src_backup.tasks.get_tasks',
+    'create_task': 'src_backup.tasks.create_task',
+    'get_task': 'src_backup.tasks.get_task',
+    'update_task': 'src_backup.tasks.update_task',
+    'delete_task': 'src_backup.tasks.delete_task',
+    'batch_tasks': 'src_backup.tasks.batch_tasks',
+    'get_stats': 'src_backup.tasks.get_stats',
+    'search_tasks': 'src_backup.tasks.search_tasks'
+}
+
+# Passed from this process to the sampled ones
+FIXTURES_VARIABLE = 'COLD_START_FIXTURES'
+EXTRA_PATH_VARIABLE = 'COLD_START_EXTRA_PATH'
+
+# Written to stderr around the phases, between the -X importtime lines
+INIT_STARTED_MARKER = 'cold-start: init started'
+INIT_DONE_MARKER = 'cold-start: init done'
+SETUP_DONE_MARKER = 'cold-start: setup done'
+FIRST_DONE_MARKER = 'cold-start: first request done'
+RESULT_PREFIX = 'cold-start result: '
+
+PASSWORD = 'benchmark-password'
+
+def lambda_environment(name, args):
+    """
+    Get the environment of a sampled process, as Lambda would set it
+    """
+    environment = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith('PYTHON')
+    }
+    environment.update({
+        'AWS_LAMBDA_FUNCTION_NAME': name,
+        'AWS_EXECUTION_ENV': f'AWS_Lambda_python{sys.version_info[0]}.{sys.version_info[1]}',
+        'LAMBDA_TASK_ROOT': os.path.abspath(BACKEND_DIR),
+        'PYTHONHASHSEED': '0',
+        'STORAGE_BACKEND': 'dynamodb',
+        'INVOCATION_METRICS': 'false',
+        'JWT_SECRET': os.environ.get('JWT_SECRET', 'benchmark-secret'),
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'benchmark'),
+        'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    })
+    if args.site_packages:
+        import site
+        environment['PYTHONPATH'] = os.path.abspath(args.site_packages)
+        # moto is only imported after the init phase
+        environment[EXTRA_PATH_VARIABLE] = os.pathsep.join(site.getsitepackages())
+    return environment
+
+def table_environment(prefix):
+    """
+    Get the table name variables of a benchmark run
+    """
+    return {
+        variable: prefix + name for variable, name in [
+            ('USERS_TABLE', 'Users'), ('USERNAMES_TABLE', 'Usernames'), ('TASKS_TABLE', 'Tasks'),
+            ('TASK_STATS_TABLE', 'TaskStats'), ('TASK_SEARCH_TABLE', 'TaskSearch'),
+            ('TASK_TOMBSTONES_TABLE', 'TaskTombstones')
+        ]
+    }
+
+def seed_fixtures(task_count, with_user):
+    """
+    Store what the sampled requests read straight into the tables
+    
+    Args:
+        task_count: Tasks to store, the first one is read and updated and the
+            others are deleted
+        with_user: Store credentials too, needed by login only since other
+            handlers just verify a token
+    
+    Returns:
+        dict: username, token and task_ids
+    """
+    import uuid
+    import jwt
+    from src_backup.db import get_table, USERNAMES_TABLE, TASKS_TABLE
+    from src_backup.tasks.indexes import with_index_keys
+    from src_backup.tasks.model import new_task
+    from src_backup.tasks.search_index import update_index
+    
+    user_id = str(uuid.uuid4())
+    username = f'cold-{uuid.uuid4().hex[:12]}'
+    if with_user:
+        import bcrypt
+        password = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        get_table(USERNAMES_TABLE).put_item(Item={'username': username, 'user_id': user_id, 'password': password})
+    
+    token = jwt.encode(
+        {'user_id': user_id, 'username': username, 'exp': int(time.time()) + 3600},
+        os.environ['JWT_SECRET'], algorithm='HS256'
+    )
+    tasks = [
+        new_task(user_id, f'Seeded task {index}', 'Seeded by the cold-start benchmark', 'todo')
+        for index in range(task_count)
+    ]
+    with get_table(TASKS_TABLE).batch_writer() as batch:
+        for task in tasks:
+            batch.put_item(Item=with_index_keys(task))
+    update_index(user_id, [(None, task) for task in tasks])
+    task_ids = [task['task_id'] for task in tasks]
+    return {'username': username, 'token': token, 'task_ids': task_ids}
+
+def make_event(token=None, body=None, path=None, query=None):
+    """
+    Build an API Gateway proxy event
+    """
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return {
+        'headers': headers,
+        'body': json.dumps(body) if body is not None else None,
+        'pathParameters': path,
+        'queryStringParameters': query
+    }
+
+def request(name, index, fixtures):
+    """
+    Get the event of one request to a handler and its expected status
+    """
+    import uuid
+    
+    token = fixtures['token']
+    task_id = fixtures['task_ids'][0]
+    if name == 'register':
+        username = f'cold-{uuid.uuid4().hex[:12]}'
+        return make_event(body={'username': username, 'email': f'{username}@example.com', 'password': PASSWORD}), 201
+    if name == 'login':
+        return make_event(body={'username': fixtures['username'], 'password': PASSWORD}), 200
+    if name == 'get_tasks':
+        return make_event(token), 200
+    if name == 'create_task':
+        return make_event(token, body={'title': f'Cold-start task {index}'}), 201
+    if name == 'get_task':
+        return make_event(token, path={'id': task_id}), 200
+    if name == 'update_task':
+        return make_event(token, body={'title': f'Updated task {index}'}, path={'id': task_id}), 200
+    if name == 'delete_task':
+        return make_event(token, path={'id': fixtures['task_ids'][index + 1]}), 204
+    if name == 'batch_tasks':
+        return make_event(token, body={'operations': [{'action': 'create', 'title': f'Batch task {index}'}]}), 200
+    if name == 'get_stats':
+        return make_event(token), 200
+    return make_event(token, query={'q': 'seeded'}), 200
+
+def sample(name, warm_requests):
+    """
+    Take one sample, in a fresh process started by run_sample
+    
+    Prints the result as JSON on stdout.
+    """
+    import importlib
+    
+    print(INIT_STARTED_MARKER, file=sys.stderr, flush=True)
+    started = time.perf_counter()
+    handler = importlib.import_module(HANDLERS[name]).lambda_handler
+    init_ms = (time.perf_counter() - started) * 1000
+    print(INIT_DONE_MARKER, file=sys.stderr, flush=True)
+    
+    fixtures = json.loads(os.environ[FIXTURES_VARIABLE]) if FIXTURES_VARIABLE in os.environ else None
+    if fixtures is None:
+        # moto keeps its tables in this process, so they are seeded here,
+        # after the init phase, and the handlers' client is dropped after
+        for path in filter(None, os.environ.get(EXTRA_PATH_VARIABLE, '').split(os.pathsep)):
+            sys.path.append(path)
+        import boto3
+        from moto import mock_aws
+        from src_backup import db
+        from src_backup.setup import create_dynamodb_tables
+        mock_aws().start()
+        create_dynamodb_tables()
+        fixtures = seed_fixtures(warm_requests + 2, with_user=name == 'login')
+        db.reset()
+        boto3.DEFAULT_SESSION = None
+    print(SETUP_DONE_MARKER, file=sys.stderr, flush=True)
+    
+    latencies = []
+    for index in range(warm_requests + 1):
+        event, expected_status = request(name, index, fixtures)
+        request_started = time.perf_counter()
+        response = handler(event, None)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if index == 0:
+            print(FIRST_DONE_MARKER, file=sys.stderr, flush=True)
+        if response['statusCode'] != expected_status:
+            raise RuntimeError(f"{name} returned {response['statusCode']}: {response.get('body')}")
+    
+    import resource
+    import statistics
+    
+    print(RESULT_PREFIX + json.dumps({
+        'init_ms': init_ms,
+        'first_request_ms': latencies[0],
+        'warm_request_ms': statistics.median(latencies[1:]) if warm_requests else None,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }), flush=True)
+
+def parse_import_times(stderr):
+    """
+    Sum the -X importtime self times per top-level package and phase
+    
+    Imports made while a sample seeds moto are left out.
+    
+    Returns:
+        tuple: ({package: ms} of the init phase, {package: ms} of the first request)
+    """
+    init, first_request = {}, {}
+    times = None
+    for line in stderr.splitlines():
+        if line == INIT_STARTED_MARKER:
+            times = init
+        elif line == INIT_DONE_MARKER:
+            times = None
+        elif line == SETUP_DONE_MARKER:
+            times = first_request
+        elif line == FIRST_DONE_MARKER:
+            break
+        elif times is not None and line.startswith('import time:'):
+            fields = line[len('import time:'):].split('|')
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue
+            package = fields[2].strip().split('.')[0]
+            times[package] = times.get(package, 0.0) + int(fields[0]) / 1000
+    return init, first_request
+
+def run_sample(name, args, fixtures=None):
+    """
+    Start a fresh process taking one sample of a handler
+    
+    Returns:
+        dict: Timings of the sample and its import times per package
+    """
+    import subprocess
+    
+    environment = lambda_environment(name, args)
+    environment.update(table_environment(args.table_prefix))
+    if args.endpoint:
+        environment['DYNAMODB_ENDPOINT'] = args.endpoint
+        environment[FIXTURES_VARIABLE] = json.dumps(fixtures)
+    
+    command = [sys.executable, '-X', 'importtime']
+    if args.site_packages:
+        # Leave out the site-packages of this interpreter
+        command.append('-S')
+    command += [os.path.abspath(__file__), '--sample', name, str(args.warm_requests)]
+    process = subprocess.run(command, env=environment, capture_output=True, text=True, cwd=BACKEND_DIR)
+    
+    results = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if process.returncode != 0 or not results:
+        raise RuntimeError(f"{name} sample failed:\n{process.stderr[-2000:]}")
+    result = json.loads(results[-1][len(RESULT_PREFIX):])
+    result['init_imports'], result['first_request_imports'] = parse_import_times(process.stderr)
+    return result
+
+def summarize(samples, top_imports):
+    """
+    Get the medians of a handler's samples and its slowest imports
+    """
+    import statistics
+    
+    def median(key):
+        values = [sample[key] for sample in samples if sample[key] is not None]
+        return round(statistics.median(values), 2) if values else None
+    
+    def slowest(key):
+        packages = {}
+        for sample in samples:
+            for package, ms in sample[key].items():
+                packages.setdefault(package, []).append(ms)
+        medians = {package: statistics.median(times + [0.0] * (len(samples) - len(times))) for package, times in packages.items()}
+        ranked = sorted(medians.items(), key=lambda item: item[1], reverse=True)
+        return {package: round(ms, 2) for package, ms in ranked[:top_imports]}
+    
+    return {
+        'samples': len(samples),
+        'init_ms': median('init_ms'),
+        'first_request_ms': median('first_request_ms'),
+        'warm_request_ms': median('warm_request_ms'),
+        'max_rss_mb': median('max_rss_mb'),
+        'init_imports': slowest('init_imports'),
+        'first_request_imports': slowest('first_request_imports')
+    }
+
+def main():
+    import argparse
+    import uuid
+    
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--handlers', nargs='+', choices=sorted(HANDLERS), default=list(HANDLERS),
+                        help='handlers to sample')
+    parser.add_argument('--runs', type=int, default=5, help='cold starts sampled per handler')
+    parser.add_argument('--warm-requests', type=int, default=5, help='requests after the first, per sample')
+    parser.add_argument('--endpoint', help='DynamoDB Local URL instead of moto')
+    parser.add_argument('--site-packages', help='directory holding the deployed dependencies only')
+    parser.add_argument('--top-imports', type=int, default=5, help='packages listed per phase')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    
+    args.table_prefix = f"cold-{uuid.uuid4().hex[:8]}-" if args.endpoint else ''
+    tables = {}
+    if args.endpoint:
+        os.environ.update(table_environment(args.table_prefix))
+        os.environ['DYNAMODB_ENDPOINT'] = args.endpoint
+        os.environ.setdefault('JWT_SECRET', 'benchmark-secret')
+        from src_backup.setup import create_dynamodb_tables
+        tables = create_dynamodb_tables()
+    
+    results = {}
+    try:
+        for name in args.handlers:
+            print(f"Sampling {name}...", file=sys.stderr)
+            samples = []
+            # The first process only writes the bytecode caches
+            for run in range(args.runs + 1):
+                fixtures = None
+                if args.endpoint:
+                    fixtures = seed_fixtures(args.warm_requests + 2, with_user=name == 'login')
+                result = run_sample(name, args, fixtures)
+                if run:
+                    samples.append(result)
+            results[name] = summarize(samples, args.top_imports)
+    finally:
+        for table in tables.values():
+            table.delete()
+    
+    print(f"{'handler':<13} {'init ms':>9} {'first ms':>9} {'warm ms':>9} {'rss MB':>8}  slowest init imports (ms)")
+    for name, summary in results.items():
+        imports = ', '.join(f'{package} {ms:.1f}' for package, ms in summary['init_imports'].items())
+        print(f"{name:<13} {summary['init_ms']:>9.2f} {summary['first_request_ms']:>9.2f} "
+              f"{summary['warm_request_ms'] or 0:>9.2f} {summary['max_rss_mb']:>8.1f}  {imports}")
+    
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--sample']:
+        # Parsed by hand, argparse would be loaded before the handler
+        sample(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
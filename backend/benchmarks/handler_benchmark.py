@@ -0,0 +1,413 @@
+"""
+End-to-end benchmark of every Lambda handler against a local DynamoDB
+
+Drives register, login, create_task, get_tasks, get_task, get_stats,
+update_task and delete_task in-process, the way API Gateway invokes them,
+for one user seeded with each dataset size. Reports p50/p99 latency,
+DynamoDB calls per request and peak memory per endpoint, and exits with
+status 1 when a result crosses the thresholds file.
+
+Tables live in moto's in-memory DynamoDB (pip install "moto[dynamodb]") unless --endpoint points to
+DynamoDB Local (docker run -p 8001:8000 amazon/dynamodb-local), where the
+run creates its own tables and deletes them afterwards.
+
+Example:
+    python benchmarks/handler_benchmark.py --sizes 10 1000 100000 \
+        --thresholds benchmarks/thresholds.json --output results.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+
+DEFAULT_THRESHOLDS = os.path.join(BENCHMARK_DIR, 'thresholds.json')
+
+ENDPOINTS = [
+    'register', 'login', 'create_task', 'get_tasks',
+    'get_task', 'get_stats', 'update_task', 'delete_task'
+]
+
+def configure_environment(args):
+    """
+    Point the handlers at the benchmark tables before src_backup is imported
+    """
+    os.environ['STORAGE_BACKEND'] = 'dynamodb'
+    os.environ['INVOCATION_METRICS'] = 'false'
+    os.environ['TASK_CACHE'] = 'true' if args.cache else 'false'
+    os.environ.setdefault('JWT_SECRET', 'benchmark-secret')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    if args.endpoint:
+        os.environ['DYNAMODB_ENDPOINT'] = args.endpoint
+        prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+        for variable, name in [
+            ('USERS_TABLE', 'Users'), ('USERNAMES_TABLE', 'Usernames'), ('TASKS_TABLE', 'Tasks'),
+            ('TASK_STATS_TABLE', 'TaskStats'), ('TASK_SEARCH_TABLE', 'TaskSearch'),
+            ('TASK_TOMBSTONES_TABLE', 'TaskTombstones')
+        ]:
+            os.environ[variable] = prefix + name
+
+def start_local_dynamodb():
+    """
+    Start moto's in-memory DynamoDB
+    """
+    try:
+        from moto import mock_aws
+    except ImportError:
+        # moto < 5
+        from moto import mock_dynamodb as mock_aws
+    mock = mock_aws()
+    mock.start()
+    return mock
+
+class PeakMemory:
+    """
+    Trace a call's peak memory, with pauses for allocations to leave out
+    
+    tracemalloc cannot pause, so a pause stops tracing and keeps what was
+    still allocated as a base the peaks after it are added to. Memory freed
+    after a pause is still counted, which only overstates the peak.
+    """
+    
+    def __init__(self):
+        self.peak = 0
+        self.base = 0
+    
+    def start(self):
+        self.peak = 0
+        self.base = 0
+        tracemalloc.start()
+    
+    def pause(self):
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.peak = max(self.peak, self.base + peak)
+        self.base += current
+    
+    def resume(self):
+        tracemalloc.start()
+    
+    def stop(self):
+        """
+        Returns:
+            float: Peak traced memory in KB
+        """
+        self.pause()
+        return self.peak / 1024
+
+def untraced_moto_copies(memory):
+    """
+    Keep moto's DynamoDB table copies out of the traced memory
+    
+    moto's TransactWriteItems deep-copies every table it touches, and a
+    cancelled transaction keeps the copy as the table. Real DynamoDB does
+    neither in the handler's process, so those copies are made untraced.
+    
+    Args:
+        memory: PeakMemory of the measured calls
+    """
+    import copy
+    from moto.dynamodb import models
+    
+    class UntracedCopy:
+        @staticmethod
+        def deepcopy(value, memo=None):
+            if not tracemalloc.is_tracing():
+                return copy.deepcopy(value, memo)
+            memory.pause()
+            try:
+                return copy.deepcopy(value, memo)
+            finally:
+                memory.resume()
+    
+    models.copy = UntracedCopy
+
+def settle_heap():
+    """
+    Collect garbage and leave every object alive so far out of later collections
+    
+    moto keeps every table in the benchmark's own heap, so a full collection
+    started inside a timed call walks all of it and shows up as a p99 spike
+    of the handler. Real DynamoDB holds no tables in the handler's process.
+    """
+    gc.collect()
+    gc.freeze()
+
+class CallCounter:
+    """
+    Count the DynamoDB API calls made by the shared client
+    """
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def __call__(self, **kwargs):
+        self.calls += 1
+
+def percentile(values, pct):
+    """
+    Get a percentile using the nearest-rank method
+    """
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def make_event(token=None, body=None, path=None, query=None):
+    """
+    Build an API Gateway proxy event
+    """
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return {
+        'headers': headers,
+        'body': json.dumps(body) if body is not None else None,
+        'pathParameters': path,
+        'queryStringParameters': query
+    }
+
+def seed_tasks(user_id, count):
+    """
+    Store count tasks for a user straight into the tables
+    
+    Tasks are batch written with their index keys and the counters rebuilt,
+    the state the handlers would leave after creating them one by one.
+    
+    Returns:
+        list: IDs of the seeded tasks
+    """
+    from src_backup.db import batch_write, TASKS_TABLE
+    from src_backup.tasks.indexes import with_index_keys
+    from src_backup.tasks.model import new_task, VALID_STATUSES
+    from src_backup.tasks.stats import reconcile_stats
+    
+    task_ids = []
+    requests = []
+    for index in range(count):
+        task = new_task(user_id, f'Seeded task {index}', 'Seeded by the handler benchmark', VALID_STATUSES[index % 3])
+        task_ids.append(task['task_id'])
+        requests.append({'PutRequest': {'Item': with_index_keys(task)}})
+    unprocessed = batch_write(TASKS_TABLE, requests)
+    if unprocessed:
+        raise RuntimeError(f"{len(unprocessed)} seeded task(s) could not be written")
+    reconcile_stats([user_id])
+    return task_ids
+
+class Benchmark:
+    """
+    Run every endpoint against one seeded user and collect its samples
+    """
+    
+    def __init__(self, handlers, counter, args):
+        self.handlers = handlers
+        self.counter = counter
+        self.args = args
+        self.memory = PeakMemory()
+        if not args.endpoint:
+            untraced_moto_copies(self.memory)
+        self.samples = {endpoint: {'latencies': [], 'calls': [], 'peaks': []} for endpoint in ENDPOINTS}
+    
+    def invoke(self, endpoint, event, expected_status, measure_memory):
+        """
+        Invoke one handler, recording its latency, DynamoDB calls and memory
+        
+        Returns:
+            dict: Parsed response body
+        """
+        handler = self.handlers[endpoint]
+        calls_before = self.counter.calls
+        if measure_memory:
+            self.memory.start()
+            response = handler(event, None)
+            self.samples[endpoint]['peaks'].append(self.memory.stop())
+        else:
+            if not self.samples[endpoint]['latencies']:
+                settle_heap()
+            started = time.perf_counter()
+            response = handler(event, None)
+            self.samples[endpoint]['latencies'].append((time.perf_counter() - started) * 1000)
+            self.samples[endpoint]['calls'].append(self.counter.calls - calls_before)
+        
+        if response['statusCode'] != expected_status:
+            raise RuntimeError(f"{endpoint} returned {response['statusCode']}: {response.get('body')}")
+        return json.loads(response['body']) if response.get('body') else None
+    
+    def repeat(self, endpoint, count, make_call):
+        """
+        Run an endpoint count times, the first warmup calls measuring memory
+        
+        Args:
+            make_call: Callable taking the call index and returning
+                (event, expected status)
+        """
+        for index in range(self.args.warmup + count):
+            event, expected_status = make_call(index)
+            self.invoke(endpoint, event, expected_status, measure_memory=index < self.args.warmup)
+    
+    def run(self, size):
+        requests = self.args.requests
+        auth_requests = min(self.args.auth_requests, requests)
+        password = 'benchmark-password'
+        
+        usernames = []
+        
+        def register(index):
+            usernames.append(f'bench-{uuid.uuid4().hex[:12]}')
+            return make_event(body={
+                'username': usernames[-1], 'email': f'{usernames[-1]}@example.com', 'password': password
+            }), 201
+        self.repeat('register', auth_requests, register)
+        
+        tokens = []
+        
+        def login(index):
+            return make_event(body={'username': usernames[index % len(usernames)], 'password': password}), 200
+        for index in range(self.args.warmup + auth_requests):
+            event, expected_status = login(index)
+            body = self.invoke('login', event, expected_status, measure_memory=index < self.args.warmup)
+            tokens.append(body['token'])
+        token = tokens[-1]
+        user_id = body['user']['user_id']
+        
+        seeded_ids = seed_tasks(user_id, size)
+        rng = random.Random(size)
+        created_ids = []
+        
+        def create_task(index):
+            return make_event(token, body={'title': f'Benchmark task {index}', 'description': 'Created by the benchmark'}), 201
+        for index in range(self.args.warmup + requests):
+            event, expected_status = create_task(index)
+            body = self.invoke('create_task', event, expected_status, measure_memory=index < self.args.warmup)
+            created_ids.append(body['task_id'])
+        
+        self.repeat('get_tasks', requests, lambda index: (make_event(token), 200))
+        self.repeat('get_task', requests, lambda index: (
+            make_event(token, path={'id': rng.choice(seeded_ids or created_ids)}), 200
+        ))
+        self.repeat('get_stats', requests, lambda index: (make_event(token), 200))
+        self.repeat('update_task', requests, lambda index: (
+            make_event(token, body={'title': f'Updated task {index}', 'status': 'in_progress'},
+                       path={'id': rng.choice(seeded_ids or created_ids)}), 200
+        ))
+        # Delete what the benchmark created, so the dataset keeps its size
+        self.repeat('delete_task', requests, lambda index: (
+            make_event(token, path={'id': created_ids[index]}), 204
+        ))
+    
+    def summary(self):
+        """
+        Get p50/p99 latency, calls per request and peak memory per endpoint
+        """
+        results = {}
+        for endpoint, samples in self.samples.items():
+            latencies = samples['latencies']
+            results[endpoint] = {
+                'requests': len(latencies),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'dynamodb_calls': round(sum(samples['calls']) / len(samples['calls']), 2),
+                'peak_kb': round(max(samples['peaks']), 1) if samples['peaks'] else None
+            }
+        return results
+
+def check_thresholds(results, thresholds):
+    """
+    Compare results with the configured limits
+    
+    Args:
+        results: Dataset size to endpoint summaries
+        thresholds: Endpoint to {metric: limit}; limits apply to every size
+    
+    Returns:
+        list: Human-readable violations
+    """
+    violations = []
+    for size, summary in results.items():
+        for endpoint, metrics in summary.items():
+            for metric, limit in thresholds.get(endpoint, {}).items():
+                value = metrics.get(metric)
+                if value is not None and value > limit:
+                    violations.append(f"{size} tasks, {endpoint}: {metric} {value} > {limit}")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000],
+                        help='tasks seeded per user, one run per size')
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per endpoint')
+    # Registration and login hash with bcrypt, so they get fewer requests
+    parser.add_argument('--auth-requests', type=int, default=10, help='measured register/login requests')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured calls per endpoint, used for memory')
+    parser.add_argument('--endpoint', help='DynamoDB Local URL instead of moto')
+    parser.add_argument('--cache', action='store_true', help='keep the read-through task cache on')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS, help='JSON limits per endpoint')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    
+    configure_environment(args)
+    mock = None if args.endpoint else start_local_dynamodb()
+    
+    from src_backup import db
+    from src_backup.auth import login, register
+    from src_backup.setup import create_dynamodb_tables
+    from src_backup.tasks import create_task, delete_task, get_stats, get_task, get_tasks, update_task
+    
+    handlers = {
+        'register': register.lambda_handler,
+        'login': login.lambda_handler,
+        'create_task': create_task.lambda_handler,
+        'get_tasks': get_tasks.lambda_handler,
+        'get_task': get_task.lambda_handler,
+        'get_stats': get_stats.lambda_handler,
+        'update_task': update_task.lambda_handler,
+        'delete_task': delete_task.lambda_handler
+    }
+    
+    tables = create_dynamodb_tables()
+    counter = CallCounter()
+    db.get_dynamodb().meta.client.meta.events.register('before-call.dynamodb', counter)
+    
+    results = {}
+    try:
+        for size in args.sizes:
+            print(f"Benchmarking with {size} tasks per user...", file=sys.stderr)
+            benchmark = Benchmark(handlers, counter, args)
+            benchmark.run(size)
+            results[size] = benchmark.summary()
+    finally:
+        if args.endpoint:
+            for table in tables.values():
+                table.delete()
+        if mock is not None:
+            mock.stop()
+    
+    print(f"{'tasks':>7} {'endpoint':<12} {'p50 ms':>9} {'p99 ms':>9} {'ddb calls':>10} {'peak KB':>9}")
+    for size, summary in results.items():
+        for endpoint, metrics in summary.items():
+            print(f"{size:>7} {endpoint:<12} {metrics['p50_ms']:>9.2f} {metrics['p99_ms']:>9.2f} "
+                  f"{metrics['dynamodb_calls']:>10.2f} {metrics['peak_kb'] or 0:>9.1f}")
+    
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as source:
+            thresholds = json.load(source)
+    violations = check_thresholds(results, thresholds)
+    for violation in violations:
+        print(f"Regression: {violation}")
+    sys.exit(1 if violations else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Compare the per-function Lambda layout with the single ASGI Lambda
+
+Replays the same mixed request workload against every deployed layout and
+reports p50/p99 latency per endpoint. When the CloudWatch log groups of a
+layout are given, cold starts are counted from the invocation records that
+src_backup.metrics.track_invocation writes.
+
+Example:
+    python benchmarks/layout_benchmark.py \
+        --layout per-function=https://abc.execute-api.us-east-1.amazonaws.com \
+        --layout unified=https://xyz.execute-api.us-east-1.amazonaws.com \
+        --log-groups unified=/aws/lambda/task-management-system-api-prod-api \
+        --requests 500 --bursts 5 --idle 600
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Relative weight of every endpoint in the replayed workload
+WORKLOAD = [
+    ('get_tasks', 40),
+    ('get_stats', 15),
+    ('get_task', 20),
+    ('create_task', 10),
+    ('update_task', 10),
+    ('delete_task', 5)
+]
+
+COLD_START_PATTERN = '{ $.metric = "invocation" && $.cold_start IS TRUE }'
+
+def request(base_url, method, path, token=None, body=None):
+    """
+    Send one request and time it
+    
+    Returns:
+        tuple: (status code, parsed body or None, latency in ms)
+    """
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(base_url.rstrip('/') + path, data=data, method=method)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            status, raw = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    latency_ms = (time.perf_counter() - started) * 1000
+    
+    try:
+        payload = json.loads(raw) if raw else None
+    except ValueError:
+        payload = None
+    return status, payload, latency_ms
+
+def sign_up(base_url):
+    """
+    Register and log in a throwaway benchmark user
+    
+    Returns:
+        str: Bearer token
+    """
+    username = f'bench-{uuid.uuid4().hex[:12]}'
+    password = uuid.uuid4().hex
+    request(base_url, 'POST', '/auth/register', body={'username': username, 'password': password})
+    status, payload, _ = request(base_url, 'POST', '/auth/login', body={'username': username, 'password': password})
+    if status != 200:
+        raise RuntimeError(f'Login failed on {base_url}: {status} {payload}')
+    return payload['token']
+
+def run_operation(base_url, token, operation, task_ids):
+    """
+    Run one workload operation
+    
+    Returns:
+        tuple: (operation, status code, latency in ms)
+    """
+    if operation in ('get_task', 'update_task', 'delete_task') and not task_ids:
+        operation = 'create_task'
+    
+    if operation == 'get_tasks':
+        status, _, latency = request(base_url, 'GET', '/tasks', token)
+    elif operation == 'get_stats':
+        status, _, latency = request(base_url, 'GET', '/tasks/stats', token)
+    elif operation == 'create_task':
+        status, payload, latency = request(base_url, 'POST', '/tasks', token, {'title': 'Benchmark task'})
+        if status == 201:
+            task_ids.append(payload['task_id'])
+    elif operation == 'get_task':
+        status, _, latency = request(base_url, 'GET', f'/tasks/{random.choice(task_ids)}', token)
+    elif operation == 'update_task':
+        status, _, latency = request(base_url, 'PUT', f'/tasks/{random.choice(task_ids)}', token,
+                                     {'status': random.choice(['todo', 'in_progress', 'completed'])})
+    else:
+        task_id = task_ids.pop(random.randrange(len(task_ids)))
+        status, _, latency = request(base_url, 'DELETE', f'/tasks/{task_id}', token)
+    return operation, status, latency
+
+def count_cold_starts(log_groups, start_ms, end_ms):
+    """
+    Count cold-start invocation records in CloudWatch Logs
+    
+    Returns:
+        int: Cold starts logged between start_ms and end_ms
+    """
+    import boto3
+    
+    logs = boto3.client('logs')
+    total = 0
+    for log_group in log_groups:
+        kwargs = {
+            'logGroupName': log_group,
+            'filterPattern': COLD_START_PATTERN,
+            'startTime': start_ms,
+            'endTime': end_ms
+        }
+        while True:
+            response = logs.filter_log_events(**kwargs)
+            total += len(response.get('events', []))
+            if 'nextToken' not in response:
+                break
+            kwargs['nextToken'] = response['nextToken']
+    return total
+
+def percentile(values, pct):
+    """
+    Get a percentile using the nearest-rank method
+    """
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def benchmark_layout(name, base_url, args, log_groups):
+    """
+    Replay the workload against one layout
+    
+    Returns:
+        dict: Latency summary and cold-start count for the layout
+    """
+    rng = random.Random(args.seed)
+    operations, weights = zip(*WORKLOAD)
+    plan = rng.choices(operations, weights=weights, k=args.requests)
+    
+    started_ms = int(time.time() * 1000)
+    token = sign_up(base_url)
+    task_ids = []
+    samples = []
+    errors = 0
+    
+    per_burst = max(1, len(plan) // args.bursts)
+    for burst_start in range(0, len(plan), per_burst):
+        if burst_start and args.idle:
+            # Let idle containers be reclaimed, like real traffic gaps
+            time.sleep(args.idle)
+        burst = plan[burst_start:burst_start + per_burst]
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for operation, status, latency in pool.map(
+                lambda op: run_operation(base_url, token, op, task_ids), burst
+            ):
+                samples.append((operation, latency))
+                if status >= 500:
+                    errors += 1
+    ended_ms = int(time.time() * 1000)
+    
+    latencies = [latency for _, latency in samples]
+    summary = {
+        'layout': name,
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(statistics.median(latencies), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'endpoints': {}
+    }
+    for operation in operations:
+        values = [latency for op, latency in samples if op == operation]
+        if values:
+            summary['endpoints'][operation] = {
+                'count': len(values),
+                'p50_ms': round(statistics.median(values), 1),
+                'p99_ms': round(percentile(values, 99), 1)
+            }
+    if log_groups:
+        cold_starts = count_cold_starts(log_groups, started_ms, ended_ms + 60000)
+        summary['cold_starts'] = cold_starts
+        summary['cold_starts_per_1000'] = round(cold_starts * 1000 / len(samples), 2)
+    return summary
+
+def parse_pairs(values):
+    """
+    Parse repeated name=value arguments
+    """
+    pairs = {}
+    for value in values or []:
+        name, _, rest = value.partition('=')
+        pairs[name] = rest
+    return pairs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--layout', action='append', required=True,
+                        help='name=base_url of a deployed layout (repeatable)')
+    parser.add_argument('--log-groups', action='append',
+                        help='name=group[,group...] CloudWatch log groups of a layout (repeatable)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per layout')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--bursts', type=int, default=1, help='split the requests into bursts')
+    parser.add_argument('--idle', type=float, default=0, help='seconds to wait between bursts')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='print the raw results as JSON')
+    args = parser.parse_args()
+    
+    log_groups = {name: groups.split(',') for name, groups in parse_pairs(args.log_groups).items()}
+    results = [
+        benchmark_layout(name, base_url, args, log_groups.get(name))
+        for name, base_url in parse_pairs(args.layout).items()
+    ]
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    for result in results:
+        cold = result.get('cold_starts_per_1000', 'n/a')
+        print(f"{result['layout']}: {result['requests']} requests, {result['errors']} errors, "
+              f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, cold starts/1000: {cold}")
+        for operation, stats in result['endpoints'].items():
+            print(f"  {operation:<12} n={stats['count']:<5} p50 {stats['p50_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms")
+
+if __name__ == '__main__':
+    main()
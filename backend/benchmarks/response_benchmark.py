@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of the JSON response encoder on large task lists
+
+Times src_backup.responses.create_success_response against the previous
+plain json.dumps response for task lists shaped like DynamoDB results
+(numbers as Decimal). orjson is used by the encoder when it is installed;
+run once with and once without it to compare.
+
+Example:
+    python benchmarks/response_benchmark.py --sizes 100 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src_backup import responses
+
+def make_tasks(count):
+    """
+    Build a task list like the Tasks table returns through boto3
+    """
+    return [
+        {
+            'task_id': f'01890a5d-ac96-774b-bcce-{index:012x}',
+            'user_id': '5b0c3a56-6f0d-4a35-9a2e-2b8f3f6a1c11',
+            'title': f'Task number {index}',
+            'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3,
+            'status': ('todo', 'in_progress', 'completed')[index % 3],
+            'created_at': '2024-05-01T10:00:00.000000',
+            'updated_at': '2024-05-02T11:30:00.000000',
+            'version': Decimal(index % 7 + 1)
+        }
+        for index in range(count)
+    ]
+
+def legacy_response(data):
+    """
+    The response builder used before, with stdlib json and per-call headers
+    
+    Plain json.dumps cannot encode Decimal, so the legacy path is measured
+    on the same data with the numbers stripped.
+    """
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Credentials': True,
+            'Content-Type': 'application/json'
+        },
+        'body': json.dumps(data)
+    }
+
+def measure(call, repeat):
+    """
+    Get the best per-call time of a zero-argument callable in milliseconds
+    """
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    encoder = 'orjson' if responses.orjson is not None else 'json'
+    print(f"create_success_response encoder: {encoder}")
+    print(f"{'tasks':>8} {'legacy ms':>12} {'current ms':>12} {'speedup':>8} {'body KB':>9}")
+    for size in args.sizes:
+        tasks = make_tasks(size)
+        plain_tasks = [{k: v for k, v in task.items() if k != 'version'} for task in tasks]
+        legacy_ms = measure(lambda: legacy_response(plain_tasks), args.repeat)
+        current_ms = measure(lambda: responses.create_success_response(200, tasks), args.repeat)
+        body_kb = len(responses.create_success_response(200, tasks)['body']) / 1024
+        print(f"{size:>8} {legacy_ms:>12.3f} {current_ms:>12.3f} {legacy_ms / current_ms:>7.1f}x {body_kb:>9.1f}")
+
+if __name__ == '__main__':
+    main()
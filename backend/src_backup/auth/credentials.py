@@ -0,0 +1,92 @@
+from ..db import get_table, is_conditional_check_failed, USERS_TABLE, USERNAMES_TABLE
+
+# Attributes login needs, aliased because some are reserved words
+CREDENTIALS_PROJECTION = '#user_id, #username, #password'
+CREDENTIALS_ATTRIBUTE_NAMES = {
+    '#user_id': 'user_id',
+    '#username': 'username',
+    '#password': 'password'
+}
+
+def credentials_item(user):
+    """
+    Build the credentials item that claims a username for a user
+    
+    The item lives in the Usernames table, keyed by username, and holds
+    what login needs so it can be fetched with a single GetItem.
+    
+    Args:
+        user: User item
+        
+    Returns:
+        dict: Usernames table item
+    """
+    return {
+        'username': user['username'],
+        'user_id': user['user_id'],
+        'password': user['password']
+    }
+
+def get_credentials(username):
+    """
+    Get the credentials of a user with one strongly consistent GetItem
+    
+    Args:
+        username: Username to look up
+        
+    Returns:
+        dict: user_id, username and password hash, or None if unknown
+    """
+    response = get_table(USERNAMES_TABLE).get_item(
+        Key={'username': username},
+        ProjectionExpression=CREDENTIALS_PROJECTION,
+        ExpressionAttributeNames=CREDENTIALS_ATTRIBUTE_NAMES,
+        ConsistentRead=True
+    )
+    return response.get('Item')
+
+def backfill_credentials():
+    """
+    Create or complete credentials items for every existing user
+    
+    Users registered before credentials items existed have no item (or only
+    a username claim without the password hash). Items already owned by
+    another user_id are left alone and reported as conflicts. The backfill
+    is idempotent and safe to re-run.
+    
+    Returns:
+        dict: Number of items written and of conflicting usernames
+    """
+    users_table = get_table(USERS_TABLE)
+    usernames_table = get_table(USERNAMES_TABLE)
+    scan_kwargs = {
+        'ProjectionExpression': CREDENTIALS_PROJECTION,
+        'ExpressionAttributeNames': CREDENTIALS_ATTRIBUTE_NAMES
+    }
+    
+    result = {'written': 0, 'conflicts': 0}
+    while True:
+        response = users_table.scan(**scan_kwargs)
+        for user in response.get('Items', []):
+            if 'username' not in user or 'password' not in user:
+                continue
+            try:
+                usernames_table.put_item(
+                    Item=credentials_item(user),
+                    ConditionExpression='attribute_not_exists(username) OR user_id = :user_id',
+                    ExpressionAttributeValues={':user_id': user['user_id']}
+                )
+                result['written'] += 1
+            except Exception as e:
+                if not is_conditional_check_failed(e):
+                    raise
+                print(f"Username {user['username']} is already claimed by another user")
+                result['conflicts'] += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return result
+
+if __name__ == '__main__':
+    # Run with `python -m src_backup.auth.credentials` before deploying login
+    print(f"Credentials backfilled: {backfill_credentials()}")
@@ -1,97 +1,47 @@
 import json
-import boto3
 import bcrypt
 import jwt
 import os
 from datetime import datetime, timedelta
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run
+from .utils import get_jwt_secret
 
+@track_invocation
 def lambda_handler(event, context):
     """
-    Lambda function to handle user login using boto3 and DynamoDB
+    Lambda function to handle user login
     """
     # Parse request body
     try:
         body = json.loads(event['body'])
     except:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Invalid request body'})
-        }
+        return create_error_response(400, 'Invalid request body')
     
     username = body.get('username')
     password = body.get('password')
     
     # Validate input
     if not username or not password:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Username and password are required'})
-        }
-    
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
-    users_table = dynamodb.Table('Users')
+        return create_error_response(400, 'Username and password are required')
     
-    # Find user
+    # Find user credentials with a direct, strongly consistent lookup
     try:
-        # Query the UsernameIndex to find the user
-        response = users_table.query(
-            IndexName='UsernameIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('username').eq(username)
-        )
-        
-        users = response.get('Items', [])
-        if not users:
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Credentials': True,
-                },
-                'body': json.dumps({'message': 'Invalid credentials'})
-            }
-        
-        user = users[0]
+        user = run(get_storage().users.get_credentials(username))
+        if not user:
+            return create_error_response(401, 'Invalid credentials')
     except Exception as e:
-        print(f"Error querying DynamoDB: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Error finding user'})
-        }
+        print(f"Error getting credentials from storage: {str(e)}")
+        return storage_error_response(e, 'Error finding user')
     
     # Verify password
     try:
         if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Credentials': True,
-                },
-                'body': json.dumps({'message': 'Invalid credentials'})
-            }
+            return create_error_response(401, 'Invalid credentials')
     except Exception as e:
         print(f"Error verifying password: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Error verifying credentials'})
-        }
+        return create_error_response(500, 'Error verifying credentials')
     
     # Generate JWT token
     try:
@@ -102,30 +52,16 @@ def lambda_handler(event, context):
             'exp': expiration
         }
         
-        token = jwt.encode(payload, os.environ['JWT_SECRET'], algorithm='HS256')
+        token = jwt.encode(payload, get_jwt_secret(), algorithm='HS256')
     except Exception as e:
         print(f"Error generating token: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Error generating token'})
-        }
+        return create_error_response(500, 'Error generating token')
     
     # Return response
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-        },
-        'body': json.dumps({
-            'token': token,
-            'user': {
-                'user_id': user['user_id'],
-                'username': user['username']
-            }
-        })
-    }
\ No newline at end of file
+    return create_success_response(200, {
+        'token': token,
+        'user': {
+            'user_id': user['user_id'],
+            'username': user['username']
+        }
+    })
\ No newline at end of file
@@ -1,72 +1,29 @@
 import json
-import boto3
 import uuid
 import bcrypt
 import os
 from datetime import datetime
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run, UsernameTaken
 
+@track_invocation
 def lambda_handler(event, context):
     """
-    Lambda function to handle user registration using boto3 and DynamoDB
+    Lambda function to handle user registration
     """
     # Parse request body
     try:
         body = json.loads(event['body'])
     except:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Invalid request body'})
-        }
+        return create_error_response(400, 'Invalid request body')
     
     username = body.get('username')
     password = body.get('password')
     
     # Validate input
     if not username or not password:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Username and password are required'})
-        }
-    
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
-    users_table = dynamodb.Table('Users')
-    
-    # Check if username already exists
-    try:
-        # Query the UsernameIndex to check if username exists
-        response = users_table.query(
-            IndexName='UsernameIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('username').eq(username)
-        )
-        
-        if response.get('Items'):
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Credentials': True,
-                },
-                'body': json.dumps({'message': 'Username already exists'})
-            }
-    except Exception as e:
-        print(f"Error querying DynamoDB: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Error checking username'})
-        }
+        return create_error_response(400, 'Username and password are required')
     
     # Hash password
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -83,30 +40,18 @@ def lambda_handler(event, context):
         'created_at': created_at
     }
     
-    # Put item in DynamoDB
+    # Store the user, the repository rejects taken usernames atomically
     try:
-        users_table.put_item(Item=user)
+        run(get_storage().users.create_user(user))
+    except UsernameTaken:
+        return create_error_response(400, 'Username already exists')
     except Exception as e:
-        print(f"Error putting item in DynamoDB: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'Error creating user'})
-        }
+        print(f"Error creating user in storage: {str(e)}")
+        return storage_error_response(e, 'Error creating user')
     
     # Return response
-    return {
-        'statusCode': 201,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-        },
-        'body': json.dumps({
-            'user_id': user_id,
-            'username': username,
-            'created_at': created_at
-        })
-    }
\ No newline at end of file
+    return create_success_response(201, {
+        'user_id': user_id,
+        'username': username,
+        'created_at': created_at
+    })
\ No newline at end of file
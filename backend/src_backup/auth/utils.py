@@ -1,12 +1,43 @@
 import jwt
 import os
-import json
-from datetime import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from ..events import get_header
+from ..metrics import register_stats
+# Response builders, kept importable from here for existing callers
+from ..responses import create_error_response, create_success_response
+
+# Verified token claims, keyed by token digest, in least recently used order
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+# Lifetime of cached tokens that carry no exp claim
+TOKEN_CACHE_DEFAULT_TTL = 300
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {'hits': 0, 'misses': 0}
+_jwt_secret = None
+
+def get_jwt_secret():
+    """
+    Get the JWT signing secret, read from the environment once per container
+    
+    Returns:
+        str: JWT secret
+    """
+    global _jwt_secret
+    if _jwt_secret is None:
+        _jwt_secret = os.environ['JWT_SECRET']
+    return _jwt_secret
 
 def verify_token(event):
     """
     Verify JWT token from Authorization header
     
+    Verified claims are cached until the token's exp, so repeated requests
+    with the same bearer token skip the signature check.
+    
     Args:
         event: Lambda event object
         
@@ -14,66 +45,61 @@ def verify_token(event):
         dict: User data from token if valid, None otherwise
     """
     # Get token from Authorization header
-    auth_header = event.get('headers', {}).get('Authorization', '')
+    auth_header = get_header(event, 'Authorization', '')
     if not auth_header.startswith('Bearer '):
         return None
     
     token = auth_header.split(' ')[1]
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+    now = time.time()
+    
+    with _token_cache_lock:
+        entry = _token_cache.get(digest)
+        if entry is not None:
+            payload, expires_at = entry
+            if now < expires_at:
+                _token_cache.move_to_end(digest)
+                _token_cache_stats['hits'] += 1
+                return payload
+            del _token_cache[digest]
+        _token_cache_stats['misses'] += 1
     
     try:
-        # Decode token
-        payload = jwt.decode(token, os.environ['JWT_SECRET'], algorithms=['HS256'])
-        
-        # Check if token is expired
-        if 'exp' in payload and datetime.utcnow().timestamp() > payload['exp']:
-            return None
-        
-        return payload
+        # Decode token, PyJWT rejects expired tokens itself
+        payload = jwt.decode(token, get_jwt_secret(), algorithms=['HS256'])
     except Exception as e:
         print(f"Error verifying token: {str(e)}")
         return None
+    
+    expires_at = payload.get('exp', now + TOKEN_CACHE_DEFAULT_TTL)
+    with _token_cache_lock:
+        _token_cache[digest] = (payload, expires_at)
+        _token_cache.move_to_end(digest)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    
+    return payload
 
-def create_error_response(status_code, message):
+def token_cache_stats():
     """
-    Create error response
+    Get verified-token cache counters
     
-    Args:
-        status_code: HTTP status code
-        message: Error message
-        
     Returns:
-        dict: Error response
+        dict: hits, misses and current size of the cache
     """
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps({'message': message})
-    }
+    with _token_cache_lock:
+        return {**_token_cache_stats, 'size': len(_token_cache)}
 
-def create_success_response(status_code, data):
+def clear_token_cache():
     """
-    Create success response
-    
-    Args:
-        status_code: HTTP status code
-        data: Response data
-        
-    Returns:
-        dict: Success response
+    Empty the verified-token cache and reset its counters
     """
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(data)
-    }
+    with _token_cache_lock:
+        _token_cache.clear()
+        _token_cache_stats['hits'] = 0
+        _token_cache_stats['misses'] = 0
+
+register_stats('token_cache', token_cache_stats)
 
 def create_dynamodb_tables():
     """
@@ -82,63 +108,12 @@ def create_dynamodb_tables():
     Returns:
         dict: Created tables
     """
-    import boto3
-    
-    dynamodb = boto3.resource('dynamodb')
-    
-    # Create Users table
-    users_table = dynamodb.create_table(
-        TableName='Users',
-        KeySchema=[
-            {'AttributeName': 'user_id', 'KeyType': 'HASH'}
-        ],
-        AttributeDefinitions=[
-            {'AttributeName': 'user_id', 'AttributeType': 'S'},
-            {'AttributeName': 'username', 'AttributeType': 'S'}
-        ],
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'UsernameIndex',
-                'KeySchema': [
-                    {'AttributeName': 'username', 'KeyType': 'HASH'}
-                ],
-                'Projection': {'ProjectionType': 'ALL'},
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ],
-        ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
-    )
+    from ..db import get_dynamodb
+    from ..schema import table_definitions
     
-    # Create Tasks table
-    tasks_table = dynamodb.create_table(
-        TableName='Tasks',
-        KeySchema=[
-            {'AttributeName': 'task_id', 'KeyType': 'HASH'}
-        ],
-        AttributeDefinitions=[
-            {'AttributeName': 'task_id', 'AttributeType': 'S'},
-            {'AttributeName': 'user_id', 'AttributeType': 'S'}
-        ],
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'UserIdIndex',
-                'KeySchema': [
-                    {'AttributeName': 'user_id', 'KeyType': 'HASH'}
-                ],
-                'Projection': {'ProjectionType': 'ALL'},
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ],
-        ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
-    )
+    dynamodb = get_dynamodb()
     
     return {
-        'users_table': users_table,
-        'tasks_table': tasks_table
+        f'{key}_table': dynamodb.create_table(**definition)
+        for key, definition in table_definitions().items()
     }
\ No newline at end of file
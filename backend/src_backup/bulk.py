@@ -0,0 +1,390 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from .db import get_dynamodb, get_table, batch_write, chunks, BATCH_WRITE_LIMIT
+from .resilience import TokenBucket
+from .tasks.indexes import with_index_keys
+from .tasks.model import migrated_task_id
+
+# Parallel Scan layout, each worker scans one segment at a time
+DEFAULT_SEGMENTS = 8
+DEFAULT_WORKERS = 4
+
+# Items per Scan page, and import lines per checkpoint
+DEFAULT_PAGE_SIZE = 1000
+
+# Export files, one gzipped NDJSON file per segment holding one
+# {"Item": <DynamoDB JSON>} object per line, the format of DynamoDB's own
+# exports to S3
+EXPORT_SUFFIX = '.ndjson.gz'
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# Item transforms for import and migrate, by name. A transform returns the
+# item to write, or None to skip it.
+TRANSFORMS = {
+    'copy': lambda item: item,
+    # Adds the status index keys, e.g. to tasks from a legacy table
+    'task-index-keys': with_index_keys,
+    # Also gives tasks with random IDs a time-ordered one, so the table
+    # lists them in creation order
+    'legacy-tasks': lambda item: with_index_keys({
+        **item, 'task_id': migrated_task_id(item['task_id'], item.get('created_at'))
+    })
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def to_dynamodb_json(item):
+    """
+    Convert an item read through the resource API to DynamoDB JSON
+    """
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+def from_dynamodb_json(item):
+    """
+    Convert an item in DynamoDB JSON to the types the resource API writes
+    """
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+class RateLimiter(TokenBucket):
+    """
+    Token bucket shared by the workers, limiting items written per second
+    
+    A rate of 0 disables the limit. Each BatchWriteItem takes one token per
+    item, close to one write capacity unit for items under 1 KB.
+    """
+    
+    def __init__(self, rate):
+        super().__init__(rate, max(rate, BATCH_WRITE_LIMIT))
+    
+    def acquire(self, count):
+        """
+        Wait until count items may be written
+        """
+        if self.rate:
+            super().acquire(count)
+
+class Checkpoint:
+    """
+    Progress of a bulk run, saved after every page so the run can resume
+    
+    The run is split in parts (scan segments or import files) that each keep
+    their own position. A checkpoint only resumes the run it was written for.
+    """
+    
+    def __init__(self, path, job):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {'job': job, 'parts': {}}
+        if path and os.path.exists(path):
+            with open(path) as source:
+                saved = json.load(source)
+            if saved.get('job') != job:
+                raise ValueError(f"{path} belongs to another run: {saved.get('job')}")
+            self.state = saved
+    
+    def get(self, part):
+        with self.lock:
+            return dict(self.state['parts'].get(str(part), {}))
+    
+    def update(self, part, **progress):
+        with self.lock:
+            self.state['parts'].setdefault(str(part), {}).update(progress)
+            if self.path:
+                # Replaced at once, an interrupted save keeps the previous one
+                temporary = self.path + '.tmp'
+                with open(temporary, 'w') as output:
+                    json.dump(self.state, output)
+                os.replace(temporary, self.path)
+
+def write_items(table_name, items, limiter):
+    """
+    Put items with rate-limited BatchWriteItem calls
+    
+    Unprocessed items are retried with backoff by db.batch_write.
+    
+    Raises:
+        RuntimeError: If some items were still unprocessed
+    """
+    for chunk in chunks(items, BATCH_WRITE_LIMIT):
+        limiter.acquire(len(chunk))
+        unprocessed = batch_write(table_name, [{'PutRequest': {'Item': item}} for item in chunk])
+        if unprocessed:
+            raise RuntimeError(f"{len(unprocessed)} item(s) could not be written to {table_name}")
+
+def run_parts(parts, worker, workers):
+    """
+    Run a worker for every part on a thread pool
+    
+    Every part runs even when others fail, so each gets as far as it can
+    before the run is resumed.
+    
+    Returns:
+        int: Sum of the worker results
+    
+    Raises:
+        RuntimeError: If some parts failed
+    """
+    # Build the shared resource before the workers race to do it
+    get_dynamodb()
+    
+    total = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {part: executor.submit(worker, part) for part in parts}
+        for part, future in futures.items():
+            try:
+                total += future.result()
+            except Exception as e:
+                print(f"Error in part {part}: {str(e)}")
+                errors.append(part)
+    if errors:
+        raise RuntimeError(f"{len(errors)} part(s) failed, run again to resume: {errors}")
+    return total
+
+def scan_segment(table_name, segment, total_segments, checkpoint, handle_page, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Scan one segment of a table from its checkpoint
+    
+    Args:
+        table_name: Table to scan
+        segment: Segment number
+        total_segments: Number of segments of the run
+        checkpoint: Checkpoint of the run
+        handle_page: Called with each page of items before it is checkpointed,
+            may return more progress to save with it
+        page_size: Items per Scan call
+    
+    Returns:
+        int: Items scanned in this segment, including resumed pages
+    """
+    progress = checkpoint.get(segment)
+    scanned = progress.get('items', 0)
+    if progress.get('done'):
+        return scanned
+    
+    scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments, 'Limit': page_size}
+    if progress.get('last_key'):
+        scan_kwargs['ExclusiveStartKey'] = from_dynamodb_json(progress['last_key'])
+    
+    table = get_table(table_name)
+    while True:
+        response = table.scan(**scan_kwargs)
+        items = response.get('Items', [])
+        extra = handle_page(items) or {}
+        scanned += len(items)
+        last_key = response.get('LastEvaluatedKey')
+        checkpoint.update(
+            segment,
+            items=scanned,
+            last_key=to_dynamodb_json(last_key) if last_key else None,
+            done=last_key is None,
+            **extra
+        )
+        if last_key is None:
+            return scanned
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+def export_table(table_name, output_dir, segments=DEFAULT_SEGMENTS, workers=DEFAULT_WORKERS, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Export a table to gzipped NDJSON files with a parallel Scan
+    
+    Each page is appended as its own gzip member, and the file length is
+    checkpointed with the scan position. On resume, whatever was written
+    after the last checkpoint is cut off, so no item is exported twice.
+    
+    Args:
+        table_name: Table to export
+        output_dir: Directory receiving one file per segment and the checkpoint
+        segments: Scan segments
+        workers: Segments scanned at the same time
+        page_size: Items per Scan call
+    
+    Returns:
+        int: Number of items exported
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(
+        os.path.join(output_dir, CHECKPOINT_FILE),
+        {'operation': 'export', 'table': table_name, 'segments': segments}
+    )
+    
+    def export_segment(segment):
+        path = os.path.join(output_dir, f'{table_name}-{segment:04d}{EXPORT_SUFFIX}')
+        with open(path, 'ab') as output:
+            output.truncate(checkpoint.get(segment).get('offset', 0))
+        
+        def write_page(items):
+            with open(path, 'ab') as output:
+                if items:
+                    with gzip.GzipFile(fileobj=output, mode='wb') as compressed:
+                        for item in items:
+                            compressed.write(json.dumps({'Item': to_dynamodb_json(item)}).encode('utf-8') + b'\n')
+                return {'offset': output.tell()}
+        
+        exported = scan_segment(table_name, segment, segments, checkpoint, write_page, page_size)
+        print(f"Segment {segment + 1}/{segments} of {table_name} exported: {exported} item(s)")
+        return exported
+    
+    return run_parts(range(segments), export_segment, workers)
+
+def import_table(table_name, input_path, workers=DEFAULT_WORKERS, write_rate=0, transform='copy',
+                 checkpoint_path=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Import gzipped NDJSON files with rate-limited BatchWriteItem calls
+    
+    Files are imported in parallel, each resuming after the last line its
+    checkpoint recorded. Items are put, so importing twice is harmless.
+    
+    Args:
+        table_name: Table to write to
+        input_path: An export directory or a single export file
+        workers: Files imported at the same time
+        write_rate: Items written per second over all workers, 0 for no limit
+        transform: Name of a TRANSFORMS entry applied to every item
+        checkpoint_path: Progress file; import-<table>.json next to the input
+            when omitted
+        page_size: Lines written between checkpoints
+    
+    Returns:
+        int: Number of items written
+    """
+    if os.path.isdir(input_path):
+        paths = sorted(glob.glob(os.path.join(input_path, f'*{EXPORT_SUFFIX}')))
+        default_checkpoint = os.path.join(input_path, f'import-{table_name}.json')
+    else:
+        paths = [input_path]
+        default_checkpoint = os.path.join(os.path.dirname(input_path) or '.', f'import-{table_name}.json')
+    checkpoint = Checkpoint(
+        checkpoint_path or default_checkpoint,
+        {'operation': 'import', 'table': table_name, 'transform': transform}
+    )
+    transform_item = TRANSFORMS[transform]
+    limiter = RateLimiter(write_rate)
+    
+    def import_file(path):
+        name = os.path.basename(path)
+        progress = checkpoint.get(name)
+        written = progress.get('items', 0)
+        if progress.get('done'):
+            return written
+        
+        done_lines = progress.get('lines', 0)
+        line_number = 0
+        items = []
+        with gzip.open(path, 'rt', encoding='utf-8') as source:
+            for line_number, line in enumerate(source, 1):
+                if line_number <= done_lines or not line.strip():
+                    continue
+                item = transform_item(from_dynamodb_json(json.loads(line)['Item']))
+                if item is not None:
+                    items.append(item)
+                if line_number % page_size == 0:
+                    write_items(table_name, items, limiter)
+                    written += len(items)
+                    items = []
+                    checkpoint.update(name, lines=line_number, items=written)
+        write_items(table_name, items, limiter)
+        written += len(items)
+        checkpoint.update(name, lines=max(line_number, done_lines), items=written, done=True)
+        print(f"{name} imported into {table_name}: {written} item(s)")
+        return written
+    
+    return run_parts(paths, import_file, workers)
+
+def migrate_table(source_table_name, target_table_name, transform='copy', segments=DEFAULT_SEGMENTS,
+                  workers=DEFAULT_WORKERS, write_rate=0, checkpoint_path=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Copy a table into another one, e.g. with a new key layout or indexes
+    
+    The source is read with a parallel Scan and every page is transformed
+    and written before its position is checkpointed. The target may be the
+    source itself, for a transform that keeps the keys.
+    
+    Args:
+        source_table_name: Table to read
+        target_table_name: Table to write, created beforehand
+        transform: Name of a TRANSFORMS entry applied to every item
+        segments: Scan segments
+        workers: Segments migrated at the same time
+        write_rate: Items written per second over all workers, 0 for no limit
+        checkpoint_path: Progress file, the run cannot resume without one
+        page_size: Items per Scan call
+    
+    Returns:
+        int: Number of items read from the source
+    """
+    checkpoint = Checkpoint(checkpoint_path, {
+        'operation': 'migrate', 'source': source_table_name, 'target': target_table_name,
+        'transform': transform, 'segments': segments
+    })
+    transform_item = TRANSFORMS[transform]
+    limiter = RateLimiter(write_rate)
+    
+    def migrate_page(items):
+        transformed = [transform_item(item) for item in items]
+        write_items(target_table_name, [item for item in transformed if item is not None], limiter)
+    
+    def migrate_segment(segment):
+        migrated = scan_segment(source_table_name, segment, segments, checkpoint, migrate_page, page_size)
+        print(f"Segment {segment + 1}/{segments} of {source_table_name} migrated: {migrated} item(s)")
+        return migrated
+    
+    return run_parts(range(segments), migrate_segment, workers)
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk export, import and migration of DynamoDB tables')
+    parser.add_argument('--endpoint', help='DynamoDB endpoint, e.g. DynamoDB Local at http://localhost:8001')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='parallel segments or files')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='items per page and checkpoint')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    export_parser = commands.add_parser('export', help='export a table to gzipped NDJSON files')
+    export_parser.add_argument('table')
+    export_parser.add_argument('output_dir')
+    export_parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    
+    import_parser = commands.add_parser('import', help='import gzipped NDJSON files into a table')
+    import_parser.add_argument('table')
+    import_parser.add_argument('input_path')
+    
+    migrate_parser = commands.add_parser('migrate', help='copy a table into another one')
+    migrate_parser.add_argument('source_table')
+    migrate_parser.add_argument('target_table')
+    migrate_parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    
+    for command_parser in (import_parser, migrate_parser):
+        command_parser.add_argument('--write-rate', type=int, default=0, help='items per second, 0 for no limit')
+        command_parser.add_argument('--transform', choices=sorted(TRANSFORMS), default='copy')
+        command_parser.add_argument('--checkpoint', help='progress file to save and resume from')
+    args = parser.parse_args()
+    
+    if args.endpoint:
+        os.environ['DYNAMODB_ENDPOINT'] = args.endpoint
+    
+    if args.command == 'export':
+        count = export_table(args.table, args.output_dir, args.segments, args.workers, args.page_size)
+        print(f"Exported {count} item(s) from {args.table}.")
+    elif args.command == 'import':
+        count = import_table(
+            args.table, args.input_path, args.workers, args.write_rate, args.transform,
+            args.checkpoint, args.page_size
+        )
+        print(f"Imported {count} item(s) into {args.table}.")
+    else:
+        checkpoint = args.checkpoint or f'migrate-{args.source_table}-{args.target_table}.json'
+        count = migrate_table(
+            args.source_table, args.target_table, args.transform, args.segments, args.workers,
+            args.write_rate, checkpoint, args.page_size
+        )
+        print(f"Migrated {count} item(s) from {args.source_table} to {args.target_table}.")
+
+if __name__ == '__main__':
+    # Run with `python -m src_backup.bulk export|import|migrate ...`
+    main()
@@ -0,0 +1,148 @@
+import base64
+import gzip
+import os
+import zlib
+from functools import wraps
+from .events import get_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is, compressing them is not worth it
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+
+# Favour speed over ratio, responses are compressed on every request
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+def supported_encodings():
+    """
+    Get the content codings this container can produce, preferred first
+    
+    Returns:
+        list: Encoding names
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick a content coding from an Accept-Encoding header
+    
+    Args:
+        accept_encoding: Raw Accept-Encoding value, e.g. "gzip, br;q=0.9"
+        
+    Returns:
+        str: 'br' or 'gzip', or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+    
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding] = weight
+    
+    best, best_weight = None, 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def compress_response(event, response):
+    """
+    Compress a Lambda proxy response if the client accepts it
+    
+    Only successful responses whose body reaches COMPRESSION_MIN_BYTES are
+    compressed. The compressed body is base64 encoded, as the proxy
+    integration requires for binary bodies.
+    
+    Args:
+        event: Lambda event object of the request
+        response: Response built by the handler
+        
+    Returns:
+        dict: The response, compressed in place when applicable
+    """
+    body = response.get('body')
+    if (
+        response.get('statusCode') != 200
+        or response.get('isBase64Encoded')
+        or not isinstance(body, str)
+        or len(body) < COMPRESSION_MIN_BYTES
+    ):
+        return response
+    
+    headers = response.setdefault('headers', {})
+    headers['Vary'] = 'Accept-Encoding'
+    
+    encoding = negotiate_encoding(get_header(event, 'Accept-Encoding'))
+    if encoding is None:
+        return response
+    
+    raw = body.encode('utf-8')
+    if encoding == 'br':
+        compressed = brotli.compress(raw, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(raw, compresslevel=GZIP_LEVEL)
+    
+    headers['Content-Encoding'] = encoding
+    response['body'] = base64.b64encode(compressed).decode('ascii')
+    response['isBase64Encoded'] = True
+    return response
+
+def compress_stream(chunks, encoding):
+    """
+    Compress a body produced in chunks, without holding all of it
+    
+    Each chunk is flushed once compressed, so a streamed response sends every
+    page as soon as it is ready.
+    
+    Args:
+        chunks: Iterable of bytes
+        encoding: 'br' or 'gzip', from negotiate_encoding
+        
+    Returns:
+        generator: Compressed bytes
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        # wbits 31 writes the gzip header and trailer
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    for chunk in chunks:
+        compressed = process(chunk) + flush()
+        if compressed:
+            yield compressed
+    yield finish()
+
+def compressible(handler):
+    """
+    Decorate a Lambda handler so its large responses are compressed
+    
+    Args:
+        handler: Lambda handler function
+        
+    Returns:
+        function: Wrapped handler
+    """
+    @wraps(handler)
+    def wrapper(event, context):
+        return compress_response(event, handler(event, context))
+    
+    return wrapper
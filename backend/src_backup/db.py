@@ -0,0 +1,319 @@
+import os
+import random
+import time
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from .db_metrics import dynamodb_metrics_enabled, instrument, record_retry
+from .resilience import MAX_ATTEMPTS, resilience_enabled, install, fault_injector_from_env
+
+# Table names can be overridden per stage without touching the handlers
+USERS_TABLE = os.environ.get('USERS_TABLE', 'Users')
+TASKS_TABLE = os.environ.get('TASKS_TABLE', 'Tasks')
+TASK_STATS_TABLE = os.environ.get('TASK_STATS_TABLE', 'TaskStats')
+USERNAMES_TABLE = os.environ.get('USERNAMES_TABLE', 'Usernames')
+TASK_SEARCH_TABLE = os.environ.get('TASK_SEARCH_TABLE', 'TaskSearch')
+TASK_TOMBSTONES_TABLE = os.environ.get('TASK_TOMBSTONES_TABLE', 'TaskTombstones')
+
+# botocore client tuning shared by every handler in the container
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', '10')),
+    connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', '1')),
+    read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', '3')),
+    tcp_keepalive=True,
+    retries={'total_max_attempts': MAX_ATTEMPTS, 'mode': 'standard'}
+)
+
+# DynamoDB limits per request
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+TRANSACT_WRITE_LIMIT = 25
+
+# Attempts for items DynamoDB hands back unprocessed
+BATCH_MAX_ATTEMPTS = 5
+BATCH_BASE_DELAY = 0.05
+
+# Transaction cancellation reasons that retrying cannot fix
+PERMANENT_CANCELLATION_CODES = (
+    'ConditionalCheckFailed',
+    'ItemCollectionSizeLimitExceeded',
+    'ValidationError'
+)
+
+# Module level handles survive between warm invocations of the same container
+_dynamodb = None
+_tables = {}
+
+def get_dynamodb():
+    """
+    Get the DynamoDB service resource, creating it on first use
+    
+    Returns:
+        ServiceResource: DynamoDB resource shared by the container
+    """
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.resource(
+            'dynamodb',
+            endpoint_url=os.environ.get('DYNAMODB_ENDPOINT') or None,
+            config=CLIENT_CONFIG
+        )
+        if dynamodb_metrics_enabled():
+            instrument(_dynamodb.meta.client)
+        if resilience_enabled():
+            install(_dynamodb.meta.client)
+        injector = fault_injector_from_env()
+        if injector:
+            injector.install(_dynamodb.meta.client)
+    return _dynamodb
+
+def get_table(name):
+    """
+    Get a DynamoDB table handle, creating it on first use
+    
+    Args:
+        name: Table name
+        
+    Returns:
+        Table: Cached table resource
+    """
+    table = _tables.get(name)
+    if table is None:
+        table = get_dynamodb().Table(name)
+        _tables[name] = table
+    return table
+
+def reset():
+    """
+    Drop the cached resource and table handles
+    
+    The next call to get_dynamodb or get_table builds them again, which is
+    useful after changing the endpoint or credentials in a long-lived process.
+    """
+    global _dynamodb
+    _dynamodb = None
+    _tables.clear()
+
+def is_conditional_check_failed(error):
+    """
+    Check whether an exception is a failed DynamoDB ConditionExpression
+    
+    Args:
+        error: Exception raised by a table operation
+        
+    Returns:
+        bool: True for ConditionalCheckFailedException
+    """
+    return (
+        isinstance(error, ClientError)
+        and error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+    )
+
+def cancellation_codes(error):
+    """
+    Get the per-action reasons of a cancelled transaction
+    
+    Args:
+        error: Exception raised by transact_write_items
+        
+    Returns:
+        list: Reason code per action ('None' for actions that were fine), or
+        None if the error is not a TransactionCanceledException
+    """
+    if not isinstance(error, ClientError):
+        return None
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return None
+    return [reason.get('Code', 'None') for reason in error.response.get('CancellationReasons') or []]
+
+def cancelled_item(error, index=0):
+    """
+    Get the item a cancelled transaction action failed its condition on
+    
+    Only actions written with ReturnValuesOnConditionCheckFailure ALL_OLD
+    hand their item back, and only when it exists.
+    
+    Args:
+        error: Exception raised by transact_write_items
+        index: Position of the action in the transaction
+        
+    Returns:
+        dict: Item with plain Python values, or None
+    """
+    if not isinstance(error, ClientError):
+        return None
+    reasons = error.response.get('CancellationReasons') or []
+    if index >= len(reasons) or not reasons[index].get('Item'):
+        return None
+    deserializer = TypeDeserializer()
+    return {name: deserializer.deserialize(value) for name, value in reasons[index]['Item'].items()}
+
+def chunks(items, size):
+    """
+    Split a list into consecutive chunks
+    
+    Args:
+        items: List to split
+        size: Maximum chunk length
+        
+    Returns:
+        generator: Lists of at most size items
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def group_chunks(groups, size):
+    """
+    Split groups of entries into chunks without splitting a group
+    
+    Args:
+        groups: Lists of entries, each at most size long
+        size: Maximum number of entries per chunk
+        
+    Returns:
+        generator: Lists of the indexes of the groups in each chunk
+    """
+    chunk = []
+    count = 0
+    for index, group in enumerate(groups):
+        if chunk and count + len(group) > size:
+            yield chunk
+            chunk = []
+            count = 0
+        chunk.append(index)
+        count += len(group)
+    if chunk:
+        yield chunk
+
+def backoff(attempt):
+    """
+    Sleep before retrying, using exponential backoff with full jitter
+    
+    Args:
+        attempt: Number of attempts made so far (1 for the first retry)
+    """
+    record_retry()
+    time.sleep(random.uniform(0, BATCH_BASE_DELAY * (2 ** attempt)))
+
+def batch_write(table_name, requests):
+    """
+    Write items with BatchWriteItem, retrying unprocessed items
+    
+    Args:
+        table_name: Table to write to
+        requests: PutRequest/DeleteRequest dicts in the resource format
+        
+    Returns:
+        list: Requests still unprocessed after every retry
+    """
+    dynamodb = get_dynamodb()
+    failed = []
+    for chunk in chunks(requests, BATCH_WRITE_LIMIT):
+        pending = chunk
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            if attempt:
+                backoff(attempt)
+            response = dynamodb.batch_write_item(RequestItems={table_name: pending})
+            pending = response.get('UnprocessedItems', {}).get(table_name, [])
+            if not pending:
+                break
+        failed.extend(pending)
+    return failed
+
+def batch_get(table_name, keys, **kwargs):
+    """
+    Read items with BatchGetItem, retrying unprocessed keys
+    
+    Args:
+        table_name: Table to read from
+        keys: Primary keys of the items
+        **kwargs: Extra KeysAndAttributes options, e.g. ProjectionExpression
+        
+    Returns:
+        list: Items that were found, in no particular order
+    """
+    dynamodb = get_dynamodb()
+    items = []
+    for chunk in chunks(keys, BATCH_GET_LIMIT):
+        pending = {table_name: {'Keys': chunk, **kwargs}}
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            if attempt:
+                backoff(attempt)
+            response = dynamodb.batch_get_item(RequestItems=pending)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            pending = response.get('UnprocessedKeys') or {}
+            if not pending:
+                break
+        if pending:
+            raise RuntimeError(f"Unprocessed keys after {BATCH_MAX_ATTEMPTS} attempts")
+    return items
+
+def transact_write(actions, shared_action=None, repair_shared=None):
+    """
+    Run TransactWriteItems in chunks, isolating the actions that fail
+    
+    Each chunk is one transaction. When a transaction is cancelled, the
+    actions whose condition failed are recorded and dropped, and the rest of
+    the chunk is retried with backoff. Transient reasons (conflicts,
+    throttling) are retried as a whole.
+    
+    Args:
+        actions: TransactItems entries with plain Python values, the
+            resource's client serializes them like Table calls do. An
+            action may also be a list of entries that must be written in
+            the same transaction, e.g. a delete and its tombstone
+        shared_action: Optional callable taking the indexes of the actions
+            about to be written and returning one more entry to write in the
+            same transaction, e.g. the counters those actions change
+        repair_shared: Optional callable run when the shared entry's own
+            condition fails, e.g. seeding the item it updates, before the
+            chunk is retried
+        
+    Returns:
+        list: Cancellation reason code per action, None for the ones written
+    """
+    client = get_dynamodb().meta.client
+    groups = [action if isinstance(action, list) else [action] for action in actions]
+    outcomes = [None] * len(actions)
+    chunk_size = TRANSACT_WRITE_LIMIT - 1 if shared_action else TRANSACT_WRITE_LIMIT
+    for chunk in group_chunks(groups, chunk_size):
+        pending = chunk
+        last_codes = {}
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            if attempt:
+                backoff(attempt)
+            transact_items = [entry for i in pending for entry in groups[i]]
+            if shared_action:
+                transact_items.append(shared_action(pending))
+            try:
+                client.transact_write_items(TransactItems=transact_items)
+                pending = []
+                break
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                    raise
+                reasons = e.response.get('CancellationReasons') or []
+                # Reasons come per entry, an action fails with its first failing entry
+                codes = {}
+                position = 0
+                for index in pending:
+                    for reason in reasons[position:position + len(groups[index])]:
+                        if reason.get('Code') not in (None, 'None'):
+                            codes.setdefault(index, reason.get('Code'))
+                    position += len(groups[index])
+                if shared_action and len(reasons) > position:
+                    shared_code = reasons[position].get('Code')
+                    if shared_code == 'ConditionalCheckFailed' and repair_shared:
+                        repair_shared()
+                for index, code in codes.items():
+                    if code in PERMANENT_CANCELLATION_CODES:
+                        outcomes[index] = code
+                pending = [index for index in pending if outcomes[index] is None]
+                if not pending:
+                    break
+                last_codes = codes
+        # Still failing after every attempt
+        for index in pending:
+            outcomes[index] = last_codes.get(index) or 'TransactionCanceled'
+    return outcomes
@@ -0,0 +1,178 @@
+import contextvars
+import os
+import threading
+import time
+
+# Operations that accept ReturnConsumedCapacity, split by the capacity they use
+READ_OPERATIONS = frozenset(['GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'])
+WRITE_OPERATIONS = frozenset(['PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'])
+
+# Operations returning one page of a LastEvaluatedKey loop
+PAGED_OPERATIONS = frozenset(['Query', 'Scan'])
+
+# Collector of the request being handled, see start_collection
+_collector = contextvars.ContextVar('dynamodb_metrics', default=None)
+
+def dynamodb_metrics_enabled():
+    """
+    Check whether DynamoDB calls should be instrumented
+    
+    Returns:
+        bool: True when DYNAMODB_METRICS is set to a true-like value
+    """
+    return os.environ.get('DYNAMODB_METRICS', 'false').lower() in ('1', 'true', 'yes', 'on')
+
+class CallMetrics:
+    """
+    Totals of the DynamoDB calls made while handling one request
+    
+    Calls run in worker threads, so updates hold a lock.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.duration_ms = 0.0
+        self.read_capacity = 0.0
+        self.write_capacity = 0.0
+        self.retries = 0
+        self.errors = 0
+        self.pages = 0
+        self.truncated_pages = 0
+        self.operations = {}
+    
+    def record(self, operation, duration_ms, capacity, retries, error, truncated):
+        """
+        Add one call
+        
+        Args:
+            operation: API operation name, e.g. Query
+            duration_ms: Time spent in the call, retries included
+            capacity: Capacity units the call consumed
+            retries: Attempts botocore retried
+            error: True if the call failed
+            truncated: True if a page came back with a LastEvaluatedKey
+        """
+        with self.lock:
+            self.calls += 1
+            self.duration_ms += duration_ms
+            if operation in READ_OPERATIONS:
+                self.read_capacity += capacity
+            else:
+                self.write_capacity += capacity
+            self.retries += retries
+            self.errors += int(error)
+            if operation in PAGED_OPERATIONS:
+                self.pages += 1
+                self.truncated_pages += int(truncated)
+            
+            totals = self.operations.setdefault(operation, {'calls': 0, 'duration_ms': 0.0})
+            totals['calls'] += 1
+            totals['duration_ms'] += duration_ms
+    
+    def summary(self):
+        """
+        Get the totals for the invocation log record
+        
+        Returns:
+            dict: JSON-serializable totals, per operation too
+        """
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'duration_ms': round(self.duration_ms, 3),
+                'read_capacity': round(self.read_capacity, 2),
+                'write_capacity': round(self.write_capacity, 2),
+                'retries': self.retries,
+                'errors': self.errors,
+                'pages': self.pages,
+                'truncated_pages': self.truncated_pages,
+                'operations': {
+                    operation: {'calls': totals['calls'], 'duration_ms': round(totals['duration_ms'], 3)}
+                    for operation, totals in self.operations.items()
+                }
+            }
+
+def start_collection():
+    """
+    Start collecting the DynamoDB calls of the current request
+    
+    Returns:
+        tuple: (collector, token to pass to stop_collection)
+    """
+    collector = CallMetrics()
+    return collector, _collector.set(collector)
+
+def stop_collection(token):
+    """
+    Stop collecting, restoring the previous collector
+    """
+    _collector.reset(token)
+
+def current_collector():
+    """
+    Get the collector of the current request
+    
+    Returns:
+        CallMetrics: Collector, or None when nothing is collected
+    """
+    return _collector.get()
+
+async def bind(collector, coroutine):
+    """
+    Run a coroutine with a collector, e.g. on another thread's event loop
+    
+    Tasks started by the coroutine, and asyncio.to_thread workers, inherit it.
+    """
+    _collector.set(collector)
+    return await coroutine
+
+def _add_consumed_capacity(params, model, **kwargs):
+    # Ask for capacity totals unless the caller asked for more detail
+    if model.name in READ_OPERATIONS or model.name in WRITE_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+def _start_timer(context, **kwargs):
+    context['dynamodb_metrics_started'] = time.perf_counter()
+
+def _record_call(http_response, parsed, model, context, **kwargs):
+    collector = _collector.get()
+    started = context.get('dynamodb_metrics_started')
+    if collector is None or started is None:
+        return
+    
+    consumed = parsed.get('ConsumedCapacity') or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    collector.record(
+        model.name,
+        (time.perf_counter() - started) * 1000,
+        sum(entry.get('CapacityUnits', 0) for entry in consumed),
+        parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0),
+        http_response.status_code >= 400,
+        'LastEvaluatedKey' in parsed
+    )
+
+def instrument(client):
+    """
+    Hook the metrics into every call of a DynamoDB client
+    
+    Only called when DYNAMODB_METRICS is on, so a disabled container pays
+    nothing per call.
+    
+    Args:
+        client: botocore DynamoDB client
+    """
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _add_consumed_capacity)
+    events.register('before-call.dynamodb', _start_timer)
+    events.register('after-call.dynamodb', _record_call)
+
+def record_retry():
+    """
+    Count a retry made outside botocore, e.g. of unprocessed batch items
+    """
+    collector = _collector.get()
+    if collector is not None:
+        with collector.lock:
+            collector.retries += 1
@@ -0,0 +1,102 @@
+import hashlib
+from .events import get_header
+from .responses import create_response, CORS_HEADERS
+
+def make_etag(*parts):
+    """
+    Build a weak ETag from the values a representation depends on
+    
+    Weak, since the same representation may be sent gzip or brotli encoded.
+    
+    Args:
+        parts: Values identifying the representation
+        
+    Returns:
+        str: Quoted weak ETag
+    """
+    digest = hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+def task_etag(task, fields=None):
+    """
+    Build the ETag of a single task from its updated_at timestamp
+    
+    Args:
+        task: Task item, with at least task_id and updated_at
+        fields: Attributes selected for the response, None for every attribute
+        
+    Returns:
+        str: Weak ETag
+    """
+    return make_etag(task.get('task_id'), task.get('updated_at'), *(fields or ()))
+
+def list_etag(user_id, version, params):
+    """
+    Build the ETag of a task listing from the owner's change marker
+    
+    Args:
+        user_id: Owner of the tasks
+        version: Change marker of the owner's tasks
+        params: Query parameters selecting the listing
+        
+    Returns:
+        str: Weak ETag
+    """
+    return make_etag(user_id, version, *sorted(f'{name}={value}' for name, value in params.items()))
+
+def etag_matches(event, etag):
+    """
+    Check an ETag against the request's If-None-Match header
+    
+    Comparison is weak, as required for If-None-Match.
+    
+    Args:
+        event: Lambda event object of the request
+        etag: Current ETag of the resource
+        
+    Returns:
+        bool: True if the client's copy is current
+    """
+    header = get_header(event, 'If-None-Match')
+    if not header:
+        return False
+    
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def create_not_modified_response(etag):
+    """
+    Create a 304 response telling the client its copy is current
+    
+    Args:
+        etag: Current ETag of the resource
+        
+    Returns:
+        dict: Response without a body
+    """
+    response = create_response(304, headers=CORS_HEADERS)
+    response['headers']['ETag'] = etag
+    return response
+
+def with_etag(response, etag):
+    """
+    Add an ETag header to a response
+    
+    Args:
+        response: Response to extend in place
+        etag: ETag of the returned representation, None to add nothing
+        
+    Returns:
+        dict: The response
+    """
+    if etag:
+        response['headers']['ETag'] = etag
+    return response
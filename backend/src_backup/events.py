@@ -0,0 +1,36 @@
+def get_header(event, name, default=None):
+    """
+    Get a request header from a Lambda event, ignoring case
+    
+    REST APIs keep the client's header casing while HTTP APIs lower-case
+    every name, so lookups must not depend on it.
+    
+    Args:
+        event: Lambda event object
+        name: Header name
+        default: Value returned when the header is missing
+        
+    Returns:
+        str: Header value
+    """
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is not None:
+        return value
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return default
+
+def get_query_params(event):
+    """
+    Get query string parameters from a Lambda event
+    
+    Args:
+        event: Lambda event object
+        
+    Returns:
+        dict: Query string parameters (empty when there are none)
+    """
+    return event.get('queryStringParameters') or {}
@@ -0,0 +1,136 @@
+import base64
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from mangum import Mangum
+from starlette.concurrency import run_in_threadpool
+from . import setup
+from .auth import login, register
+from .tasks import (
+    batch_tasks, create_task, delete_task, export_tasks, get_changes, get_stats, get_task, get_tasks,
+    search_tasks, update_task
+)
+
+app = FastAPI(title='Task Management API')
+
+# Every route served by the single application, in matching order
+# (literal /tasks/... paths must come before /tasks/{id})
+ROUTES = [
+    ('POST', '/setup', setup.lambda_handler),
+    ('POST', '/auth/register', register.lambda_handler),
+    ('POST', '/auth/login', login.lambda_handler),
+    ('GET', '/tasks', get_tasks.lambda_handler),
+    ('POST', '/tasks', create_task.lambda_handler),
+    ('GET', '/tasks/stats', get_stats.lambda_handler),
+    ('POST', '/tasks/batch', batch_tasks.lambda_handler),
+    ('GET', '/tasks/search', search_tasks.lambda_handler),
+    ('GET', '/tasks/changes', get_changes.lambda_handler),
+    ('GET', '/tasks/{id}', get_task.lambda_handler),
+    ('PUT', '/tasks/{id}', update_task.lambda_handler),
+    ('DELETE', '/tasks/{id}', delete_task.lambda_handler)
+]
+
+async def to_lambda_event(request):
+    """
+    Convert an incoming request into an API Gateway proxy event
+    
+    Args:
+        request: Starlette request
+        
+    Returns:
+        dict: Event in the shape the lambda handlers expect
+    """
+    body = await request.body()
+    return {
+        'httpMethod': request.method,
+        'path': request.url.path,
+        'headers': {name.title(): value for name, value in request.headers.items()},
+        'queryStringParameters': dict(request.query_params) or None,
+        'pathParameters': dict(request.path_params),
+        'body': body.decode('utf-8') if body else None,
+        'isBase64Encoded': False
+    }
+
+def to_response(result):
+    """
+    Convert a lambda handler result into an HTTP response
+    
+    Args:
+        result: Dict returned by a lambda handler
+        
+    Returns:
+        Response: Starlette response
+    """
+    body = result.get('body') or ''
+    if result.get('isBase64Encoded'):
+        content = base64.b64decode(body)
+    else:
+        content = body.encode('utf-8')
+    
+    headers = {}
+    for name, value in (result.get('headers') or {}).items():
+        headers[name] = str(value).lower() if isinstance(value, bool) else str(value)
+    
+    return Response(content=content, status_code=result['statusCode'], headers=headers)
+
+def add_lambda_route(method, path, lambda_handler):
+    """
+    Serve a lambda handler as a route of the application
+    
+    The handler runs in the threadpool since it makes blocking boto3 calls.
+    
+    Args:
+        method: HTTP method
+        path: Route path, using {name} for path parameters
+        lambda_handler: Handler taking (event, context)
+    """
+    async def endpoint(request: Request):
+        event = await to_lambda_event(request)
+        context = request.scope.get('aws.context')
+        result = await run_in_threadpool(lambda_handler, event, context)
+        return to_response(result)
+    
+    name = f"{lambda_handler.__module__.rsplit('.', 1)[-1]}_{method.lower()}"
+    app.add_api_route(path, endpoint, methods=[method], name=name)
+
+def add_streaming_route(method, path, open_stream, lambda_handler):
+    """
+    Serve a response body produced in chunks without buffering it
+    
+    Mangum collects the whole body before handing it to API Gateway, so
+    under Mangum the route is served by the buffering lambda handler, which
+    answers 413 past its size limit instead of failing on Lambda's.
+    
+    Args:
+        method: HTTP method
+        path: Route path
+        open_stream: Callable taking (event, context) and returning
+            (response, chunks), chunks being None when the response is
+            complete
+        lambda_handler: Handler taking (event, context), used under Mangum
+    """
+    async def endpoint(request: Request):
+        event = await to_lambda_event(request)
+        context = request.scope.get('aws.context')
+        if 'aws.event' in request.scope:
+            return to_response(await run_in_threadpool(lambda_handler, event, context))
+        result, chunks = await run_in_threadpool(open_stream, event, context)
+        if chunks is None:
+            return to_response(result)
+        headers = {
+            name: str(value).lower() if isinstance(value, bool) else str(value)
+            for name, value in result['headers'].items()
+        }
+        # The chunks read storage with blocking calls, Starlette iterates
+        # them in the threadpool
+        return StreamingResponse(chunks, status_code=result['statusCode'], headers=headers)
+    
+    app.add_api_route(path, endpoint, methods=[method], name=f"{open_stream.__name__}_{method.lower()}")
+
+# Registered first, /tasks/{id} would match it otherwise
+add_streaming_route('GET', '/tasks/export', export_tasks.open_export, export_tasks.lambda_handler)
+
+for method, path, lambda_handler in ROUTES:
+    add_lambda_route(method, path, lambda_handler)
+
+# Entry point when the whole API is deployed as a single Lambda
+handler = Mangum(app, lifespan='off')
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from functools import wraps
+from .db_metrics import dynamodb_metrics_enabled, start_collection, stop_collection
+
+# Captured when the first handler module imports this one, i.e. during the
+# Lambda init phase of a fresh container
+_INIT_STARTED = time.perf_counter()
+_cold_start = True
+
+# Named callables whose counters are added to every invocation record
+_stats_providers = {}
+
+def invocation_metrics_enabled():
+    """
+    Check whether invocation timing should be logged
+    
+    Returns:
+        bool: False when INVOCATION_METRICS is set to a false-like value
+    """
+    return os.environ.get('INVOCATION_METRICS', 'true').lower() not in ('0', 'false', 'no', 'off')
+
+def register_stats(name, provider):
+    """
+    Add a set of counters to the invocation log records
+    
+    Args:
+        name: Key of the counters in the record
+        provider: Callable returning a JSON-serializable dict
+    """
+    _stats_providers[name] = provider
+
+def track_invocation(handler):
+    """
+    Decorate a Lambda handler to log cold-start and warm-call timings
+    
+    The first invocation in a container is reported as a cold start along with
+    the time spent since module import (init_ms). Every invocation reports its
+    own duration so warm and cold latency can be compared in the logs. With
+    DYNAMODB_METRICS on, the record also totals the DynamoDB calls the
+    invocation made.
+    
+    Args:
+        handler: Lambda handler function
+        
+    Returns:
+        function: Wrapped handler
+    """
+    name = f"{handler.__module__}.{handler.__name__}"
+    
+    @wraps(handler)
+    def wrapper(event, context):
+        global _cold_start
+        cold_start = _cold_start
+        _cold_start = False
+        
+        collection = start_collection() if dynamodb_metrics_enabled() else None
+        started = time.perf_counter()
+        status_code = None
+        try:
+            response = handler(event, context)
+            if isinstance(response, dict):
+                status_code = response.get('statusCode')
+            elif isinstance(response, tuple) and isinstance(response[0], dict):
+                # (response, chunks) of a streamed body
+                status_code = response[0].get('statusCode')
+            return response
+        finally:
+            if collection is not None:
+                stop_collection(collection[1])
+            if invocation_metrics_enabled():
+                record = {
+                    'metric': 'invocation',
+                    'handler': name,
+                    'cold_start': cold_start,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                    'status_code': status_code
+                }
+                if cold_start:
+                    record['init_ms'] = round((started - _INIT_STARTED) * 1000, 3)
+                for stats_name, provider in _stats_providers.items():
+                    record[stats_name] = provider()
+                if collection is not None:
+                    record['dynamodb'] = collection[0].summary()
+                print(json.dumps(record))
+    
+    return wrapper
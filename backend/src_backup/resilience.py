@@ -0,0 +1,419 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from .metrics import register_stats
+
+# Total attempts per call, the first one included (also botocore's setting)
+MAX_ATTEMPTS = int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', '3'))
+
+# Backoff before retrying a throttled call: full jitter, capped
+THROTTLE_BASE_DELAY = float(os.environ.get('DYNAMODB_THROTTLE_BASE_DELAY', '0.05'))
+THROTTLE_MAX_DELAY = float(os.environ.get('DYNAMODB_THROTTLE_MAX_DELAY', '1'))
+
+# Calls per second per table and container, 0 for no limit. A call waits at
+# most RATE_LIMIT_WAIT seconds for a token before it is shed.
+RATE_LIMIT = float(os.environ.get('DYNAMODB_RATE_LIMIT', '0'))
+RATE_LIMIT_WAIT = float(os.environ.get('DYNAMODB_RATE_LIMIT_WAIT', '0.1'))
+
+# Consecutive failed attempts that open a table's circuit, and seconds it
+# stays open before one trial call is let through
+BREAKER_THRESHOLD = int(os.environ.get('DYNAMODB_BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('DYNAMODB_BREAKER_COOLDOWN', '10'))
+
+# Error codes DynamoDB returns when a table or the account is over capacity
+THROTTLING_CODES = frozenset([
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded'
+])
+
+# Key of a throttled response listing the tables of the call, the response
+# becomes the ClientError's so retry_after_seconds can find their circuits
+THROTTLED_TABLES = 'ResilienceThrottledTables'
+
+# Transaction actions naming a table, see _call_tables
+TRANSACT_ACTIONS = ('ConditionCheck', 'Put', 'Delete', 'Update', 'Get')
+
+# Guards per table name, shared by every thread of the container
+_breakers = {}
+_buckets = {}
+_guards_lock = threading.Lock()
+
+def resilience_enabled():
+    """
+    Check whether DynamoDB calls should go through the resilience hooks
+    
+    Returns:
+        bool: False when DYNAMODB_RESILIENCE is set to a false-like value
+    """
+    return os.environ.get('DYNAMODB_RESILIENCE', 'true').lower() not in ('0', 'false', 'no', 'off')
+
+class Unavailable(Exception):
+    """
+    Raised instead of calling a table that is shedding load
+    
+    Attributes:
+        table: Table the call was for
+        retry_after: Seconds after which the call may succeed
+        reason: 'circuit_open' or 'rate_limited'
+    """
+    
+    def __init__(self, table, retry_after, reason):
+        super().__init__(f"{table} unavailable ({reason}), retry after {retry_after:.2f}s")
+        self.table = table
+        self.retry_after = retry_after
+        self.reason = reason
+
+class TokenBucket:
+    """
+    Token bucket refilled at a steady rate
+    
+    Callers may take more tokens than the bucket holds; the debt is paid by
+    waiting, so the rate holds on average.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def acquire(self, count=1):
+        """
+        Take count tokens, waiting as long as needed
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= count
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+    
+    def try_acquire(self, count=1, max_wait=0):
+        """
+        Take count tokens unless that means waiting longer than max_wait
+        
+        Returns:
+            float: 0 once the tokens were taken, otherwise the seconds until
+            they would be available (nothing is taken)
+        """
+        with self.lock:
+            self._refill()
+            wait = max(count - self.tokens, 0) / self.rate
+            if wait > max_wait:
+                return wait
+            self.tokens -= count
+        if wait:
+            time.sleep(wait)
+        return 0
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one table
+    
+    Closed, every call goes through. After threshold consecutive failures
+    it opens and calls fail at once for cooldown seconds. It is then
+    half-open: one trial call goes through and closes it again on success
+    or reopens it on failure.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """
+        Check whether a call may go through
+        
+        Returns:
+            float: 0 if it may, otherwise the seconds until it may be tried
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return 0
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.cooldown - now
+                if remaining > 0:
+                    return remaining
+                self.state = self.HALF_OPEN
+                self.trial_started = now
+                return 0
+            # Half-open with a trial in flight; a trial that never reported
+            # back is given up after another cooldown
+            if now - self.trial_started > self.cooldown:
+                self.trial_started = now
+                return 0
+            return 1
+    
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def retry_after(self):
+        """
+        Get the seconds left before the circuit lets a trial call through
+        """
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(self.opened_at + self.cooldown - time.monotonic(), 0)
+
+def get_breaker(table):
+    """
+    Get the circuit breaker of a table, creating it on first use
+    """
+    breaker = _breakers.get(table)
+    if breaker is None:
+        with _guards_lock:
+            breaker = _breakers.setdefault(table, CircuitBreaker())
+    return breaker
+
+def get_bucket(table):
+    """
+    Get the rate limit of a table, creating it on first use
+    
+    Returns:
+        TokenBucket: Bucket, or None when DYNAMODB_RATE_LIMIT is 0
+    """
+    if RATE_LIMIT <= 0:
+        return None
+    bucket = _buckets.get(table)
+    if bucket is None:
+        with _guards_lock:
+            bucket = _buckets.setdefault(table, TokenBucket(RATE_LIMIT))
+    return bucket
+
+def breaker_states():
+    """
+    Get the state of every table's circuit for the invocation log records
+    """
+    return {table: breaker.state for table, breaker in list(_breakers.items())}
+
+def reset():
+    """
+    Forget every breaker and bucket, e.g. between local test runs
+    """
+    with _guards_lock:
+        _breakers.clear()
+        _buckets.clear()
+
+def backoff_delay(attempt):
+    """
+    Get the delay before retrying a throttled call
+    
+    Args:
+        attempt: Number of attempts made so far (1 for the first retry)
+    
+    Returns:
+        float: Seconds, drawn uniformly up to the capped exponential delay
+    """
+    return random.uniform(0, min(THROTTLE_MAX_DELAY, THROTTLE_BASE_DELAY * (2 ** attempt)))
+
+def error_code(error):
+    """
+    Get the DynamoDB error code of an exception
+    
+    Returns:
+        str: Code such as ProvisionedThroughputExceededException, or None
+        for exceptions without one
+    """
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return None
+    return response.get('Error', {}).get('Code')
+
+def is_throttling_error(error):
+    """
+    Check whether an exception is DynamoDB refusing a call over capacity
+    """
+    return error_code(error) in THROTTLING_CODES
+
+def retry_after_seconds(error):
+    """
+    Get the Retry-After hint for a failed storage call
+    
+    Args:
+        error: Exception raised by a storage call
+    
+    Returns:
+        int: Whole seconds the client should wait, or None when the error
+        is not caused by load and retrying later will not help
+    """
+    if isinstance(error, Unavailable):
+        return max(1, math.ceil(error.retry_after))
+    if is_throttling_error(error):
+        # Retries were exhausted; wait for the circuit of a throttled table
+        # if it opened meanwhile
+        tables = error.response.get(THROTTLED_TABLES) or []
+        remaining = max([get_breaker(table).retry_after() for table in tables], default=0)
+        return max(1, math.ceil(remaining))
+    return None
+
+def _call_tables(params):
+    # Tables a call reads or writes, from the low-level request parameters
+    if 'TableName' in params:
+        return [params['TableName']]
+    if 'RequestItems' in params:
+        return list(params['RequestItems'])
+    tables = []
+    for item in params.get('TransactItems') or []:
+        for action in TRANSACT_ACTIONS:
+            table = (item.get(action) or {}).get('TableName')
+            if table and table not in tables:
+                tables.append(table)
+    return tables
+
+def _guard_call(params, model, context, **kwargs):
+    # Shed the call before anything is sent if a table is open or over rate
+    tables = _call_tables(params)
+    for table in tables:
+        wait = get_breaker(table).allow()
+        if wait:
+            raise Unavailable(table, wait, 'circuit_open')
+    for table in tables:
+        bucket = get_bucket(table)
+        wait = bucket.try_acquire(1, RATE_LIMIT_WAIT) if bucket else 0
+        if wait:
+            raise Unavailable(table, wait, 'rate_limited')
+    context['resilience_tables'] = tables
+
+def _record_attempt(response, attempts, caught_exception, request_dict, **kwargs):
+    # Called by botocore after every attempt, retried or not
+    tables = request_dict.get('context', {}).get('resilience_tables') or []
+    code = None
+    if caught_exception is not None:
+        failed = True
+    else:
+        http_response, parsed = response
+        code = parsed.get('Error', {}).get('Code')
+        failed = code in THROTTLING_CODES or http_response.status_code >= 500
+    for table in tables:
+        breaker = get_breaker(table)
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    if code in THROTTLING_CODES:
+        parsed[THROTTLED_TABLES] = tables
+    
+    # Our delay replaces botocore's for throttling; anything else, and giving
+    # up, is left to the standard retry handler
+    if code in THROTTLING_CODES and attempts < MAX_ATTEMPTS:
+        return backoff_delay(attempts)
+    return None
+
+def install(client):
+    """
+    Hook backoff, rate limiting and circuit breaking into a DynamoDB client
+    
+    Args:
+        client: botocore DynamoDB client
+    """
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _guard_call)
+    events.register_first('needs-retry.dynamodb', _record_attempt)
+    register_stats('dynamodb_circuits', breaker_states)
+
+class _Body:
+    """
+    Raw body of a stubbed response, read the way botocore reads urllib3's
+    """
+    
+    def __init__(self, data):
+        self.data = data
+    
+    def stream(self, **kwargs):
+        yield self.data
+
+class FaultInjector:
+    """
+    Local stub failing a share of DynamoDB calls before they are sent
+    
+    For exercising the resilience hooks against DynamoDB Local or moto, e.g.
+    with DYNAMODB_FAULT_RATE=0.5. Each attempt, retries included, fails with
+    the given probability and gets DynamoDB's error response for the code.
+    Never enable it in a deployed stage.
+    
+    Attributes:
+        rate: Share of attempts that fail, 0 to 1
+        code: Error code returned
+        tables: Only fail calls to these tables, None for every table
+        injected: Number of attempts failed so far
+    """
+    
+    STATUS_CODES = {'InternalServerError': 500, 'ServiceUnavailable': 503}
+    
+    def __init__(self, rate=1.0, code='ProvisionedThroughputExceededException', tables=None):
+        self.rate = rate
+        self.code = code
+        self.tables = set(tables) if tables else None
+        self.injected = 0
+    
+    def __call__(self, request, **kwargs):
+        if self.tables is not None:
+            target = json.loads(request.body or b'{}')
+            if not self.tables.intersection(_call_tables(target)):
+                return None
+        if random.random() >= self.rate:
+            return None
+        # Imported here so the handlers do not load botocore before their
+        # first DynamoDB call
+        from botocore.awsrequest import AWSResponse
+        self.injected += 1
+        body = json.dumps({
+            '__type': f'com.amazonaws.dynamodb.v20120810#{self.code}',
+            'message': 'Injected fault'
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/x-amz-json-1.0', 'x-amzn-RequestId': 'injected-fault'}
+        return AWSResponse(request.url, self.STATUS_CODES.get(self.code, 400), headers, _Body(body))
+    
+    def install(self, client):
+        """
+        Answer a client's requests ahead of any other stub, moto's included
+        """
+        client.meta.events.register_first('before-send.dynamodb', self)
+        return self
+
+def fault_injector_from_env():
+    """
+    Build the fault injector asked for by DYNAMODB_FAULT_RATE
+    
+    Returns:
+        FaultInjector: Injector, or None when the rate is unset or 0
+    """
+    rate = float(os.environ.get('DYNAMODB_FAULT_RATE', '0'))
+    if rate <= 0:
+        return None
+    tables = os.environ.get('DYNAMODB_FAULT_TABLES')
+    return FaultInjector(
+        rate,
+        os.environ.get('DYNAMODB_FAULT_CODE', 'ProvisionedThroughputExceededException'),
+        tables.split(',') if tables else None
+    )
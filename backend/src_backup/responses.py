@@ -0,0 +1,138 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from types import MappingProxyType
+from .resilience import retry_after_seconds
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Built once per container, copied into each response
+CORS_HEADERS = MappingProxyType({
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': True,
+    'Access-Control-Expose-Headers': 'ETag, Retry-After'
+})
+JSON_HEADERS = MappingProxyType({
+    **CORS_HEADERS,
+    'Content-Type': 'application/json'
+})
+
+def _default(value):
+    """
+    Serialize the values JSON does not support natively
+    
+    boto3 returns every DynamoDB number as Decimal and string/number sets as
+    Python sets.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    def dumps(data):
+        """
+        Serialize data to a JSON string with orjson
+        """
+        return orjson.dumps(data, default=_default).decode('utf-8')
+else:
+    def dumps(data):
+        """
+        Serialize data to a JSON string with the standard library
+        """
+        return json.dumps(data, default=_default, separators=(',', ':'))
+
+def create_response(status_code, data=None, headers=JSON_HEADERS):
+    """
+    Create a Lambda proxy response
+    
+    Args:
+        status_code: HTTP status code
+        data: Response data, serialized as JSON (None for an empty body)
+        headers: Base headers, copied so callers can add their own
+        
+    Returns:
+        dict: Response
+    """
+    return {
+        'statusCode': status_code,
+        'headers': dict(headers),
+        'body': '' if data is None else dumps(data)
+    }
+
+def create_error_response(status_code, message):
+    """
+    Create error response
+    
+    Args:
+        status_code: HTTP status code
+        message: Error message
+        
+    Returns:
+        dict: Error response
+    """
+    return create_response(status_code, {'message': message})
+
+def create_success_response(status_code, data):
+    """
+    Create success response
+    
+    Args:
+        status_code: HTTP status code
+        data: Response data
+        
+    Returns:
+        dict: Success response
+    """
+    return create_response(status_code, data)
+
+def create_empty_response(status_code=204):
+    """
+    Create a response without a body
+    
+    Args:
+        status_code: HTTP status code
+        
+    Returns:
+        dict: Empty response
+    """
+    return create_response(status_code, headers=CORS_HEADERS)
+
+def create_unavailable_response(retry_after):
+    """
+    Create a 503 response asking the client to retry later
+    
+    Args:
+        retry_after: Whole seconds to wait, sent as Retry-After
+        
+    Returns:
+        dict: Error response
+    """
+    response = create_error_response(503, 'Service temporarily unavailable, retry later')
+    response['headers']['Retry-After'] = str(retry_after)
+    return response
+
+def storage_error_response(error, message):
+    """
+    Create the response for a failed storage call
+    
+    Throttling and load shedding get a 503 with a Retry-After hint, since
+    the same request will succeed later; anything else is a 500.
+    
+    Args:
+        error: Exception raised by the storage call
+        message: Error message of the 500
+        
+    Returns:
+        dict: Error response
+    """
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        return create_unavailable_response(retry_after)
+    return create_error_response(500, message)
@@ -0,0 +1,137 @@
+from .db import USERS_TABLE, USERNAMES_TABLE, TASKS_TABLE, TASK_STATS_TABLE, TASK_SEARCH_TABLE, TASK_TOMBSTONES_TABLE
+from .tasks.indexes import STATUS_CREATED_INDEX, STATUS_UPDATED_INDEX, UPDATED_INDEX, USER_STATUS
+
+PROVISIONED_THROUGHPUT = {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+
+# Tasks are stored in one partition per user, sorted by time-ordered task_id
+TASKS_KEY_SCHEMA = [
+    {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+    {'AttributeName': 'task_id', 'KeyType': 'RANGE'}
+]
+
+def task_index(name, partition_key, sort_key, projection):
+    """
+    Build a global secondary index of the Tasks table
+    
+    Every task write is copied to each index, so indexes only project what
+    their queries read.
+    
+    Args:
+        name: Index name
+        partition_key: Partition key attribute
+        sort_key: Sort key attribute
+        projection: Projection entry of the index
+        
+    Returns:
+        dict: GlobalSecondaryIndexes entry
+    """
+    return {
+        'IndexName': name,
+        'KeySchema': [
+            {'AttributeName': partition_key, 'KeyType': 'HASH'},
+            {'AttributeName': sort_key, 'KeyType': 'RANGE'}
+        ],
+        'Projection': projection,
+        'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+    }
+
+# Status counts and status filtered listings, which read the page's tasks
+# from the table, and listings and changes by update time, which return
+# whole tasks
+TASKS_INDEXES = [
+    task_index(STATUS_CREATED_INDEX, USER_STATUS, 'created_at', {'ProjectionType': 'KEYS_ONLY'}),
+    task_index(STATUS_UPDATED_INDEX, USER_STATUS, 'updated_at', {'ProjectionType': 'KEYS_ONLY'}),
+    task_index(UPDATED_INDEX, 'user_id', 'updated_at', {'ProjectionType': 'ALL'})
+]
+
+# Attribute DynamoDB deletes expired items by, per short table key
+TIME_TO_LIVE = {
+    'task_tombstones': 'expires_at'
+}
+
+# Key schema used before tasks were partitioned by user
+LEGACY_TASKS_KEY_SCHEMA = [
+    {'AttributeName': 'task_id', 'KeyType': 'HASH'}
+]
+
+def table_definitions():
+    """
+    Get the create_table arguments for every application table
+    
+    Returns:
+        dict: Short table key (users, usernames, tasks, task_stats,
+        task_search, task_tombstones) to create_table kwargs
+    """
+    return {
+        'users': {
+            'TableName': USERS_TABLE,
+            'KeySchema': [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'}
+            ],
+            'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+        },
+        # Credentials items, one per username, used by register and login
+        'usernames': {
+            'TableName': USERNAMES_TABLE,
+            'KeySchema': [
+                {'AttributeName': 'username', 'KeyType': 'HASH'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'username', 'AttributeType': 'S'}
+            ],
+            'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+        },
+        'tasks': {
+            'TableName': TASKS_TABLE,
+            'KeySchema': TASKS_KEY_SCHEMA,
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'task_id', 'AttributeType': 'S'},
+                {'AttributeName': USER_STATUS, 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'S'},
+                {'AttributeName': 'updated_at', 'AttributeType': 'S'}
+            ],
+            'GlobalSecondaryIndexes': [dict(index) for index in TASKS_INDEXES],
+            'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+        },
+        'task_stats': {
+            'TableName': TASK_STATS_TABLE,
+            'KeySchema': [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'}
+            ],
+            'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+        },
+        # Search postings, one per user, token and task: term is "<token>#<task_id>"
+        'task_search': {
+            'TableName': TASK_SEARCH_TABLE,
+            'KeySchema': [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'term', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'term', 'AttributeType': 'S'}
+            ],
+            'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+        },
+        # Deleted tasks for delta sync, one per task: deleted_key is
+        # "<deleted_at>#<task_id>", so a user's deletes are sorted by time
+        'task_tombstones': {
+            'TableName': TASK_TOMBSTONES_TABLE,
+            'KeySchema': [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'deleted_key', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'deleted_key', 'AttributeType': 'S'}
+            ],
+            'ProvisionedThroughput': dict(PROVISIONED_THROUGHPUT)
+        }
+    }
@@ -1,7 +1,10 @@
-import boto3
 import os
 import json
 import time
+from .bulk import migrate_table
+from .db import get_dynamodb, TASKS_TABLE
+from .responses import create_error_response, create_success_response
+from .schema import table_definitions, LEGACY_TASKS_KEY_SCHEMA, TIME_TO_LIVE
 
 def create_dynamodb_tables():
     """
@@ -9,83 +12,137 @@ def create_dynamodb_tables():
     """
     print("Creating DynamoDB tables...")
     
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
+    # Reuse the shared DynamoDB resource
+    dynamodb = get_dynamodb()
     
-    # Create Users table
-    try:
-        print("Creating Users table...")
-        users_table = dynamodb.create_table(
-            TableName='Users',
-            KeySchema=[
-                {'AttributeName': 'user_id', 'KeyType': 'HASH'}
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'user_id', 'AttributeType': 'S'},
-                {'AttributeName': 'username', 'AttributeType': 'S'}
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'UsernameIndex',
-                    'KeySchema': [
-                        {'AttributeName': 'username', 'KeyType': 'HASH'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                }
-            ],
-            ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
-        )
-        print("Users table created successfully.")
-    except dynamodb.meta.client.exceptions.ResourceInUseException:
-        print("Users table already exists.")
-        users_table = dynamodb.Table('Users')
-    
-    # Create Tasks table
-    try:
-        print("Creating Tasks table...")
-        tasks_table = dynamodb.create_table(
-            TableName='Tasks',
-            KeySchema=[
-                {'AttributeName': 'task_id', 'KeyType': 'HASH'}
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'task_id', 'AttributeType': 'S'},
-                {'AttributeName': 'user_id', 'AttributeType': 'S'}
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'UserIdIndex',
-                    'KeySchema': [
-                        {'AttributeName': 'user_id', 'KeyType': 'HASH'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                }
-            ],
-            ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
-        )
-        print("Tasks table created successfully.")
-    except dynamodb.meta.client.exceptions.ResourceInUseException:
-        print("Tasks table already exists.")
-        tasks_table = dynamodb.Table('Tasks')
+    tables = {}
+    for key, definition in table_definitions().items():
+        name = definition['TableName']
+        try:
+            print(f"Creating {name} table...")
+            tables[f'{key}_table'] = dynamodb.create_table(**definition)
+            print(f"{name} table created successfully.")
+        except dynamodb.meta.client.exceptions.ResourceInUseException:
+            print(f"{name} table already exists.")
+            tables[f'{key}_table'] = dynamodb.Table(name)
     
     # Wait for tables to be created
     print("Waiting for tables to be created...")
-    users_table.meta.client.get_waiter('table_exists').wait(TableName='Users')
-    tasks_table.meta.client.get_waiter('table_exists').wait(TableName='Tasks')
+    for table in tables.values():
+        table.meta.client.get_waiter('table_exists').wait(TableName=table.name)
+    
+    # Tasks tables created before the user_id/task_id layout must be migrated
+    if tables['tasks_table'].key_schema == LEGACY_TASKS_KEY_SCHEMA:
+        print(f"Warning: {TASKS_TABLE} uses the legacy task_id key. Set TASKS_TABLE to a new "
+              "table name, run setup again and copy the data with migrate_legacy_tasks() or "
+              "`python -m src_backup.bulk migrate`.")
+    else:
+        add_missing_indexes(tables['tasks_table'], table_definitions()['tasks'])
+    
+    for key, attribute in TIME_TO_LIVE.items():
+        if enable_time_to_live(tables[f'{key}_table'], attribute):
+            print(f"Enabled expiry of {tables[f'{key}_table'].name} items on {attribute}.")
     
     print("Tables created successfully.")
-    return {
-        'users_table': users_table,
-        'tasks_table': tasks_table
+    return tables
+
+def add_missing_indexes(table, definition):
+    """
+    Create the global secondary indexes an existing table does not have yet
+    
+    DynamoDB builds one index per UpdateTable call, so each index is waited
+    for before the next is requested. Run the index key backfill afterwards
+    (`python -m src_backup.tasks.indexes`) for tasks stored before.
+    
+    Args:
+        table: Existing table resource
+        definition: create_table kwargs of the table
+        
+    Returns:
+        list: Names of the indexes that were created
+    """
+    table.reload()
+    existing = {index['IndexName'] for index in table.global_secondary_indexes or []}
+    attribute_types = {
+        attribute['AttributeName']: attribute
+        for attribute in definition['AttributeDefinitions']
     }
+    
+    created = []
+    for index in definition.get('GlobalSecondaryIndexes', []):
+        if index['IndexName'] in existing:
+            continue
+        print(f"Creating index {index['IndexName']} on {table.name}...")
+        table.meta.client.update_table(
+            TableName=table.name,
+            AttributeDefinitions=[
+                attribute_types[key['AttributeName']] for key in index['KeySchema']
+            ],
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        wait_for_index(table, index['IndexName'])
+        created.append(index['IndexName'])
+    return created
+
+def enable_time_to_live(table, attribute):
+    """
+    Let DynamoDB delete the items of a table once an attribute is past
+    
+    Args:
+        table: Table resource
+        attribute: Attribute holding the expiry time in epoch seconds
+        
+    Returns:
+        bool: True if expiry was turned on now, False if it already was
+    """
+    client = table.meta.client
+    description = client.describe_time_to_live(TableName=table.name)['TimeToLiveDescription']
+    if description.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        return False
+    client.update_time_to_live(
+        TableName=table.name,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': attribute}
+    )
+    return True
+
+def wait_for_index(table, index_name, delay=5):
+    """
+    Wait until a global secondary index is active
+    
+    Args:
+        table: Table resource
+        index_name: Index being created
+        delay: Seconds between checks
+    """
+    while True:
+        table.reload()
+        statuses = {
+            index['IndexName']: index['IndexStatus']
+            for index in table.global_secondary_indexes or []
+        }
+        if statuses.get(index_name) == 'ACTIVE':
+            return
+        time.sleep(delay)
+
+def migrate_legacy_tasks(source_table_name, target_table_name=TASKS_TABLE):
+    """
+    Copy tasks from a legacy task_id-keyed table into the user_id/task_id layout
+    
+    Items keep their other attributes and get the status index keys. Random
+    task IDs are replaced by time-ordered ones built from created_at, since
+    the new table lists tasks in task_id order; clients holding the old IDs
+    must reload their tasks. The copy is idempotent and can be re-run if it
+    is interrupted; `python -m src_backup.bulk migrate --transform
+    legacy-tasks` does the same with a checkpoint to resume from.
+    
+    Args:
+        source_table_name: Table keyed on task_id alone
+        target_table_name: Table created with the current schema
+        
+    Returns:
+        int: Number of tasks copied
+    """
+    return migrate_table(source_table_name, target_table_name, transform='legacy-tasks')
 
 def lambda_handler(event, context):
     """
@@ -93,25 +150,11 @@ def lambda_handler(event, context):
     """
     try:
         tables = create_dynamodb_tables()
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': 'DynamoDB tables created successfully'})
-        }
+        return create_success_response(200, {'message': 'DynamoDB tables created successfully'})
     except Exception as e:
         print(f"Error creating DynamoDB tables: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True,
-            },
-            'body': json.dumps({'message': f'Error creating DynamoDB tables: {str(e)}'})
-        }
+        return create_error_response(500, f'Error creating DynamoDB tables: {str(e)}')
 
 if __name__ == '__main__':
-    # If running locally, create tables
+    # If running locally (`python -m src_backup.setup`), create tables
     create_dynamodb_tables()
\ No newline at end of file
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+from ..db_metrics import bind, current_collector
+from .base import (
+    Storage, StorageError, UsernameTaken, InvalidCursor,
+    OK, NOT_FOUND, CONFLICT, ERROR
+)
+from .cache import cache_enabled, with_task_cache
+
+# Backend used when STORAGE_BACKEND is not set
+DEFAULT_BACKEND = 'dynamodb'
+
+_storage = None
+_storage_lock = threading.Lock()
+_loop = None
+_loop_lock = threading.Lock()
+
+def create_storage(backend):
+    """
+    Build the repositories of a storage backend
+    
+    Backends are imported on demand so a deployment only loads the client
+    library it uses.
+    
+    Args:
+        backend: 'dynamodb', 'mongodb' or 'memory'
+        
+    Returns:
+        Storage: Repositories of the backend
+    """
+    if backend == 'dynamodb':
+        from .dynamodb import create_dynamodb_storage
+        return create_dynamodb_storage()
+    if backend == 'mongodb':
+        from .mongodb import create_mongodb_storage
+        return create_mongodb_storage()
+    if backend == 'memory':
+        from .memory import create_memory_storage
+        return create_memory_storage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def get_storage():
+    """
+    Get the repositories selected by STORAGE_BACKEND, created once per container
+    
+    Task reads go through the read-through cache unless TASK_CACHE is off.
+    
+    Returns:
+        Storage: Repositories shared by every handler
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                storage = create_storage(os.environ.get('STORAGE_BACKEND', DEFAULT_BACKEND).lower())
+                if cache_enabled():
+                    storage = with_task_cache(storage)
+                _storage = storage
+    return _storage
+
+def set_storage(storage):
+    """
+    Replace the container's repositories, e.g. with an in-memory store for load tests
+    
+    Args:
+        storage: Storage to use, or None to rebuild from STORAGE_BACKEND
+    """
+    global _storage
+    with _storage_lock:
+        _storage = storage
+
+def get_loop():
+    """
+    Get the container's event loop, running in a background thread
+    
+    Async clients (like motor) bind to the loop they were first used on, so
+    every call goes through this one loop whichever thread it comes from.
+    
+    Returns:
+        AbstractEventLoop: Running event loop
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='storage-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+def run(coroutine):
+    """
+    Run a repository coroutine from synchronous handler code
+    
+    Args:
+        coroutine: Awaitable returned by a repository method
+        
+    Returns:
+        Result of the coroutine
+    """
+    # The loop thread does not see the handler's context, pass the request's
+    # DynamoDB metrics on
+    collector = current_collector()
+    if collector is not None:
+        coroutine = bind(collector, coroutine)
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result()
@@ -0,0 +1,231 @@
+class StorageError(Exception):
+    """
+    Base class for errors raised by the storage repositories
+    """
+
+class UsernameTaken(StorageError):
+    """
+    Raised when registering a username that already exists
+    """
+
+class InvalidCursor(StorageError):
+    """
+    Raised when a pagination cursor cannot be decoded or belongs to another user
+    """
+
+# Outcomes reported per update/delete by TaskRepository.apply_changes
+OK = 'ok'
+NOT_FOUND = 'not_found'
+CONFLICT = 'conflict'
+ERROR = 'error'
+
+class UserRepository:
+    """
+    Async access to users and their credentials
+    """
+    
+    async def create_user(self, user):
+        """
+        Store a new user together with its username credentials
+        
+        Args:
+            user: User item (user_id, username, password hash, created_at)
+            
+        Raises:
+            UsernameTaken: If the username is already registered
+        """
+        raise NotImplementedError
+    
+    async def get_credentials(self, username):
+        """
+        Get what login needs to authenticate a username
+        
+        Args:
+            username: Username to look up
+            
+        Returns:
+            dict: user_id, username and password hash, or None if unknown
+        """
+        raise NotImplementedError
+
+class TaskRepository:
+    """
+    Async access to tasks and their per-user statistics
+    
+    Every method is scoped to the owner, so a task of another user is never
+    returned or modified.
+    """
+    
+    async def create_task(self, task):
+        """
+        Store a new task and count it in the owner's statistics
+        
+        Args:
+            task: Task item, as built by tasks.model.new_task
+        """
+        raise NotImplementedError
+    
+    async def create_tasks(self, tasks):
+        """
+        Store many new tasks of one owner
+        
+        Args:
+            tasks: Task items
+            
+        Returns:
+            list: True for every task that was stored, False otherwise
+        """
+        raise NotImplementedError
+    
+    async def get_task(self, user_id, task_id, fields=None):
+        """
+        Get one task
+        
+        Args:
+            user_id: Owner of the task
+            task_id: Task to get
+            fields: Attributes to read, None for every attribute
+            
+        Returns:
+            dict: Task, or None if it does not exist
+        """
+        raise NotImplementedError
+    
+    async def list_tasks(self, user_id, limit, cursor=None, status=None, sort='created_at', descending=False, fields=None, version=None):
+        """
+        Get one page of a user's tasks, oldest first by default
+        
+        Args:
+            user_id: Owner of the tasks
+            limit: Maximum number of tasks to return
+            cursor: Opaque cursor returned with the previous page
+            status: Only return tasks with this status
+            sort: Attribute to sort on, 'created_at' or 'updated_at'
+            descending: Return the most recent tasks first
+            fields: Attributes to read, None for every attribute
+            version: Result of get_version read just before, if the caller
+                has it; a cache can then reuse pages read under that version
+            
+        Returns:
+            tuple: (tasks, cursor for the next page or None)
+            
+        Raises:
+            InvalidCursor: If the cursor is malformed, foreign or was issued
+                for another status or sort
+        """
+        raise NotImplementedError
+    
+    async def list_all_tasks(self, user_id, fields=None):
+        """
+        Get every task of a user in one list
+        
+        Args:
+            user_id: Owner of the tasks
+            fields: Attributes to read, None for every attribute
+        
+        Returns:
+            list: Tasks, oldest first
+        """
+        raise NotImplementedError
+    
+    async def update_task(self, user_id, task_id, changes):
+        """
+        Apply changes to an existing task
+        
+        Args:
+            user_id: Owner of the task
+            task_id: Task to update
+            changes: Attributes to set, as built by tasks.model.task_changes
+            
+        Returns:
+            dict: Updated task, or None if it does not exist. A backend that
+            writes without reading may return only its key and the changes.
+        """
+        raise NotImplementedError
+    
+    async def delete_task(self, user_id, task_id):
+        """
+        Delete a task
+        
+        Returns:
+            dict: Deleted task, or None if it did not exist
+        """
+        raise NotImplementedError
+    
+    async def apply_changes(self, user_id, mutations):
+        """
+        Apply many updates and deletes of one owner
+        
+        Args:
+            user_id: Owner of the tasks
+            mutations: (action, task_id, changes) tuples, action being
+                'update' or 'delete' and changes None for deletes
+            
+        Returns:
+            list: (outcome, task) per mutation, outcome being OK, NOT_FOUND,
+            CONFLICT or ERROR and task the updated or deleted task
+        """
+        raise NotImplementedError
+    
+    async def get_stats(self, user_id):
+        """
+        Get a user's task counters
+        
+        Returns:
+            dict: total, todo, in_progress and completed counts
+        """
+        raise NotImplementedError
+    
+    async def search_tasks(self, user_id, query_tokens, limit):
+        """
+        Find a user's tasks whose title or description match every token
+        
+        Args:
+            user_id: Owner of the tasks
+            query_tokens: Tokens from tasks.search.parse_query, each matched
+                as a prefix
+            limit: Maximum number of tasks to return
+            
+        Returns:
+            tuple: Tasks, best match first, and True if a token matched more
+            than tasks.search.MAX_POSTINGS_PER_TOKEN postings, of which only
+            the first in term order were ranked
+        """
+        raise NotImplementedError
+    
+    async def get_version(self, user_id):
+        """
+        Get a marker that changes on every write to a user's tasks
+        
+        Returns:
+            int: Version, read consistently with the user's last write
+        """
+        raise NotImplementedError
+    
+    async def list_changes(self, user_id, since, limit):
+        """
+        Get the tasks written and deleted after a position in a user's changes
+        
+        Args:
+            user_id: Owner of the tasks
+            since: (time, task_id) from tasks.changes.decode_watermark, None
+                to read from the start
+            limit: Page size; up to limit + 1 entries of each kind are
+                returned so the caller knows whether more follow
+            
+        Returns:
+            tuple: (tasks whose (updated_at, task_id) is after since,
+            tombstones with task_id and deleted_at after since), each
+            oldest first
+        """
+        raise NotImplementedError
+
+class Storage:
+    """
+    The repositories of one storage backend
+    """
+    
+    def __init__(self, name, users, tasks):
+        self.name = name
+        self.users = users
+        self.tasks = tasks
@@ -0,0 +1,403 @@
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from ..metrics import register_stats
+from ..responses import dumps
+from ..tasks.model import select_fields
+from ..tasks.pagination import MAX_PAGE_SIZE
+from .base import TaskRepository, Storage
+
+# TASK_CACHE=false turns the cache off
+DEFAULT_CACHE_ENABLED = 'true'
+
+# Entries in the in-process tier, and their lifetime in seconds. Writes in
+# other containers do not reach this tier, so it only holds listing pages
+# keyed by the owner's version, which no write can leave stale.
+LOCAL_CACHE_SIZE = int(os.environ.get('TASK_CACHE_SIZE', '2048'))
+LOCAL_CACHE_TTL = float(os.environ.get('TASK_CACHE_TTL', '5'))
+
+# Optional shared tier, e.g. redis://localhost:6379/0, invalidated by every
+# container so its entries can live longer
+SHARED_CACHE_URL = os.environ.get('TASK_CACHE_URL')
+SHARED_CACHE_TTL = float(os.environ.get('TASK_CACHE_SHARED_TTL', '60'))
+
+KEY_PREFIX = 'tasks'
+
+class LocalCache:
+    """
+    In-process cache evicting the least recently used entry, with a TTL
+    
+    The handlers run in threadpool threads and the metrics are read from
+    there too, so every access holds the lock.
+    """
+    
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Get an entry
+        
+        Returns:
+            tuple: (value, stored_at), or None if missing or expired
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[1] >= self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+    
+    def set(self, key, value, stored_at=None):
+        with self.lock:
+            self.entries[key] = (value, stored_at or time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+    
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class SharedCache:
+    """
+    Cache shared by every container, on a Redis-compatible server
+    
+    Values are stored as JSON together with the time they were stored, so
+    hits can report their age. Every entry belongs to a scope, a single task
+    or all listings of a user, and is stored under the scope's current
+    generation, a random token. Invalidating a scope replaces its generation,
+    so a value read before a write in any container is stored where no
+    lookup will find it again. Generations are never reused, so an evicted
+    or expired one only costs misses.
+    """
+    
+    def __init__(self, client, ttl):
+        self.client = client
+        self.ttl_ms = int(ttl * 1000)
+    
+    async def generation(self, scope):
+        """
+        Get the current generation of a scope, starting one if it has none
+        
+        Returns:
+            str: Generation, or None if it expired meanwhile
+        """
+        async with self.client.pipeline(transaction=False) as pipeline:
+            pipeline.set(scope, uuid.uuid4().hex, nx=True, px=self.ttl_ms)
+            pipeline.get(scope)
+            _, generation = await pipeline.execute()
+        return generation.decode('utf-8') if generation is not None else None
+    
+    async def get(self, scope, key):
+        """
+        Get an entry of the scope's current generation
+        
+        Returns:
+            tuple: ((value, stored_at) or None, generation to store a miss under)
+        """
+        generation = await self.generation(scope)
+        if generation is None:
+            return None, None
+        raw = await self.client.get(f'{key}@{generation}')
+        if raw is None:
+            return None, generation
+        entry = json.loads(raw)
+        return (entry['value'], entry['stored_at']), generation
+    
+    async def set(self, scope, key, generation, value, stored_at):
+        raw = dumps({'value': value, 'stored_at': stored_at})
+        async with self.client.pipeline(transaction=False) as pipeline:
+            pipeline.set(f'{key}@{generation}', raw, px=self.ttl_ms)
+            # The generation must outlive its entries
+            pipeline.pexpire(scope, self.ttl_ms)
+            await pipeline.execute()
+    
+    async def invalidate(self, scopes):
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for scope in scopes:
+                pipeline.set(scope, uuid.uuid4().hex, px=self.ttl_ms)
+            await pipeline.execute()
+
+class CacheStats:
+    """
+    Hit, miss and staleness counters of the task cache
+    
+    Staleness is the age of the entries served from the cache, the longest
+    a served value may have missed a write made elsewhere.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0}
+            self.staleness_total = 0.0
+            self.staleness_max = 0.0
+    
+    def count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+    
+    def hit(self, tier, stored_at):
+        age = max(time.time() - stored_at, 0.0)
+        with self.lock:
+            self.counters[f'{tier}_hits'] += 1
+            self.staleness_total += age
+            self.staleness_max = max(self.staleness_max, age)
+    
+    def snapshot(self):
+        """
+        Get the counters for the invocation log records
+        
+        Returns:
+            dict: Counters, hit_ratio and average/maximum staleness in ms
+        """
+        with self.lock:
+            hits = self.counters['local_hits'] + self.counters['shared_hits']
+            lookups = hits + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+                'avg_staleness_ms': round(self.staleness_total / hits * 1000, 1) if hits else 0.0,
+                'max_staleness_ms': round(self.staleness_max * 1000, 1)
+            }
+
+def task_key(user_id, task_id):
+    return f'{KEY_PREFIX}:{user_id}:task:{task_id}'
+
+def list_key(user_id, *params):
+    return f'{KEY_PREFIX}:{user_id}:list:' + dumps(params)
+
+def lists_key(user_id):
+    """
+    Shared tier scope of every listing of a user
+    """
+    return f'{KEY_PREFIX}:{user_id}:lists'
+
+class CachedTaskRepository(TaskRepository):
+    """
+    Read-through cache in front of another task repository
+    
+    Listing pages keyed by the owner's version are looked up in the
+    in-process tier, then in the shared tier, then read from the repository.
+    Single tasks carry no version, so only the shared tier, which every
+    container invalidates, holds them; without one they are not cached.
+    Every write starts a new shared tier generation of the written tasks and
+    of the listings of their owner, so a value read before the write is
+    never served, whichever container stores it. Other calls go straight to
+    the repository.
+    """
+    
+    def __init__(self, tasks, local, shared=None, stats=None):
+        self.tasks = tasks
+        self.local = local
+        self.shared = shared
+        self.stats = stats or CacheStats()
+    
+    async def _lookup(self, scope, key, local=True):
+        """
+        Look an entry up in the local tier, then in the scope of the shared tier
+        
+        Returns:
+            tuple: (value or None, shared tier generation to store a miss under)
+        """
+        if local:
+            entry = self.local.get(key)
+            if entry is not None:
+                self.stats.hit('local', entry[1])
+                return copy.deepcopy(entry[0]), None
+        
+        generation = None
+        if self.shared is not None:
+            try:
+                entry, generation = await self.shared.get(scope, key)
+            except Exception as e:
+                print(f"Error reading shared task cache: {str(e)}")
+                self.stats.count('errors')
+                entry = None
+            if entry is not None:
+                self.stats.hit('shared', entry[1])
+                if local:
+                    self.local.set(key, entry[0], entry[1])
+                return copy.deepcopy(entry[0]), generation
+        
+        self.stats.count('misses')
+        return None, generation
+    
+    async def _store(self, scope, key, generation, value, local=True):
+        stored_at = time.time()
+        if local:
+            self.local.set(key, copy.deepcopy(value), stored_at)
+        
+        # Without the generation read before the value, the value may
+        # predate a write
+        if self.shared is not None and generation is not None:
+            try:
+                await self.shared.set(scope, key, generation, value, stored_at)
+            except Exception as e:
+                print(f"Error writing shared task cache: {str(e)}")
+                self.stats.count('errors')
+    
+    async def invalidate(self, user_id, task_ids=()):
+        """
+        Make the cached copies of tasks and every listing of their owner unreachable
+        
+        The local tier only holds pages keyed by an older version, which the
+        write made unreachable, so the LRU evicts them.
+        
+        Args:
+            user_id: Owner of the tasks
+            task_ids: Tasks that were written
+        """
+        self.stats.count('invalidations')
+        
+        scopes = [task_key(user_id, task_id) for task_id in task_ids] + [lists_key(user_id)]
+        if self.shared is not None:
+            try:
+                await self.shared.invalidate(scopes)
+            except Exception as e:
+                print(f"Error invalidating shared task cache: {str(e)}")
+                self.stats.count('errors')
+    
+    async def get_task(self, user_id, task_id, fields=None):
+        """
+        Get a task from the shared tier, or from the repository
+        
+        The whole task is cached and the fields are selected from it, so
+        every projection of a task shares one entry, and a miss reads the
+        whole item even when fields are requested.
+        """
+        if self.shared is None:
+            return await self.tasks.get_task(user_id, task_id, fields)
+        
+        key = task_key(user_id, task_id)
+        task, generation = await self._lookup(key, key, local=False)
+        if task is None:
+            task = await self.tasks.get_task(user_id, task_id)
+            if task is None:
+                return None
+            await self._store(key, key, generation, task, local=False)
+        return select_fields(task, fields)
+    
+    async def list_tasks(self, user_id, limit, cursor=None, status=None, sort='created_at', descending=False, fields=None, version=None):
+        # Pages bigger than the API's, e.g. of an export, would only evict
+        # the entries worth keeping
+        if limit > MAX_PAGE_SIZE:
+            return await self.tasks.list_tasks(
+                user_id, limit, cursor, status=status, sort=sort, descending=descending, fields=fields
+            )
+        
+        # Pages read under the version the caller just read cannot miss a
+        # write, even one made in another container
+        local = version is not None
+        if not local and self.shared is None:
+            return await self.tasks.list_tasks(
+                user_id, limit, cursor, status=status, sort=sort, descending=descending, fields=fields
+            )
+        
+        scope = lists_key(user_id)
+        key = list_key(user_id, version, limit, cursor, status, sort, descending, fields)
+        page, generation = await self._lookup(scope, key, local)
+        if page is None:
+            items, next_token = await self.tasks.list_tasks(
+                user_id, limit, cursor, status=status, sort=sort, descending=descending, fields=fields
+            )
+            await self._store(scope, key, generation, [items, next_token], local=local)
+            return items, next_token
+        return page[0], page[1]
+    
+    async def list_all_tasks(self, user_id, fields=None):
+        return await self.tasks.list_all_tasks(user_id, fields)
+    
+    async def search_tasks(self, user_id, query_tokens, limit):
+        return await self.tasks.search_tasks(user_id, query_tokens, limit)
+    
+    async def get_stats(self, user_id):
+        return await self.tasks.get_stats(user_id)
+    
+    async def get_version(self, user_id):
+        return await self.tasks.get_version(user_id)
+    
+    async def list_changes(self, user_id, since, limit):
+        # A sync must see every write, so changes are never cached
+        return await self.tasks.list_changes(user_id, since, limit)
+    
+    async def create_task(self, task):
+        await self.tasks.create_task(task)
+        await self.invalidate(task['user_id'], [task['task_id']])
+    
+    async def create_tasks(self, tasks):
+        stored = await self.tasks.create_tasks(tasks)
+        if tasks:
+            await self.invalidate(tasks[0]['user_id'], [task['task_id'] for task in tasks])
+        return stored
+    
+    async def update_task(self, user_id, task_id, changes):
+        task = await self.tasks.update_task(user_id, task_id, changes)
+        await self.invalidate(user_id, [task_id])
+        return task
+    
+    async def delete_task(self, user_id, task_id):
+        task = await self.tasks.delete_task(user_id, task_id)
+        await self.invalidate(user_id, [task_id])
+        return task
+    
+    async def apply_changes(self, user_id, mutations):
+        results = await self.tasks.apply_changes(user_id, mutations)
+        await self.invalidate(user_id, [task_id for _, task_id, _ in mutations])
+        return results
+
+def cache_enabled():
+    """
+    Check whether task reads should be cached
+    
+    Returns:
+        bool: False when TASK_CACHE is set to a false-like value
+    """
+    return os.environ.get('TASK_CACHE', DEFAULT_CACHE_ENABLED).lower() not in ('0', 'false', 'no', 'off')
+
+def with_task_cache(storage):
+    """
+    Put the read-through cache in front of a backend's task repository
+    
+    The shared tier is used when TASK_CACHE_URL is set and the redis package
+    is installed. redis is only imported then, it is not part of the Lambda
+    layer.
+    
+    Args:
+        storage: Repositories of a backend
+    
+    Returns:
+        Storage: The same repositories, with cached task reads
+    """
+    shared = None
+    if SHARED_CACHE_URL:
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            print("TASK_CACHE_URL is set but the redis package is not installed, using the local cache only")
+        else:
+            shared = SharedCache(aioredis.from_url(SHARED_CACHE_URL), SHARED_CACHE_TTL)
+    
+    tasks = CachedTaskRepository(storage.tasks, LocalCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL), shared)
+    register_stats('task_cache', tasks.stats.snapshot)
+    return Storage(storage.name, storage.users, tasks)
@@ -0,0 +1,542 @@
+import asyncio
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from ..auth.credentials import credentials_item, get_credentials
+from ..db import (
+    get_dynamodb, get_table, batch_get, batch_write, transact_write, cancellation_codes,
+    cancelled_item, is_conditional_check_failed, BATCH_MAX_ATTEMPTS, USERS_TABLE, USERNAMES_TABLE, TASKS_TABLE, TASK_STATS_TABLE, TASK_TOMBSTONES_TABLE
+)
+from ..tasks.changes import new_tombstone, task_position
+from ..tasks.indexes import (
+    listing_index, with_index_keys, with_index_changes, strip_index_keys, user_status,
+    KEYS_ONLY_INDEXES, UPDATED_INDEX, USER_STATUS
+)
+from ..tasks.model import projection_expression, select_fields, update_expression
+from ..tasks.pagination import encode_token, decode_token
+from ..tasks.search import matches_query, rank
+from ..tasks.search_index import find_postings, remove_postings, stale_postings, update_index
+from ..tasks.stats import get_stats, get_version, new_stats_item, seed_stats, stats_update, status_delta
+from ..tasks.tombstones import find_tombstones, tombstone_item
+from .base import (
+    Storage, UserRepository, TaskRepository, UsernameTaken, InvalidCursor,
+    OK, NOT_FOUND, CONFLICT, ERROR
+)
+
+# Status a deleted task is assumed to have until the delete learns otherwise,
+# finished tasks being the ones usually cleared away
+DELETED_STATUS = 'completed'
+
+class DynamoDBUserRepository(UserRepository):
+    """
+    Users in the Users table, credentials in the Usernames table
+    """
+    
+    async def create_user(self, user):
+        await asyncio.to_thread(self._create_user, user)
+    
+    async def get_credentials(self, username):
+        return await asyncio.to_thread(get_credentials, username)
+    
+    def _create_user(self, user):
+        # Claim the username with the credentials item and put the user in one
+        # transaction, which also starts the user's counters already seeded
+        try:
+            get_dynamodb().meta.client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': USERNAMES_TABLE,
+                    'Item': credentials_item(user),
+                    'ConditionExpression': 'attribute_not_exists(username)'
+                }},
+                {'Put': {
+                    'TableName': USERS_TABLE,
+                    'Item': user,
+                    'ConditionExpression': 'attribute_not_exists(user_id)'
+                }},
+                {'Put': {
+                    'TableName': TASK_STATS_TABLE,
+                    'Item': new_stats_item(user['user_id']),
+                    'ConditionExpression': 'attribute_not_exists(user_id)'
+                }}
+            ])
+        except Exception as e:
+            codes = cancellation_codes(e)
+            if codes and codes[0] == 'ConditionalCheckFailed':
+                raise UsernameTaken(user['username'])
+            raise
+
+class DynamoDBTaskRepository(TaskRepository):
+    """
+    Tasks in the user_id/task_id keyed Tasks table, counters in TaskStats
+    
+    The boto3 calls are blocking, so each operation runs in a worker thread.
+    Task writes and the counter update they cause share one transaction, so
+    the stats version listing ETags come from changes exactly when the tasks
+    do.
+    """
+    
+    async def create_task(self, task):
+        await asyncio.to_thread(self._create_task, task)
+    
+    async def create_tasks(self, tasks):
+        return await asyncio.to_thread(self._create_tasks, tasks)
+    
+    async def get_task(self, user_id, task_id, fields=None):
+        return await asyncio.to_thread(self._get_task, user_id, task_id, fields)
+    
+    async def list_tasks(self, user_id, limit, cursor=None, status=None, sort='created_at', descending=False, fields=None, version=None):
+        return await asyncio.to_thread(self._list_tasks, user_id, limit, cursor, status, sort, descending, fields)
+    
+    async def list_all_tasks(self, user_id, fields=None):
+        return await asyncio.to_thread(self._list_all_tasks, user_id, fields)
+    
+    async def update_task(self, user_id, task_id, changes):
+        return await asyncio.to_thread(self._update_task, user_id, task_id, changes)
+    
+    async def delete_task(self, user_id, task_id):
+        return await asyncio.to_thread(self._delete_task, user_id, task_id)
+    
+    async def apply_changes(self, user_id, mutations):
+        return await asyncio.to_thread(self._apply_changes, user_id, mutations)
+    
+    async def get_stats(self, user_id):
+        return await asyncio.to_thread(get_stats, user_id)
+    
+    async def search_tasks(self, user_id, query_tokens, limit):
+        return await asyncio.to_thread(self._search_tasks, user_id, query_tokens, limit)
+    
+    async def get_version(self, user_id):
+        return await asyncio.to_thread(get_version, user_id)
+    
+    async def list_changes(self, user_id, since, limit):
+        return await asyncio.to_thread(self._list_changes, user_id, since, limit)
+    
+    def _create_task(self, task):
+        self._transact(task['user_id'], [
+            {'Put': {'TableName': TASKS_TABLE, 'Item': with_index_keys(task)}},
+            stats_update(task['user_id'], status_delta(new_status=task['status']))
+        ])
+        self._update_search_index(task['user_id'], [(None, task)])
+    
+    def _create_tasks(self, tasks):
+        # Put creates with BatchWriteItem, then count the stored ones
+        if not tasks:
+            return []
+        user_id = tasks[0]['user_id']
+        try:
+            unprocessed = batch_write(TASKS_TABLE, [{'PutRequest': {'Item': with_index_keys(task)}} for task in tasks])
+            failed_ids = {request['PutRequest']['Item']['task_id'] for request in unprocessed}
+        except Exception as e:
+            print(f"Error batch writing items to DynamoDB: {str(e)}")
+            failed_ids = {task['task_id'] for task in tasks}
+        
+        stored = [task['task_id'] not in failed_ids for task in tasks]
+        created = [task for task, ok in zip(tasks, stored) if ok]
+        if created:
+            self._count_created(user_id, created)
+            self._update_search_index(user_id, [(None, task) for task in created])
+        return stored
+    
+    def _count_created(self, user_id, tasks):
+        """
+        Add stored tasks to the counters with one stats update
+        
+        The update also moves the listing version past the batch. It runs
+        after the puts, so an ETag issued in between cannot outlive them.
+        """
+        update = stats_update(user_id, sum_deltas(status_delta(new_status=task['status']) for task in tasks))['Update']
+        del update['TableName']
+        stats_table = get_table(TASK_STATS_TABLE)
+        try:
+            stats_table.update_item(**update)
+        except Exception as e:
+            if not is_conditional_check_failed(e):
+                raise
+            # The tasks are already stored, so the seed leaves them to the update
+            seed_stats(user_id, exclude=[task['task_id'] for task in tasks])
+            stats_table.update_item(**update)
+    
+    def _get_task(self, user_id, task_id, fields):
+        # The key only matches tasks owned by the user
+        get_kwargs = {'Key': {'user_id': user_id, 'task_id': task_id}}
+        if fields:
+            get_kwargs.update(projection_expression(fields))
+        response = get_table(TASKS_TABLE).get_item(**get_kwargs)
+        return strip_index_keys(response.get('Item'))
+    
+    def _list_tasks(self, user_id, limit, cursor, status, sort, descending, fields):
+        """
+        Query a single bounded page of the user's tasks
+        
+        Listings other than by creation are read from the index keyed for
+        them, so a page is one Query. The status indexes only project keys,
+        so a status page's tasks are then read with one BatchGetItem.
+        """
+        index, partition_key, sort_key = listing_index(status, sort)
+        partition = user_status(user_id, status) if partition_key == USER_STATUS else user_id
+        query_kwargs = {
+            'KeyConditionExpression': Key(partition_key).eq(partition),
+            'ScanIndexForward': not descending,
+            'Limit': limit
+        }
+        if index:
+            query_kwargs['IndexName'] = index
+        if fields and index not in KEYS_ONLY_INDEXES:
+            query_kwargs.update(projection_expression(fields))
+        if cursor:
+            # A cursor of another listing would not fit this index
+            exclusive_start_key = decode_token(cursor, user_id, ('user_id', 'task_id', partition_key, sort_key))
+            if exclusive_start_key is None or exclusive_start_key[partition_key] != partition:
+                raise InvalidCursor(cursor)
+            query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+        
+        try:
+            response = get_table(TASKS_TABLE).query(**query_kwargs)
+        except ClientError as e:
+            # A start key DynamoDB still rejects came from the client
+            if cursor and e.response.get('Error', {}).get('Code') == 'ValidationException':
+                raise InvalidCursor(cursor)
+            raise
+        items = response.get('Items', [])
+        
+        if index in KEYS_ONLY_INDEXES:
+            items = self._get_tasks(user_id, [item['task_id'] for item in items], fields)
+        else:
+            items = [select_fields(strip_index_keys(task), fields) for task in items]
+        return items, encode_token(response.get('LastEvaluatedKey'))
+    
+    def _get_tasks(self, user_id, task_ids, fields):
+        """
+        Read tasks with BatchGetItem, in the order of their IDs
+        
+        Tasks deleted since their IDs were read are left out.
+        """
+        if not task_ids:
+            return []
+        get_kwargs = {}
+        if fields:
+            get_kwargs.update(projection_expression(list(dict.fromkeys(['task_id', *fields]))))
+        found = {
+            task['task_id']: strip_index_keys(task)
+            for task in batch_get(TASKS_TABLE, [
+                {'user_id': user_id, 'task_id': task_id} for task_id in task_ids
+            ], **get_kwargs)
+        }
+        return [select_fields(found[task_id], fields) for task_id in task_ids if task_id in found]
+    
+    def _list_all_tasks(self, user_id, fields):
+        tasks_table = get_table(TASKS_TABLE)
+        query_kwargs = {'KeyConditionExpression': Key('user_id').eq(user_id)}
+        if fields:
+            query_kwargs.update(projection_expression(fields))
+        response = tasks_table.query(**query_kwargs)
+        tasks = response.get('Items', [])
+        
+        # Handle pagination if there are more items
+        while 'LastEvaluatedKey' in response:
+            response = tasks_table.query(
+                ExclusiveStartKey=response['LastEvaluatedKey'],
+                **query_kwargs
+            )
+            tasks.extend(response.get('Items', []))
+        return [strip_index_keys(task) for task in tasks]
+    
+    def _update_task(self, user_id, task_id, changes):
+        # Without a status change the counters do not depend on the stored
+        # task; with one, the task is first assumed to have that status already
+        assumed = {'status': changes['status']} if 'status' in changes else {}
+        task, stored = self._write_task(user_id, task_id, assumed, lambda task: [
+            self._transact_action(user_id, 'update', task, changes),
+            stats_update(user_id, status_delta(task.get('status'), changes.get('status', task.get('status'))))
+        ])
+        if task is None:
+            return None
+        if stored:
+            self._update_search_index(user_id, [(task, {**task, **changes})])
+        elif 'title' in changes or 'description' in changes:
+            # The replaced text was not read; searches drop its postings
+            self._update_search_index(user_id, [(None, {**task, **changes})])
+        return {**task, **changes}
+    
+    def _delete_task(self, user_id, task_id):
+        # The tombstone is written with the delete, so no extra round trip
+        task, stored = self._write_task(user_id, task_id, {'status': DELETED_STATUS}, lambda task: [
+            self._transact_action(user_id, 'delete', task, None),
+            {'Put': {'TableName': TASK_TOMBSTONES_TABLE, 'Item': tombstone_item(user_id, new_tombstone(task_id))}},
+            stats_update(user_id, status_delta(old_status=task.get('status')))
+        ])
+        if task is None:
+            return None
+        if stored:
+            self._update_search_index(user_id, [(task, None)])
+        return task
+    
+    def _write_task(self, user_id, task_id, assumed, build_actions):
+        """
+        Write a task and the counters it changes without reading it first
+        
+        The task write is conditioned on the task existing under the user's
+        key, so a missing task or another user's cancels the transaction and
+        is reported as None. Counters that depend on the previous status are
+        built for an assumed status, which the condition also requires. When
+        the stored task has another status, the cancellation hands it back
+        (ReturnValuesOnConditionCheckFailure) and the transaction is built
+        again from it.
+        
+        Args:
+            user_id: Owner of the task, the key already scopes it to the user
+            task_id: Task to write
+            assumed: Attributes the task is assumed to have, e.g. its status
+            build_actions: Callable taking the task and returning the
+                TransactItems, the task's own write first
+        
+        Returns:
+            tuple: Task before the write, and True if it is the whole stored
+            task rather than its key and the assumed attributes; (None, False)
+            if it does not exist
+        """
+        task = {'user_id': user_id, 'task_id': task_id, **assumed}
+        stored = False
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            actions = build_actions(task)
+            next(iter(actions[0].values()))['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+            try:
+                self._transact(user_id, actions)
+                return task, stored
+            except Exception as e:
+                codes = cancellation_codes(e)
+                if not codes or codes[0] != 'ConditionalCheckFailed':
+                    raise
+                item = cancelled_item(e)
+                if item is None:
+                    return None, False
+                task = strip_index_keys(item)
+                stored = True
+        raise RuntimeError(f"Task {task_id} kept changing after {BATCH_MAX_ATTEMPTS} attempts")
+    
+    def _transact(self, user_id, transact_items):
+        """
+        Write a transaction whose last entry is the user's stats update
+        
+        The stats update is cancelled for a user whose counters were never
+        seeded; they are seeded from the stored tasks, which the cancelled
+        transaction did not change, and the transaction is written again.
+        """
+        client = get_dynamodb().meta.client
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+        except Exception as e:
+            codes = cancellation_codes(e)
+            if not codes or codes[-1] != 'ConditionalCheckFailed':
+                raise
+            seed_stats(user_id)
+            client.transact_write_items(TransactItems=transact_items)
+    
+    def _apply_changes(self, user_id, mutations):
+        """
+        Apply batched updates and deletes with TransactWriteItems
+        
+        The current tasks are read first with BatchGetItem so missing tasks
+        can be reported and the stats counters know the previous status. Each
+        write is conditioned on the task still existing (and on the status it
+        read, when the status counters depend on it), so a task changed in
+        between is reported as a conflict instead of corrupting the counters.
+        Each transaction also updates the counters of the writes it applies,
+        and puts the tombstone of each delete it applies.
+        """
+        try:
+            current = {
+                task['task_id']: strip_index_keys(task)
+                for task in batch_get(TASKS_TABLE, [
+                    {'user_id': user_id, 'task_id': task_id} for _, task_id, _ in mutations
+                ])
+            }
+        except Exception as e:
+            print(f"Error batch getting items from DynamoDB: {str(e)}")
+            return [(ERROR, None)] * len(mutations)
+        
+        results = [None] * len(mutations)
+        actions = []
+        deltas = []
+        pending = []
+        for index, (action, task_id, changes) in enumerate(mutations):
+            task = current.get(task_id)
+            if not task:
+                results[index] = (NOT_FOUND, None)
+                continue
+            if action == 'update':
+                actions.append(self._transact_action(user_id, action, task, changes))
+                deltas.append(status_delta(task.get('status'), changes.get('status', task.get('status'))))
+            else:
+                # A delete and its tombstone commit together, or not at all
+                actions.append([
+                    self._transact_action(user_id, action, task, changes),
+                    {'Put': {'TableName': TASK_TOMBSTONES_TABLE, 'Item': tombstone_item(user_id, new_tombstone(task_id))}}
+                ])
+                deltas.append(status_delta(old_status=task.get('status')))
+            pending.append(index)
+        
+        if actions:
+            try:
+                outcomes = transact_write(
+                    actions,
+                    lambda indexes: stats_update(user_id, sum_deltas(deltas[i] for i in indexes)),
+                    lambda: seed_stats(user_id)
+                )
+            except Exception as e:
+                print(f"Error writing transaction to DynamoDB: {str(e)}")
+                outcomes = ['Error'] * len(actions)
+        else:
+            outcomes = []
+        
+        changed_tasks = []
+        for index, outcome in zip(pending, outcomes):
+            action, task_id, changes = mutations[index]
+            task = current[task_id]
+            if outcome == 'ConditionalCheckFailed':
+                results[index] = (CONFLICT, None)
+            elif outcome:
+                results[index] = (ERROR, None)
+            elif action == 'update':
+                results[index] = (OK, {**task, **changes})
+                changed_tasks.append((task, {**task, **changes}))
+            else:
+                results[index] = (OK, task)
+                changed_tasks.append((task, None))
+        
+        if changed_tasks:
+            self._update_search_index(user_id, changed_tasks)
+        return results
+    
+    def _transact_action(self, user_id, action, task, changes):
+        """
+        Build the TransactWriteItems entry of one update or delete
+        """
+        key = {'user_id': user_id, 'task_id': task['task_id']}
+        
+        if action == 'update':
+            expression = update_expression(with_index_changes(user_id, changes))
+            if 'status' in changes:
+                guard_status(expression, task.get('status'))
+            return {'Update': {
+                'TableName': TASKS_TABLE,
+                'Key': key,
+                'UpdateExpression': expression['UpdateExpression'],
+                'ConditionExpression': expression['ConditionExpression'],
+                'ExpressionAttributeNames': expression['ExpressionAttributeNames'],
+                'ExpressionAttributeValues': expression['ExpressionAttributeValues']
+            }}
+        
+        expression = {
+            'ConditionExpression': 'attribute_exists(#task_id)',
+            'ExpressionAttributeNames': {'#task_id': 'task_id'},
+            'ExpressionAttributeValues': {}
+        }
+        guard_status(expression, task.get('status'))
+        delete = {
+            'TableName': TASKS_TABLE,
+            'Key': key,
+            'ConditionExpression': expression['ConditionExpression'],
+            'ExpressionAttributeNames': expression['ExpressionAttributeNames']
+        }
+        if expression['ExpressionAttributeValues']:
+            delete['ExpressionAttributeValues'] = expression['ExpressionAttributeValues']
+        return {'Delete': delete}
+    
+    def _list_changes(self, user_id, since, limit):
+        """
+        Read the tasks written and deleted after a position
+        
+        Written tasks come from the user's partition of UserUpdatedIndex and
+        deleted ones from their tombstones, so both reads start at the
+        watermark and cost what changed since, not the size of the account.
+        """
+        key_condition = Key('user_id').eq(user_id)
+        if since:
+            # Tasks updated at the watermark's own time are read again and
+            # skipped up to its task
+            key_condition &= Key('updated_at').gte(since[0])
+        query_kwargs = {
+            'IndexName': UPDATED_INDEX,
+            'KeyConditionExpression': key_condition,
+            'Limit': limit + 1
+        }
+        tasks_table = get_table(TASKS_TABLE)
+        tasks = []
+        while True:
+            response = tasks_table.query(**query_kwargs)
+            tasks.extend(
+                strip_index_keys(task) for task in response.get('Items', [])
+                if not since or task_position(task) > since
+            )
+            if len(tasks) > limit or 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        tasks.sort(key=task_position)
+        return tasks[:limit + 1], find_tombstones(user_id, since, limit + 1)
+    
+    def _search_tasks(self, user_id, query_tokens, limit):
+        # One prefix Query per token, then the best matches in one BatchGetItem
+        found = [find_postings(user_id, token) for token in query_tokens]
+        matches = [postings for postings, _ in found]
+        truncated = any(more for _, more in found)
+        ranked = rank(query_tokens, matches, limit)
+        tasks = self._get_tasks(user_id, ranked, None)
+        
+        # Postings of deleted tasks and of replaced text may still match
+        current = {task_id: None for task_id in ranked}
+        current.update((task['task_id'], task) for task in tasks)
+        stale = stale_postings(matches, current)
+        if stale:
+            try:
+                remove_postings(user_id, stale)
+            except Exception as e:
+                print(f"Error removing stale search postings in DynamoDB: {str(e)}")
+        return [task for task in tasks if matches_query(task, query_tokens)], truncated
+    
+    def _update_search_index(self, user_id, changed_tasks):
+        # The index can be rebuilt, so a failed update must not fail the write
+        try:
+            update_index(user_id, changed_tasks)
+        except Exception as e:
+            print(f"Error updating task search index in DynamoDB: {str(e)}")
+
+
+def guard_status(expression, status):
+    """
+    Extend a write condition to require the status that was read
+    
+    Args:
+        expression: Expression kwargs to extend in place
+        status: Status the task had when it was read
+    """
+    if status is None:
+        expression['ConditionExpression'] += ' AND attribute_not_exists(#status)'
+    else:
+        expression['ConditionExpression'] += ' AND #status = :expected_status'
+        expression['ExpressionAttributeValues'][':expected_status'] = status
+    expression['ExpressionAttributeNames']['#status'] = 'status'
+
+def sum_deltas(deltas):
+    """
+    Add up sets of counter changes
+    
+    Args:
+        deltas: Iterable of counter changes
+        
+    Returns:
+        dict: Counter name to total increment
+    """
+    total = {}
+    for delta in deltas:
+        for counter, value in delta.items():
+            total[counter] = total.get(counter, 0) + value
+    return total
+
+def create_dynamodb_storage():
+    """
+    Build the DynamoDB repositories
+    
+    Returns:
+        Storage: DynamoDB-backed repositories
+    """
+    return Storage('dynamodb', DynamoDBUserRepository(), DynamoDBTaskRepository())
@@ -0,0 +1,194 @@
+import bisect
+import copy
+from ..tasks.changes import new_tombstone, task_position, tombstone_position
+from ..tasks.pagination import encode_token, decode_token
+from ..tasks.search import rank, task_postings, MAX_POSTINGS_PER_TOKEN
+from ..tasks.model import VALID_STATUSES, select_fields
+from .base import (
+    Storage, UserRepository, TaskRepository, UsernameTaken, InvalidCursor,
+    OK, NOT_FOUND
+)
+
+class MemoryUserRepository(UserRepository):
+    """
+    Users kept in process memory
+    """
+    
+    def __init__(self):
+        self.users = {}
+        self.credentials = {}
+    
+    async def create_user(self, user):
+        if user['username'] in self.credentials:
+            raise UsernameTaken(user['username'])
+        self.users[user['user_id']] = dict(user)
+        self.credentials[user['username']] = {
+            'user_id': user['user_id'],
+            'username': user['username'],
+            'password': user['password']
+        }
+    
+    async def get_credentials(self, username):
+        credentials = self.credentials.get(username)
+        return dict(credentials) if credentials else None
+
+class MemoryTaskRepository(TaskRepository):
+    """
+    Tasks kept in process memory, one dict per user sorted by task_id
+    
+    Useful for local development and for load tests that should not depend
+    on a cloud backend. Every call runs on the storage event loop, so no
+    locking is needed.
+    """
+    
+    def __init__(self):
+        self.tasks = {}
+        self.versions = {}
+        self.tombstones = {}
+        # Per user search index: token to {task_id: weight}, and the sorted
+        # tokens so prefixes are found by bisection
+        self.postings = {}
+        self.terms = {}
+    
+    def _user_tasks(self, user_id):
+        return self.tasks.setdefault(user_id, {})
+    
+    def _changed(self, user_id):
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+    
+    def _reindex(self, user_id, old_task, new_task):
+        postings = self.postings.setdefault(user_id, {})
+        terms = self.terms.setdefault(user_id, [])
+        task_id = (new_task or old_task)['task_id']
+        for token in task_postings(old_task) if old_task else {}:
+            postings[token].pop(task_id, None)
+            if not postings[token]:
+                del postings[token]
+                del terms[bisect.bisect_left(terms, token)]
+        for token, weight in (task_postings(new_task) if new_task else {}).items():
+            if token not in postings:
+                postings[token] = {}
+                bisect.insort(terms, token)
+            postings[token][task_id] = weight
+    
+    async def create_task(self, task):
+        self._user_tasks(task['user_id'])[task['task_id']] = copy.deepcopy(task)
+        self._changed(task['user_id'])
+        self._reindex(task['user_id'], None, task)
+    
+    async def create_tasks(self, tasks):
+        for task in tasks:
+            await self.create_task(task)
+        return [True] * len(tasks)
+    
+    async def get_task(self, user_id, task_id, fields=None):
+        task = self._user_tasks(user_id).get(task_id)
+        return select_fields(copy.deepcopy(task), fields) if task else None
+    
+    async def list_tasks(self, user_id, limit, cursor=None, status=None, sort='created_at', descending=False, fields=None, version=None):
+        user_tasks = self._user_tasks(user_id)
+        # created_at order is task_id order, as with the DynamoDB table
+        sort_key = 'task_id' if sort == 'created_at' else sort
+        positions = sorted(
+            (user_tasks[task_id].get(sort_key, ''), task_id)
+            for task_id in user_tasks
+            if not status or user_tasks[task_id].get('status') == status
+        )
+        if descending:
+            positions.reverse()
+        if cursor:
+            start_key = decode_token(cursor, user_id, ('user_id', 'task_id', sort_key))
+            if start_key is None:
+                raise InvalidCursor(cursor)
+            start = (start_key[sort_key], start_key['task_id'])
+            positions = [p for p in positions if (p < start if descending else p > start)]
+        
+        page = positions[:limit]
+        next_token = None
+        if len(positions) > limit:
+            value, task_id = page[-1]
+            next_token = encode_token({'user_id': user_id, 'task_id': task_id, sort_key: value})
+        return [select_fields(copy.deepcopy(user_tasks[task_id]), fields) for _, task_id in page], next_token
+    
+    async def list_all_tasks(self, user_id, fields=None):
+        user_tasks = self._user_tasks(user_id)
+        return [select_fields(copy.deepcopy(user_tasks[task_id]), fields) for task_id in sorted(user_tasks)]
+    
+    async def update_task(self, user_id, task_id, changes):
+        task = self._user_tasks(user_id).get(task_id)
+        if task is None:
+            return None
+        old_task = dict(task)
+        task.update(changes)
+        self._changed(user_id)
+        self._reindex(user_id, old_task, task)
+        return copy.deepcopy(task)
+    
+    async def delete_task(self, user_id, task_id):
+        task = self._user_tasks(user_id).pop(task_id, None)
+        if task is not None:
+            self._changed(user_id)
+            self._reindex(user_id, task, None)
+            self.tombstones.setdefault(user_id, []).append(new_tombstone(task_id))
+        return task
+    
+    async def apply_changes(self, user_id, mutations):
+        results = []
+        for action, task_id, changes in mutations:
+            if action == 'update':
+                task = await self.update_task(user_id, task_id, changes)
+            else:
+                task = await self.delete_task(user_id, task_id)
+            results.append((OK, task) if task else (NOT_FOUND, None))
+        return results
+    
+    async def get_stats(self, user_id):
+        stats = {'total': 0, **{status: 0 for status in VALID_STATUSES}}
+        for task in self._user_tasks(user_id).values():
+            stats['total'] += 1
+            if task.get('status') in VALID_STATUSES:
+                stats[task['status']] += 1
+        return stats
+    
+    async def search_tasks(self, user_id, query_tokens, limit):
+        postings = self.postings.get(user_id, {})
+        terms = self.terms.get(user_id, [])
+        matches = []
+        truncated = False
+        for token in query_tokens:
+            token_matches = []
+            position = bisect.bisect_left(terms, token)
+            while position < len(terms) and terms[position].startswith(token):
+                term = terms[position]
+                token_matches.extend((term, task_id, weight) for task_id, weight in sorted(postings[term].items()))
+                position += 1
+            truncated = truncated or len(token_matches) > MAX_POSTINGS_PER_TOKEN
+            matches.append(token_matches[:MAX_POSTINGS_PER_TOKEN])
+        
+        user_tasks = self._user_tasks(user_id)
+        return [copy.deepcopy(user_tasks[task_id]) for task_id in rank(query_tokens, matches, limit)], truncated
+    
+    async def get_version(self, user_id):
+        return self.versions.get(user_id, 0)
+    
+    async def list_changes(self, user_id, since, limit):
+        tasks = sorted(
+            (task for task in self._user_tasks(user_id).values() if not since or task_position(task) > since),
+            key=task_position
+        )
+        tombstones = [
+            {'task_id': tombstone['task_id'], 'deleted_at': tombstone['deleted_at']}
+            for tombstone in self.tombstones.get(user_id, [])
+            if not since or tombstone_position(tombstone) > since
+        ]
+        tombstones.sort(key=tombstone_position)
+        return copy.deepcopy(tasks[:limit + 1]), tombstones[:limit + 1]
+
+def create_memory_storage():
+    """
+    Build empty in-memory repositories
+    
+    Returns:
+        Storage: In-memory repositories
+    """
+    return Storage('memory', MemoryUserRepository(), MemoryTaskRepository())
@@ -0,0 +1,307 @@
+import os
+import re
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, DeleteMany, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from ..tasks.changes import new_tombstone
+from ..tasks.model import VALID_STATUSES, select_fields
+from ..tasks.pagination import encode_token, decode_token
+from ..tasks.search import rank, task_postings, MAX_POSTINGS_PER_TOKEN
+from .base import (
+    Storage, UserRepository, TaskRepository, UsernameTaken, InvalidCursor,
+    OK, NOT_FOUND
+)
+
+DEFAULT_DATABASE = 'task-management'
+
+# Never hand Mongo's internal _id back to the handlers
+NO_ID = {'_id': 0}
+
+def projection(fields):
+    """
+    Build a find projection reading only the selected attributes
+    
+    Args:
+        fields: Attributes to read, None for every attribute
+        
+    Returns:
+        dict: Projection without _id
+    """
+    if not fields:
+        return NO_ID
+    return {**NO_ID, **{name: 1 for name in fields}}
+
+class MongoIndexes:
+    """
+    Create the collection indexes once per container, on first use
+    """
+    
+    def __init__(self, database):
+        self.database = database
+        self.ready = False
+    
+    async def ensure(self):
+        if self.ready:
+            return
+        await self.database.users.create_index([('username', ASCENDING)], unique=True)
+        await self.database.tasks.create_index(
+            [('user_id', ASCENDING), ('task_id', ASCENDING)], unique=True
+        )
+        await self.database.tasks.create_index([('user_id', ASCENDING), ('updated_at', ASCENDING)])
+        await self.database.tasks.create_index(
+            [('user_id', ASCENDING), ('status', ASCENDING), ('task_id', ASCENDING)]
+        )
+        await self.database.tasks.create_index(
+            [('user_id', ASCENDING), ('status', ASCENDING), ('updated_at', ASCENDING)]
+        )
+        await self.database.task_terms.create_index(
+            [('user_id', ASCENDING), ('token', ASCENDING), ('task_id', ASCENDING)], unique=True
+        )
+        await self.database.task_tombstones.create_index(
+            [('user_id', ASCENDING), ('deleted_at', ASCENDING), ('task_id', ASCENDING)]
+        )
+        await self.database.task_tombstones.create_index('expires', expireAfterSeconds=0)
+        self.ready = True
+
+class MongoUserRepository(UserRepository):
+    """
+    Users in the users collection, unique on username
+    """
+    
+    def __init__(self, database, indexes):
+        self.users = database.users
+        self.indexes = indexes
+    
+    async def create_user(self, user):
+        await self.indexes.ensure()
+        try:
+            await self.users.insert_one({'_id': user['user_id'], **user})
+        except DuplicateKeyError:
+            raise UsernameTaken(user['username'])
+    
+    async def get_credentials(self, username):
+        await self.indexes.ensure()
+        return await self.users.find_one(
+            {'username': username},
+            {'_id': 0, 'user_id': 1, 'username': 1, 'password': 1}
+        )
+
+class MongoTaskRepository(TaskRepository):
+    """
+    Tasks in the tasks collection, indexed on (user_id, task_id)
+    """
+    
+    def __init__(self, database, indexes):
+        self.tasks = database.tasks
+        self.versions = database.task_versions
+        self.terms = database.task_terms
+        self.tombstones = database.task_tombstones
+        self.indexes = indexes
+    
+    async def _changed(self, user_id):
+        # One document per user, keyed by user_id, bumped after every write
+        await self.versions.update_one({'_id': user_id}, {'$inc': {'version': 1}}, upsert=True)
+    
+    async def _reindex(self, user_id, changed_tasks):
+        # Search postings, one document per user, token and task
+        operations = []
+        for old_task, new_task in changed_tasks:
+            task_id = (new_task or old_task)['task_id']
+            old_postings = task_postings(old_task) if old_task else {}
+            new_postings = task_postings(new_task) if new_task else {}
+            removed = list(old_postings.keys() - new_postings.keys())
+            if removed:
+                operations.append(DeleteMany({'user_id': user_id, 'task_id': task_id, 'token': {'$in': removed}}))
+            for token, weight in new_postings.items():
+                if old_postings.get(token) != weight:
+                    operations.append(UpdateOne(
+                        {'user_id': user_id, 'token': token, 'task_id': task_id},
+                        {'$set': {'weight': weight}},
+                        upsert=True
+                    ))
+        if operations:
+            await self.terms.bulk_write(operations, ordered=False)
+    
+    async def create_task(self, task):
+        await self.indexes.ensure()
+        await self.tasks.insert_one(dict(task))
+        await self._changed(task['user_id'])
+        await self._reindex(task['user_id'], [(None, task)])
+    
+    async def create_tasks(self, tasks):
+        await self.indexes.ensure()
+        if not tasks:
+            return []
+        try:
+            await self.tasks.insert_many([dict(task) for task in tasks], ordered=False)
+            stored = [True] * len(tasks)
+        except BulkWriteError as e:
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            stored = [index not in failed for index in range(len(tasks))]
+        await self._changed(tasks[0]['user_id'])
+        await self._reindex(tasks[0]['user_id'], [(None, task) for task, ok in zip(tasks, stored) if ok])
+        return stored
+    
+    async def get_task(self, user_id, task_id, fields=None):
+        await self.indexes.ensure()
+        return await self.tasks.find_one({'user_id': user_id, 'task_id': task_id}, projection(fields))
+    
+    async def list_tasks(self, user_id, limit, cursor=None, status=None, sort='created_at', descending=False, fields=None, version=None):
+        await self.indexes.ensure()
+        # created_at order is task_id order, task_id breaks updated_at ties
+        sort_key = 'task_id' if sort == 'created_at' else sort
+        direction = DESCENDING if descending else ASCENDING
+        query = {'user_id': user_id}
+        if status:
+            query['status'] = status
+        if cursor:
+            start_key = decode_token(cursor, user_id, ('user_id', 'task_id', sort_key))
+            if start_key is None:
+                raise InvalidCursor(cursor)
+            after = '$lt' if descending else '$gt'
+            if sort_key == 'task_id':
+                query['task_id'] = {after: start_key['task_id']}
+            else:
+                query['$or'] = [
+                    {sort_key: {after: start_key[sort_key]}},
+                    {sort_key: start_key[sort_key], 'task_id': {after: start_key['task_id']}}
+                ]
+        
+        # Fetch one extra task to know whether another page exists
+        order = [(sort_key, direction)] if sort_key == 'task_id' else [(sort_key, direction), ('task_id', direction)]
+        # The cursor needs task_id and the sort attribute even if not selected
+        read_fields = fields and list(dict.fromkeys([*fields, 'task_id', sort_key]))
+        tasks = await self.tasks.find(query, projection(read_fields)).sort(order).to_list(limit + 1)
+        next_token = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            next_token = encode_token({'user_id': user_id, 'task_id': last['task_id'], sort_key: last.get(sort_key)})
+        return [select_fields(task, fields) for task in tasks], next_token
+    
+    async def list_all_tasks(self, user_id, fields=None):
+        await self.indexes.ensure()
+        return await self.tasks.find({'user_id': user_id}, projection(fields)).sort('task_id', ASCENDING).to_list(None)
+    
+    async def update_task(self, user_id, task_id, changes):
+        await self.indexes.ensure()
+        old_task = await self.tasks.find_one_and_update(
+            {'user_id': user_id, 'task_id': task_id},
+            {'$set': changes},
+            projection=NO_ID,
+            return_document=ReturnDocument.BEFORE
+        )
+        if old_task is None:
+            return None
+        task = {**old_task, **changes}
+        await self._changed(user_id)
+        await self._reindex(user_id, [(old_task, task)])
+        return task
+    
+    async def delete_task(self, user_id, task_id):
+        await self.indexes.ensure()
+        task = await self.tasks.find_one_and_delete(
+            {'user_id': user_id, 'task_id': task_id},
+            projection=NO_ID
+        )
+        if task is not None:
+            await self._changed(user_id)
+            await self._reindex(user_id, [(task, None)])
+            tombstone = new_tombstone(task_id)
+            # Mongo's TTL index expires documents by a date
+            await self.tombstones.insert_one({
+                'user_id': user_id,
+                'task_id': task_id,
+                'deleted_at': tombstone['deleted_at'],
+                'expires': datetime.fromtimestamp(tombstone['expires_at'], timezone.utc)
+            })
+        return task
+    
+    async def apply_changes(self, user_id, mutations):
+        results = []
+        for action, task_id, changes in mutations:
+            if action == 'update':
+                task = await self.update_task(user_id, task_id, changes)
+            else:
+                task = await self.delete_task(user_id, task_id)
+            results.append((OK, task) if task else (NOT_FOUND, None))
+        return results
+    
+    async def get_stats(self, user_id):
+        await self.indexes.ensure()
+        stats = {'total': 0, **{status: 0 for status in VALID_STATUSES}}
+        async for group in self.tasks.aggregate([
+            {'$match': {'user_id': user_id}},
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+        ]):
+            stats['total'] += group['count']
+            if group['_id'] in VALID_STATUSES:
+                stats[group['_id']] = group['count']
+        return stats
+    
+    async def search_tasks(self, user_id, query_tokens, limit):
+        await self.indexes.ensure()
+        matches = []
+        truncated = False
+        for token in query_tokens:
+            # An anchored prefix regex is answered from the (user_id, token) index
+            cursor = self.terms.find(
+                {'user_id': user_id, 'token': {'$regex': '^' + re.escape(token)}},
+                {'_id': 0, 'token': 1, 'task_id': 1, 'weight': 1}
+            ).sort('token', 1).limit(MAX_POSTINGS_PER_TOKEN + 1)
+            token_matches = [
+                (posting['token'], posting['task_id'], posting['weight'])
+                async for posting in cursor
+            ]
+            truncated = truncated or len(token_matches) > MAX_POSTINGS_PER_TOKEN
+            matches.append(token_matches[:MAX_POSTINGS_PER_TOKEN])
+        
+        task_ids = rank(query_tokens, matches, limit)
+        found = {
+            task['task_id']: task
+            async for task in self.tasks.find({'user_id': user_id, 'task_id': {'$in': task_ids}}, NO_ID)
+        }
+        return [found[task_id] for task_id in task_ids if task_id in found], truncated
+    
+    async def get_version(self, user_id):
+        document = await self.versions.find_one({'_id': user_id})
+        return document['version'] if document else 0
+    
+    async def list_changes(self, user_id, since, limit):
+        await self.indexes.ensure()
+        # Answered from the (user_id, updated_at) and (user_id, deleted_at,
+        # task_id) indexes, starting at the watermark
+        task_query = {'user_id': user_id}
+        tombstone_query = {'user_id': user_id}
+        if since:
+            changed_at, task_id = since
+            task_query['$or'] = [
+                {'updated_at': {'$gt': changed_at}},
+                {'updated_at': changed_at, 'task_id': {'$gt': task_id}}
+            ]
+            tombstone_query['$or'] = [
+                {'deleted_at': {'$gt': changed_at}},
+                {'deleted_at': changed_at, 'task_id': {'$gt': task_id}}
+            ]
+        order = [('updated_at', ASCENDING), ('task_id', ASCENDING)]
+        tasks = await self.tasks.find(task_query, NO_ID).sort(order).to_list(limit + 1)
+        tombstones = await self.tombstones.find(
+            tombstone_query, {'_id': 0, 'task_id': 1, 'deleted_at': 1}
+        ).sort([('deleted_at', ASCENDING), ('task_id', ASCENDING)]).to_list(limit + 1)
+        return tasks, tombstones
+
+def create_mongodb_storage():
+    """
+    Build the MongoDB repositories from MONGODB_URI
+    
+    The database comes from the URI path, or MONGODB_DATABASE when the URI
+    has none.
+    
+    Returns:
+        Storage: MongoDB-backed repositories
+    """
+    client = AsyncIOMotorClient(os.environ['MONGODB_URI'])
+    database = client.get_default_database(os.environ.get('MONGODB_DATABASE', DEFAULT_DATABASE))
+    indexes = MongoIndexes(database)
+    return Storage('mongodb', MongoUserRepository(database, indexes), MongoTaskRepository(database, indexes))
@@ -0,0 +1,154 @@
+import json
+import os
+from ..auth.utils import verify_token
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response
+from ..storage import get_storage, run, OK, NOT_FOUND, CONFLICT, ERROR
+from .model import validate_new_task, validate_task_update, new_task, task_changes
+
+MAX_BATCH_OPERATIONS = 100
+ACTIONS = ['create', 'update', 'delete']
+
+@track_invocation
+def lambda_handler(event, context):
+    """
+    Lambda function to create, update and delete many tasks in one request
+    
+    Request body:
+        operations: List of {"action": "create" | "update" | "delete", ...}.
+        Creates take the same fields as POST /tasks, updates take task_id plus
+        the fields of PUT /tasks/{id}, deletes take task_id.
+    
+    With DynamoDB, creates are written with BatchWriteItem and counted with
+    one counter update per batch. Updates and deletes are written with
+    TransactWriteItems, so they keep their write condition and the counters
+    change in the same transaction as the tasks.
+    The response holds one result per operation, in request order.
+    """
+    # Verify token
+    user = verify_token(event)
+    if not user:
+        return create_error_response(401, 'Unauthorized')
+    
+    # Parse request body
+    try:
+        body = json.loads(event['body'])
+        operations = body['operations']
+    except:
+        return create_error_response(400, 'Invalid request body')
+    
+    if not isinstance(operations, list) or not operations:
+        return create_error_response(400, 'Operations are required')
+    
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return create_error_response(400, f'At most {MAX_BATCH_OPERATIONS} operations are allowed')
+    
+    results = [None] * len(operations)
+    creates = []
+    mutations = []
+    seen_task_ids = set()
+    
+    # Validate every operation the same way the single-item handlers do
+    for index, operation in enumerate(operations):
+        action = operation.get('action') if isinstance(operation, dict) else None
+        if action not in ACTIONS:
+            results[index] = error_result(index, action, 400, 'Invalid action')
+            continue
+        
+        if action == 'create':
+            fields, error = validate_new_task(operation)
+            if error:
+                results[index] = error_result(index, action, 400, error)
+                continue
+            creates.append((index, new_task(user['user_id'], *fields)))
+            continue
+        
+        task_id = operation.get('task_id')
+        if not task_id:
+            results[index] = error_result(index, action, 400, 'Task ID is required')
+            continue
+        if task_id in seen_task_ids:
+            results[index] = error_result(index, action, 400, 'Duplicate task ID in batch')
+            continue
+        seen_task_ids.add(task_id)
+        
+        changes = None
+        if action == 'update':
+            fields, error = validate_task_update(operation)
+            if error:
+                results[index] = error_result(index, action, 400, error)
+                continue
+            changes = task_changes(*fields)
+        mutations.append((index, action, task_id, changes))
+    
+    storage = get_storage()
+    
+    # Store creates in bulk (BatchWriteItem with DynamoDB)
+    if creates:
+        try:
+            stored = run(storage.tasks.create_tasks([task for _, task in creates]))
+        except Exception as e:
+            print(f"Error creating tasks in storage: {str(e)}")
+            stored = [False] * len(creates)
+        
+        for (index, task), ok in zip(creates, stored):
+            if ok:
+                results[index] = {'index': index, 'action': 'create', 'status': 201, 'task': task}
+            else:
+                results[index] = error_result(index, 'create', 500, 'Error creating task')
+    
+    # Apply updates and deletes (TransactWriteItems with DynamoDB)
+    if mutations:
+        try:
+            outcomes = run(storage.tasks.apply_changes(
+                user['user_id'], [(action, task_id, changes) for _, action, task_id, changes in mutations]
+            ))
+        except Exception as e:
+            print(f"Error applying task changes in storage: {str(e)}")
+            outcomes = [(ERROR, None)] * len(mutations)
+        
+        for (index, action, task_id, _), (outcome, task) in zip(mutations, outcomes):
+            results[index] = mutation_result(index, action, task_id, outcome, task)
+    
+    # Return response
+    return create_success_response(200, {'results': results})
+
+def mutation_result(index, action, task_id, outcome, task):
+    """
+    Build the result of a batched update or delete
+    
+    Args:
+        index: Position of the operation in the request
+        action: 'update' or 'delete'
+        task_id: Task the operation targeted
+        outcome: Outcome reported by the repository
+        task: Updated or deleted task
+        
+    Returns:
+        dict: Operation result
+    """
+    if outcome == NOT_FOUND:
+        return error_result(index, action, 404, 'Task not found')
+    if outcome == CONFLICT:
+        return error_result(index, action, 409, 'Task was modified, please retry')
+    if outcome != OK:
+        message = 'Error updating task' if action == 'update' else 'Error deleting task'
+        return error_result(index, action, 500, message)
+    if action == 'update':
+        return {'index': index, 'action': action, 'status': 200, 'task': task}
+    return {'index': index, 'action': action, 'status': 204, 'task_id': task_id}
+
+def error_result(index, action, status, message):
+    """
+    Build the result of a failed operation
+    
+    Args:
+        index: Position of the operation in the request
+        action: Requested action
+        status: HTTP status code for this operation
+        message: Error message
+        
+    Returns:
+        dict: Operation result
+    """
+    return {'index': index, 'action': action, 'status': status, 'message': message}
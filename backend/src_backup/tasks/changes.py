@@ -0,0 +1,129 @@
+import os
+import time
+from datetime import datetime, timedelta
+from .pagination import encode_token, decode_token
+
+# Changes written this recently may still be missing from the index read
+# (its replication lags, a slow write lands late), so a watermark never
+# passes them and they are sent again with the next sync
+CHANGES_SETTLE_SECONDS = float(os.environ.get('CHANGES_SETTLE_SECONDS', '5'))
+
+# Tombstones expire after this many days; an older watermark gets a 410
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', '30'))
+
+def new_tombstone(task_id):
+    """
+    Build the record of a deleted task
+    
+    Args:
+        task_id: Task that was deleted
+    
+    Returns:
+        dict: task_id, deleted_at and expires_at (epoch seconds)
+    """
+    return {
+        'task_id': task_id,
+        'deleted_at': datetime.now().isoformat(),
+        'expires_at': int(time.time()) + TOMBSTONE_RETENTION_DAYS * 86400
+    }
+
+def task_position(task):
+    """
+    Get the place of a written task in a user's changes
+    """
+    return task['updated_at'], task['task_id']
+
+def tombstone_position(tombstone):
+    """
+    Get the place of a deleted task in a user's changes
+    """
+    return tombstone['deleted_at'], tombstone['task_id']
+
+def encode_watermark(user_id, position):
+    """
+    Encode a position in a user's changes as an opaque watermark
+    
+    Args:
+        user_id: Owner of the tasks
+        position: (time, task_id), everything up to it was sent
+    
+    Returns:
+        str: URL-safe watermark
+    """
+    changed_at, task_id = position
+    return encode_token({'user_id': user_id, 'changed_at': changed_at, 'task_id': task_id})
+
+def decode_watermark(watermark, user_id):
+    """
+    Decode a watermark back into a position
+    
+    Args:
+        watermark: Value returned by encode_watermark
+        user_id: Requesting user; watermarks issued for someone else are rejected
+    
+    Returns:
+        tuple: (time, task_id), or None if the watermark is invalid
+    """
+    key = decode_token(watermark, user_id, ('user_id', 'changed_at', 'task_id'))
+    if key is None:
+        return None
+    return key['changed_at'], key['task_id']
+
+def watermark_expired(position, now=None):
+    """
+    Check whether tombstones after a position may already have expired
+    """
+    now = now or datetime.now()
+    return position[0] < (now - timedelta(days=TOMBSTONE_RETENTION_DAYS)).isoformat()
+
+def changes_page(user_id, tasks, tombstones, since, limit, now=None):
+    """
+    Merge the tasks written and deleted after a position into one page
+    
+    Each list holds up to limit + 1 entries after since in position order,
+    as returned by TaskRepository.list_changes, so the first limit entries
+    of the merge are the next ones whatever their kind.
+    
+    The watermark is the position of the last entry of the page, so the
+    next request continues after it, but never later than the settle
+    window: a write committed late with an earlier timestamp still lands
+    after the watermark. Entries inside the window are sent again next
+    time, which a client applying changes by task_id ignores. A page that
+    reaches into the window is the last one, since everything after it is
+    unsettled too.
+    
+    Args:
+        user_id: Owner of the tasks
+        tasks: Written tasks after since
+        tombstones: Deleted tasks after since
+        since: Position of the request's watermark, None for a full sync
+        limit: Maximum number of entries in the page
+        now: Current time, datetime.now() by default
+    
+    Returns:
+        dict: Response body with the changed tasks, the deleted task IDs,
+        the new watermark and has_more
+    """
+    entries = sorted(
+        [(task_position(task), 'task', task) for task in tasks]
+        + [(tombstone_position(tombstone), 'tombstone', tombstone) for tombstone in tombstones],
+        key=lambda entry: entry[0]
+    )
+    page = entries[:limit]
+    has_more = len(entries) > limit
+    
+    floor = since or ('', '')
+    settled = (((now or datetime.now()) - timedelta(seconds=CHANGES_SETTLE_SECONDS)).isoformat(), '')
+    last = page[-1][0] if page else settled
+    position = max(floor, min(last, settled))
+    has_more = has_more and last <= settled
+    
+    return {
+        'changes': [item for _, kind, item in page if kind == 'task'],
+        'deleted': [
+            {'task_id': item['task_id'], 'deleted_at': item['deleted_at']}
+            for _, kind, item in page if kind == 'tombstone'
+        ],
+        'watermark': encode_watermark(user_id, position),
+        'has_more': has_more
+    }
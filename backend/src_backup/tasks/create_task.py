@@ -1,13 +1,15 @@
 import json
-import boto3
-import uuid
 import os
-from datetime import datetime
-from ..auth.utils import verify_token, create_error_response, create_success_response
+from ..auth.utils import verify_token
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run
+from .model import validate_new_task, new_task
 
+@track_invocation
 def lambda_handler(event, context):
     """
-    Lambda function to create a new task using boto3 and DynamoDB
+    Lambda function to create a new task
     """
     # Verify token
     user = verify_token(event)
@@ -21,42 +23,20 @@ def lambda_handler(event, context):
         return create_error_response(400, 'Invalid request body')
     
     # Validate input
-    title = body.get('title')
-    description = body.get('description')
-    status = body.get('status', 'todo')
-    
-    if not title:
-        return create_error_response(400, 'Title is required')
-    
-    if status not in ['todo', 'in_progress', 'completed']:
-        return create_error_response(400, 'Invalid status')
-    
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
-    tasks_table = dynamodb.Table('Tasks')
-    
-    # Create task
-    task_id = str(uuid.uuid4())
-    created_at = datetime.now().isoformat()
-    updated_at = created_at
+    fields, error = validate_new_task(body)
+    if error:
+        return create_error_response(400, error)
+    title, description, status = fields
     
     # Create task item
-    task = {
-        'task_id': task_id,
-        'user_id': user['user_id'],
-        'title': title,
-        'description': description if description else '',
-        'status': status,
-        'created_at': created_at,
-        'updated_at': updated_at
-    }
+    task = new_task(user['user_id'], title, description, status)
     
-    # Put item in DynamoDB
+    # Store the task, the repository keeps the user's counters current
     try:
-        tasks_table.put_item(Item=task)
+        run(get_storage().tasks.create_task(task))
     except Exception as e:
-        print(f"Error putting item in DynamoDB: {str(e)}")
-        return create_error_response(500, 'Error creating task')
+        print(f"Error creating task in storage: {str(e)}")
+        return storage_error_response(e, 'Error creating task')
     
     # Return response
     return create_success_response(201, task)
\ No newline at end of file
@@ -1,11 +1,14 @@
 import json
-import boto3
 import os
-from ..auth.utils import verify_token, create_error_response, create_success_response
+from ..auth.utils import verify_token
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_empty_response, storage_error_response
+from ..storage import get_storage, run
 
+@track_invocation
 def lambda_handler(event, context):
     """
-    Lambda function to delete a task using boto3 and DynamoDB
+    Lambda function to delete a task
     """
     # Verify token
     user = verify_token(event)
@@ -17,38 +20,14 @@ def lambda_handler(event, context):
     if not task_id:
         return create_error_response(400, 'Task ID is required')
     
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
-    tasks_table = dynamodb.Table('Tasks')
-    
-    # Check if task exists and belongs to the user
+    # Delete task only if it exists and belongs to the user
     try:
-        response = tasks_table.get_item(
-            Key={'task_id': task_id}
-        )
-        task = response.get('Item')
-        
-        if not task or task.get('user_id') != user['user_id']:
+        task = run(get_storage().tasks.delete_task(user['user_id'], task_id))
+        if task is None:
             return create_error_response(404, 'Task not found')
     except Exception as e:
-        print(f"Error getting item from DynamoDB: {str(e)}")
-        return create_error_response(500, 'Error retrieving task')
-    
-    # Delete task
-    try:
-        tasks_table.delete_item(
-            Key={'task_id': task_id}
-        )
-    except Exception as e:
-        print(f"Error deleting item from DynamoDB: {str(e)}")
-        return create_error_response(500, 'Error deleting task')
+        print(f"Error deleting task from storage: {str(e)}")
+        return storage_error_response(e, 'Error deleting task')
     
     # Return response
-    return {
-        'statusCode': 204,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-        },
-        'body': ''
-    }
\ No newline at end of file
+    return create_empty_response(204)
\ No newline at end of file
@@ -0,0 +1,199 @@
+import base64
+import csv
+import io
+import itertools
+import os
+from ..auth.utils import verify_token
+from ..compression import compress_stream, negotiate_encoding
+from ..events import get_header, get_query_params
+from ..metrics import track_invocation
+from ..responses import create_error_response, storage_error_response, dumps, CORS_HEADERS
+from ..storage import get_storage, run
+from .model import TASK_FIELDS, VALID_STATUSES, parse_fields
+
+# Content type of each export format
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8'
+}
+
+# Tasks read per Query, and serialized and sent as one chunk
+EXPORT_PAGE_SIZE = 500
+
+# API Gateway caps proxy responses at 6 MB once base64 encoded, so a Lambda
+# buffering the export stops before that; the streaming route has no limit
+MAX_BUFFERED_EXPORT_BYTES = int(os.environ.get('EXPORT_MAX_BUFFERED_BYTES', str(4 * 1024 * 1024)))
+
+def task_pages(tasks, user_id, status=None, fields=None, page_size=EXPORT_PAGE_SIZE):
+    """
+    Read a user's tasks one page at a time, oldest first
+    
+    Args:
+        tasks: Task repository
+        user_id: Owner of the tasks
+        status: Only read tasks with this status
+        fields: Attributes to read, None for every attribute
+        page_size: Tasks per Query
+    
+    Returns:
+        generator: Lists of tasks, the next page is read only once the
+        previous one was consumed
+    """
+    cursor = None
+    while True:
+        items, cursor = run(tasks.list_tasks(user_id, page_size, cursor, status=status, fields=fields))
+        yield items
+        if not cursor:
+            return
+
+def ndjson_chunks(pages):
+    """
+    Serialize pages of tasks as NDJSON, one JSON object per line
+    
+    Returns:
+        generator: UTF-8 bytes, one chunk per non-empty page
+    """
+    for items in pages:
+        if items:
+            yield ''.join(dumps(item) + '\n' for item in items).encode('utf-8')
+
+def csv_value(value):
+    """
+    Format an attribute for a CSV cell
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    return dumps(value)
+
+def csv_chunks(pages, columns):
+    """
+    Serialize pages of tasks as CSV under a header row
+    
+    Returns:
+        generator: UTF-8 bytes, the header with the first page and then one
+        chunk per page
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for items in pages:
+        for item in items:
+            writer.writerow([csv_value(item.get(column)) for column in columns])
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+def start_export(event):
+    """
+    Validate an export request and set up its pipeline
+    
+    Query parameters:
+        format: ndjson (default) or csv
+        status: Only export tasks with this status
+        fields: Comma separated attributes to export, and CSV columns
+    
+    The pipeline reads a page, serializes it and compresses it before the
+    next page is read, so memory stays flat whatever the number of tasks.
+    The body is gzip or brotli encoded when Accept-Encoding allows it.
+    
+    Args:
+        event: Lambda event object
+    
+    Returns:
+        tuple: (response, chunks). For a valid request the response holds
+        the status and headers and chunks the body as an iterator of bytes;
+        otherwise the response is a complete error response and chunks None.
+    """
+    # Verify token
+    user = verify_token(event)
+    if not user:
+        return create_error_response(401, 'Unauthorized'), None
+    
+    params = get_query_params(event)
+    
+    export_format = (params.get('format') or 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return create_error_response(400, 'Invalid format'), None
+    
+    status = params.get('status') or None
+    if status and status not in VALID_STATUSES:
+        return create_error_response(400, 'Invalid status'), None
+    
+    fields, error = parse_fields(params.get('fields'))
+    if error:
+        return create_error_response(400, error), None
+    
+    # The first page is read now, so a failing query still gets a 500
+    pages = task_pages(get_storage().tasks, user['user_id'], status, fields)
+    try:
+        first_page = next(pages)
+    except Exception as e:
+        print(f"Error exporting tasks from storage: {str(e)}")
+        return storage_error_response(e, 'Error exporting tasks'), None
+    pages = itertools.chain([first_page], pages)
+    
+    if export_format == 'csv':
+        chunks = csv_chunks(pages, fields or list(TASK_FIELDS))
+    else:
+        chunks = ndjson_chunks(pages)
+    
+    headers = {
+        **CORS_HEADERS,
+        'Content-Type': EXPORT_FORMATS[export_format],
+        'Content-Disposition': f'attachment; filename="tasks.{export_format}"',
+        'Vary': 'Accept-Encoding'
+    }
+    encoding = negotiate_encoding(get_header(event, 'Accept-Encoding'))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        chunks = compress_stream(chunks, encoding)
+    
+    return {'statusCode': 200, 'headers': headers}, chunks
+
+@track_invocation
+def open_export(event, context):
+    """
+    Start an export for the streaming route of the unified application
+    
+    The invocation record covers the validation and the first page; the
+    rest of the body is read while it streams.
+    
+    Args:
+        event: Lambda event object
+        context: Lambda context object, None outside Lambda
+    
+    Returns:
+        tuple: (response, chunks), see start_export
+    """
+    return start_export(event)
+
+@track_invocation
+def lambda_handler(event, context):
+    """
+    Lambda function to export every task of a user as NDJSON or CSV
+    
+    API Gateway proxy responses cannot be streamed, so the (compressed)
+    export is collected up to MAX_BUFFERED_EXPORT_BYTES. The unified
+    application streams the same pipeline when served by uvicorn, and uses
+    this handler under Mangum, see handler.py.
+    """
+    response, chunks = start_export(event)
+    if chunks is None:
+        return response
+    
+    body = bytearray()
+    try:
+        for chunk in chunks:
+            body += chunk
+            if len(body) > MAX_BUFFERED_EXPORT_BYTES:
+                return create_error_response(413, 'Export too large for one response, ask for gzip or use the streaming API')
+    except Exception as e:
+        print(f"Error exporting tasks from storage: {str(e)}")
+        return storage_error_response(e, 'Error exporting tasks')
+    
+    response['body'] = base64.b64encode(bytes(body)).decode('ascii')
+    response['isBase64Encoded'] = True
+    return response
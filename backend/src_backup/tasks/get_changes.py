@@ -0,0 +1,57 @@
+import json
+import os
+from ..auth.utils import verify_token
+from ..compression import compressible
+from ..events import get_query_params
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run
+from .changes import changes_page, decode_watermark, watermark_expired
+from .pagination import parse_limit
+
+@track_invocation
+@compressible
+def lambda_handler(event, context):
+    """
+    Lambda function to get the tasks a user changed since a watermark
+    
+    Query parameters:
+        since: Watermark returned by the previous call, omitted for a full
+        sync
+        limit: Maximum number of changes (default 50, max 100)
+    
+    The response lists the created or updated tasks under changes and the
+    deleted ones under deleted, with the watermark to send next time.
+    While has_more is true the client calls again with the new watermark
+    straight away. Clients apply the changes, then the deletes. A watermark
+    older than the tombstone retention answers 410 Gone: the client reloads
+    every task with a full sync.
+    """
+    # Verify token
+    user = verify_token(event)
+    if not user:
+        return create_error_response(401, 'Unauthorized')
+    
+    params = get_query_params(event)
+    
+    limit = parse_limit(params.get('limit'))
+    if limit is None:
+        return create_error_response(400, 'Invalid limit')
+    
+    since = None
+    if params.get('since'):
+        since = decode_watermark(params['since'], user['user_id'])
+        if since is None:
+            return create_error_response(400, 'Invalid since')
+        if watermark_expired(since):
+            return create_error_response(410, 'Watermark expired, sync every task again')
+    
+    # Only what changed after the watermark is read
+    try:
+        tasks, tombstones = run(get_storage().tasks.list_changes(user['user_id'], since, limit))
+    except Exception as e:
+        print(f"Error listing task changes from storage: {str(e)}")
+        return storage_error_response(e, 'Error retrieving task changes')
+    
+    # Return response
+    return create_success_response(200, changes_page(user['user_id'], tasks, tombstones, since, limit))
@@ -1,11 +1,24 @@
 import json
-import boto3
 import os
-from ..auth.utils import verify_token, create_error_response, create_success_response
+from ..auth.utils import verify_token
+from ..compression import compressible
+from ..etags import task_etag, etag_matches, create_not_modified_response, with_etag
+from ..events import get_query_params
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run
+from .model import parse_fields, select_fields
 
+@track_invocation
+@compressible
 def lambda_handler(event, context):
     """
-    Lambda function to get a task by ID using boto3 and DynamoDB
+    Lambda function to get a task by ID
+    
+    Query parameters:
+        fields: Comma separated attributes to return, e.g. "title,status"
+    
+    Answers 304 Not Modified when If-None-Match holds the task's ETag.
     """
     # Verify token
     user = verify_token(event)
@@ -17,23 +30,28 @@ def lambda_handler(event, context):
     if not task_id:
         return create_error_response(400, 'Task ID is required')
     
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
-    tasks_table = dynamodb.Table('Tasks')
+    fields, error = parse_fields(get_query_params(event).get('fields'))
+    if error:
+        return create_error_response(400, error)
     
-    # Get task
+    # The ETag needs task_id and updated_at even when they are not selected
+    read_fields = fields and list(dict.fromkeys([*fields, 'task_id', 'updated_at']))
+    
+    # Get task, the repository only matches tasks owned by the user
     try:
-        response = tasks_table.get_item(
-            Key={'task_id': task_id}
-        )
-        task = response.get('Item')
+        task = run(get_storage().tasks.get_task(user['user_id'], task_id, read_fields))
         
-        # Check if task exists and belongs to the user
-        if not task or task.get('user_id') != user['user_id']:
+        # Check if task exists
+        if not task:
             return create_error_response(404, 'Task not found')
     except Exception as e:
-        print(f"Error getting item from DynamoDB: {str(e)}")
-        return create_error_response(500, 'Error retrieving task')
+        print(f"Error getting task from storage: {str(e)}")
+        return storage_error_response(e, 'Error retrieving task')
+    
+    # The client's copy is current if the task was not updated since
+    etag = task_etag(task, fields)
+    if etag_matches(event, etag):
+        return create_not_modified_response(etag)
     
     # Return response
-    return create_success_response(200, task)
\ No newline at end of file
+    return with_etag(create_success_response(200, select_fields(task, fields)), etag)
@@ -1,41 +1,98 @@
 import json
-import boto3
 import os
-from boto3.dynamodb.conditions import Key
-from ..auth.utils import verify_token, create_error_response, create_success_response
+from ..auth.utils import verify_token
+from ..compression import compressible
+from ..etags import list_etag, etag_matches, create_not_modified_response, with_etag
+from ..events import get_query_params
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run, InvalidCursor
+from .model import VALID_STATUSES, parse_fields
+from .pagination import parse_limit, parse_sort, parse_order
 
+@track_invocation
+@compressible
 def lambda_handler(event, context):
     """
-    Lambda function to get all tasks for a user using boto3 and DynamoDB
+    Lambda function to get a page of tasks for a user
+    
+    Query parameters:
+        limit: Page size (default 50, max 100)
+        next_token: Cursor returned by the previous page
+        status: Only return tasks with this status
+        sort: created_at (default) or updated_at
+        order: asc (default) or desc
+        fields: Comma separated attributes to return, e.g. "task_id,title,status"
+        all: Set to "true" to load every task in one response (legacy, unbounded)
+    
+    Answers 304 Not Modified without querying the tasks when If-None-Match
+    holds the listing's ETag.
     """
     # Verify token
     user = verify_token(event)
     if not user:
         return create_error_response(401, 'Unauthorized')
     
-    # Initialize DynamoDB client
-    dynamodb = boto3.resource('dynamodb')
-    tasks_table = dynamodb.Table('Tasks')
+    params = get_query_params(event)
+    
+    limit = parse_limit(params.get('limit'))
+    if limit is None:
+        return create_error_response(400, 'Invalid limit')
+    
+    status = params.get('status') or None
+    if status and status not in VALID_STATUSES:
+        return create_error_response(400, 'Invalid status')
+    
+    sort = parse_sort(params.get('sort'))
+    if sort is None:
+        return create_error_response(400, 'Invalid sort')
+    
+    descending = parse_order(params.get('order'))
+    if descending is None:
+        return create_error_response(400, 'Invalid order')
+    
+    fields, error = parse_fields(params.get('fields'))
+    if error:
+        return create_error_response(400, error)
+    
+    tasks = get_storage().tasks
+    
+    # The user's change marker is read before the tasks, so a write landing
+    # in between only makes the ETag stale, never the listing it describes
+    try:
+        version = run(tasks.get_version(user['user_id']))
+        etag = list_etag(user['user_id'], version, params)
+    except Exception as e:
+        print(f"Error getting task version from storage: {str(e)}")
+        version = etag = None
+    
+    # Nothing changed since the client's copy: skip the query entirely
+    if etag and etag_matches(event, etag):
+        return create_not_modified_response(etag)
+    
+    # Legacy behaviour: load every task into a single array
+    if params.get('all', '').lower() == 'true':
+        try:
+            all_tasks = run(tasks.list_all_tasks(user['user_id'], fields))
+        except Exception as e:
+            print(f"Error listing tasks from storage: {str(e)}")
+            return storage_error_response(e, 'Error retrieving tasks')
+        return with_etag(create_success_response(200, all_tasks), etag)
     
-    # Query tasks by user_id using the UserIdIndex
+    # Get a single bounded page of the user's tasks
     try:
-        response = tasks_table.query(
-            IndexName='UserIdIndex',
-            KeyConditionExpression=Key('user_id').eq(user['user_id'])
-        )
-        tasks = response.get('Items', [])
-        
-        # Handle pagination if there are more items
-        while 'LastEvaluatedKey' in response:
-            response = tasks_table.query(
-                IndexName='UserIdIndex',
-                KeyConditionExpression=Key('user_id').eq(user['user_id']),
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            tasks.extend(response.get('Items', []))
+        items, next_token = run(tasks.list_tasks(
+            user['user_id'], limit, params.get('next_token'),
+            status=status, sort=sort, descending=descending, fields=fields, version=version
+        ))
+    except InvalidCursor:
+        return create_error_response(400, 'Invalid next_token')
     except Exception as e:
-        print(f"Error querying DynamoDB: {str(e)}")
-        return create_error_response(500, 'Error retrieving tasks')
+        print(f"Error listing tasks from storage: {str(e)}")
+        return storage_error_response(e, 'Error retrieving tasks')
     
     # Return response
-    return create_success_response(200, tasks)
\ No newline at end of file
+    return with_etag(create_success_response(200, {
+        'items': items,
+        'next_token': next_token
+    }), etag)
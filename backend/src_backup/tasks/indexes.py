@@ -0,0 +1,139 @@
+from ..db import get_table, is_conditional_check_failed, TASKS_TABLE
+
+# Global secondary indexes of the Tasks table
+STATUS_CREATED_INDEX = 'UserStatusCreatedIndex'
+STATUS_UPDATED_INDEX = 'UserStatusUpdatedIndex'
+UPDATED_INDEX = 'UserUpdatedIndex'
+
+# Indexes projecting only keys, whose listings read the tasks from the table
+KEYS_ONLY_INDEXES = (STATUS_CREATED_INDEX, STATUS_UPDATED_INDEX)
+
+# Partition key of the status indexes, "<user_id>#<status>"
+USER_STATUS = 'user_status'
+
+def user_status(user_id, status):
+    """
+    Build the status index partition key of a task
+    
+    Args:
+        user_id: Owner of the task
+        status: Task status
+        
+    Returns:
+        str: user_status value
+    """
+    return f'{user_id}#{status}'
+
+def listing_index(status, sort):
+    """
+    Pick the index serving a listing and the attributes of its key
+    
+    Tasks sorted by creation without a status filter come straight from the
+    table, whose time-ordered task_id already sorts them by creation. Every
+    other listing has an index keyed for it, so none reads tasks only to
+    skip them.
+    
+    Args:
+        status: Status to filter on, or None
+        sort: 'created_at' or 'updated_at'
+        
+    Returns:
+        tuple: (index name or None for the table, partition key attribute,
+        sort key attribute)
+    """
+    if sort == 'updated_at':
+        if status:
+            return STATUS_UPDATED_INDEX, USER_STATUS, 'updated_at'
+        return UPDATED_INDEX, 'user_id', 'updated_at'
+    if status:
+        return STATUS_CREATED_INDEX, USER_STATUS, 'created_at'
+    return None, 'user_id', 'task_id'
+
+def with_index_keys(task):
+    """
+    Add the index attributes to a task before it is stored
+    
+    Args:
+        task: Task item
+        
+    Returns:
+        dict: Copy of the task with user_status set
+    """
+    return {**task, USER_STATUS: user_status(task['user_id'], task['status'])}
+
+def with_index_changes(user_id, changes):
+    """
+    Add the index attributes affected by a task update
+    
+    Args:
+        user_id: Owner of the task
+        changes: Attributes to set, as built by tasks.model.task_changes
+        
+    Returns:
+        dict: Copy of the changes, with user_status when the status changes
+    """
+    if 'status' not in changes:
+        return changes
+    return {**changes, USER_STATUS: user_status(user_id, changes['status'])}
+
+def strip_index_keys(task):
+    """
+    Remove the index attributes from a stored task
+    
+    Args:
+        task: Task item read from the table, changed in place
+        
+    Returns:
+        dict: The task
+    """
+    if task:
+        task.pop(USER_STATUS, None)
+    return task
+
+def backfill_index_keys():
+    """
+    Set user_status on tasks stored before the status indexes existed
+    
+    Tasks without it are missing from status listings and counts. The
+    backfill only writes tasks that need it and is safe to re-run.
+    
+    Returns:
+        int: Number of tasks updated
+    """
+    tasks_table = get_table(TASKS_TABLE)
+    scan_kwargs = {
+        'ProjectionExpression': 'user_id, task_id, #status, #user_status',
+        'ExpressionAttributeNames': {'#status': 'status', '#user_status': USER_STATUS}
+    }
+    
+    updated = 0
+    while True:
+        response = tasks_table.scan(**scan_kwargs)
+        for task in response.get('Items', []):
+            if 'status' not in task:
+                continue
+            expected = user_status(task['user_id'], task['status'])
+            if task.get(USER_STATUS) == expected:
+                continue
+            # A task whose status changed meanwhile already got its key
+            try:
+                tasks_table.update_item(
+                    Key={'user_id': task['user_id'], 'task_id': task['task_id']},
+                    UpdateExpression='SET #user_status = :user_status',
+                    ConditionExpression='#status = :status',
+                    ExpressionAttributeNames={'#status': 'status', '#user_status': USER_STATUS},
+                    ExpressionAttributeValues={':user_status': expected, ':status': task['status']}
+                )
+            except Exception as e:
+                if not is_conditional_check_failed(e):
+                    raise
+                continue
+            updated += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return updated
+
+if __name__ == '__main__':
+    # Run with `python -m src_backup.tasks.indexes` once the indexes are created
+    print(f"Tasks backfilled with index keys: {backfill_index_keys()}")
@@ -0,0 +1,264 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+VALID_STATUSES = ['todo', 'in_progress', 'completed']
+
+# Attributes a client can select with the fields query parameter
+TASK_FIELDS = ('task_id', 'user_id', 'title', 'description', 'status', 'created_at', 'updated_at')
+
+# State of the task ID generator, see new_task_id
+_task_id_lock = threading.Lock()
+_last_timestamp_ms = 0
+_sequence = 0
+
+def validate_new_task(body):
+    """
+    Validate the fields of a task to create
+    
+    Args:
+        body: Parsed request body
+        
+    Returns:
+        tuple: (title, description, status) and an error message, which is
+        None when the input is valid
+    """
+    title = body.get('title')
+    description = body.get('description')
+    status = body.get('status', 'todo')
+    
+    if not title:
+        return None, 'Title is required'
+    
+    if status not in VALID_STATUSES:
+        return None, 'Invalid status'
+    
+    return (title, description, status), None
+
+def validate_task_update(body):
+    """
+    Validate the fields of a task update
+    
+    Args:
+        body: Parsed request body
+        
+    Returns:
+        tuple: (title, description, status) and an error message, which is
+        None when the input is valid
+    """
+    title = body.get('title')
+    description = body.get('description')
+    status = body.get('status')
+    
+    if status and status not in VALID_STATUSES:
+        return None, 'Invalid status'
+    
+    return (title, description, status), None
+
+def parse_fields(value):
+    """
+    Parse the attributes selected with the fields query parameter
+    
+    Args:
+        value: Comma separated attribute names, e.g. "task_id,title,status"
+        
+    Returns:
+        tuple: Selected attributes in request order (None to return every
+        attribute) and an error message, which is None when the input is
+        valid
+    """
+    if not value:
+        return None, None
+    
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in TASK_FIELDS:
+            return None, f'Invalid field: {name}'
+        if name not in fields:
+            fields.append(name)
+    return fields or None, None
+
+def select_fields(task, fields):
+    """
+    Keep only the selected attributes of a task
+    
+    Args:
+        task: Task item
+        fields: Selected attributes, None to keep every attribute
+        
+    Returns:
+        dict: The task, or a new dict with the selected attributes
+    """
+    if fields is None or task is None:
+        return task
+    return {name: task[name] for name in fields if name in task}
+
+def new_task_id():
+    """
+    Generate a time-ordered task ID
+    
+    The ID uses the UUID version 7 layout: a millisecond timestamp, a
+    per-millisecond sequence and random bits. As the sort key of the Tasks table it keeps each user's tasks
+    in creation order.
+    
+    Returns:
+        str: Task ID in the canonical UUID format
+    """
+    global _last_timestamp_ms, _sequence
+    with _task_id_lock:
+        timestamp_ms = time.time_ns() // 1000000
+        if timestamp_ms <= _last_timestamp_ms:
+            # Same millisecond: keep IDs from this process increasing
+            timestamp_ms = _last_timestamp_ms
+            _sequence += 1
+            if _sequence > 0xFFF:
+                timestamp_ms += 1
+                _sequence = 0
+        else:
+            _sequence = 0
+        _last_timestamp_ms = timestamp_ms
+        sequence = _sequence
+    
+    random_bits = int.from_bytes(os.urandom(8), 'big')
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= sequence << 64
+    value |= 0b10 << 62
+    value |= random_bits & 0x3FFFFFFFFFFFFFFF
+    return str(uuid.UUID(int=value))
+
+def migrated_task_id(task_id, created_at):
+    """
+    Get the time-ordered ID of a task stored before IDs were time-ordered
+    
+    The Tasks table lists a user's tasks in task_id order, which is only
+    creation order for version 7 IDs. Any other UUID gets the timestamp of
+    created_at and keeps its own bits for the rest, so migrating the task
+    again gives it the same ID.
+    
+    Args:
+        task_id: Stored task ID
+        created_at: Creation time of the task, in ISO 8601
+        
+    Returns:
+        str: Time-ordered task ID, task_id itself when it already is one or
+        has no creation time
+    """
+    try:
+        previous = uuid.UUID(task_id)
+    except (TypeError, ValueError):
+        return task_id
+    if previous.version == 7 or not created_at:
+        return task_id
+    
+    timestamp_ms = int(datetime.fromisoformat(created_at).timestamp() * 1000)
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= ((previous.int >> 64) & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= previous.int & 0x3FFFFFFFFFFFFFFF
+    return str(uuid.UUID(int=value))
+
+def new_task(user_id, title, description, status):
+    """
+    Build a new task item
+    
+    Args:
+        user_id: Owner of the task
+        title: Task title
+        description: Task description (optional)
+        status: Task status
+        
+    Returns:
+        dict: Task item ready to be stored
+    """
+    created_at = datetime.now().isoformat()
+    return {
+        'task_id': new_task_id(),
+        'user_id': user_id,
+        'title': title,
+        'description': description if description else '',
+        'status': status,
+        'created_at': created_at,
+        'updated_at': created_at
+    }
+
+def task_changes(title, description, status):
+    """
+    Build the attributes to set for a task update
+    
+    Args:
+        title: New title (ignored when empty)
+        description: New description (ignored when None)
+        status: New status (ignored when empty)
+        
+    Returns:
+        dict: Attribute name to new value, always including updated_at
+    """
+    changes = {'updated_at': datetime.now().isoformat()}
+    
+    if title:
+        changes['title'] = title
+    
+    if description is not None:
+        changes['description'] = description
+    
+    if status:
+        changes['status'] = status
+    
+    return changes
+
+def update_expression(changes):
+    """
+    Build an update for a set of task changes that only applies to an
+    existing task
+    
+    Every attribute name is aliased since some (like status) are reserved
+    keywords.
+    
+    Args:
+        changes: Attributes to set, as returned by task_changes
+        
+    Returns:
+        dict: UpdateExpression, ConditionExpression, ExpressionAttributeNames
+        and ExpressionAttributeValues for update_item
+    """
+    names = {'#task_id': 'task_id'}
+    values = {}
+    assignments = []
+    for name, value in changes.items():
+        names[f'#{name}'] = name
+        values[f':{name}'] = value
+        assignments.append(f'#{name} = :{name}')
+    
+    return {
+        'UpdateExpression': 'SET ' + ', '.join(assignments),
+        'ConditionExpression': 'attribute_exists(#task_id)',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }
+
+def projection_expression(fields):
+    """
+    Build a projection reading only the selected attributes
+    
+    Every attribute name is aliased since some (like status) are reserved
+    keywords.
+    
+    Args:
+        fields: Attributes to read
+        
+    Returns:
+        dict: ProjectionExpression and ExpressionAttributeNames for
+        get_item or query
+    """
+    names = {f'#{name}': name for name in fields}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
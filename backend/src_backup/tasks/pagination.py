@@ -0,0 +1,101 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+SORT_FIELDS = ('created_at', 'updated_at')
+ORDERS = ('asc', 'desc')
+
+def parse_limit(value):
+    """
+    Parse the page size requested by the client
+    
+    Args:
+        value: Raw limit query parameter
+        
+    Returns:
+        int: Page size clamped to MAX_PAGE_SIZE, or None if the value is invalid
+    """
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    if limit < 1:
+        return None
+    return min(limit, MAX_PAGE_SIZE)
+
+def parse_sort(value):
+    """
+    Parse the attribute a listing is sorted on
+    
+    Args:
+        value: Raw sort query parameter
+        
+    Returns:
+        str: 'created_at' (the default) or 'updated_at', or None if invalid
+    """
+    if not value:
+        return SORT_FIELDS[0]
+    return value if value in SORT_FIELDS else None
+
+def parse_order(value):
+    """
+    Parse the direction of a listing
+    
+    Args:
+        value: Raw order query parameter
+        
+    Returns:
+        bool: True for descending, False for ascending (the default), or
+        None if invalid
+    """
+    if not value:
+        return False
+    if value not in ORDERS:
+        return None
+    return value == 'desc'
+
+def encode_token(last_evaluated_key):
+    """
+    Encode a DynamoDB LastEvaluatedKey as an opaque cursor
+    
+    Args:
+        last_evaluated_key: LastEvaluatedKey from a Query response
+        
+    Returns:
+        str: URL-safe cursor, or None when there are no more pages
+    """
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_token(token, user_id, attributes):
+    """
+    Decode a cursor back into an ExclusiveStartKey
+    
+    Every key attribute of the tables and indexes is a string, so a cursor
+    that was edited into any other shape is rejected here instead of
+    failing the query.
+    
+    Args:
+        token: Cursor returned by encode_token
+        user_id: Requesting user; cursors issued for someone else are rejected
+        attributes: Key attributes the cursor must have, and only those
+        
+    Returns:
+        dict: ExclusiveStartKey, or None if the cursor is invalid
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        return None
+    if not isinstance(key, dict) or key.get('user_id') != user_id:
+        return None
+    if set(key) != set(attributes) or not all(isinstance(value, str) for value in key.values()):
+        return None
+    return key
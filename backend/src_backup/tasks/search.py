@@ -0,0 +1,117 @@
+import re
+
+# Postings weight of one occurrence, a title match ranks above a description match
+FIELD_WEIGHTS = {'title': 3, 'description': 1}
+
+# Tokens longer than this are cut, so index keys stay small
+MAX_TOKEN_LENGTH = 32
+
+# Query limits keeping a search to a few bounded index reads
+MAX_QUERY_TOKENS = 5
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 50
+
+# Postings ranked per query token, bounding the cost of very short prefixes.
+# Past it only the first postings in term order are ranked and the search
+# reports its results as truncated.
+MAX_POSTINGS_PER_TOKEN = 1000
+
+# A token matched as a prefix of a longer term counts for less
+PREFIX_MATCH_FACTOR = 0.5
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    """
+    Split text into lower-cased search tokens
+    
+    Args:
+        text: Text to split, may be None
+    
+    Returns:
+        list: Tokens in text order, duplicates kept
+    """
+    if not text:
+        return []
+    return [token[:MAX_TOKEN_LENGTH] for token in _TOKEN_PATTERN.findall(text.casefold())]
+
+def task_postings(task):
+    """
+    Get the terms a task is indexed under
+    
+    Args:
+        task: Task item
+    
+    Returns:
+        dict: Token to weight, summed over the title and description
+    """
+    postings = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(task.get(field)):
+            postings[token] = postings.get(token, 0) + weight
+    return postings
+
+def matches_query(task, query_tokens):
+    """
+    Check that a task's current text matches every query token
+    
+    Args:
+        task: Task item
+        query_tokens: Tokens from parse_query
+    
+    Returns:
+        bool: True if each token starts one of the task's terms
+    """
+    terms = task_postings(task)
+    return all(any(term.startswith(token) for term in terms) for token in query_tokens)
+
+def parse_query(value):
+    """
+    Parse a search query into distinct tokens
+    
+    Args:
+        value: Raw q query parameter
+    
+    Returns:
+        list: Up to MAX_QUERY_TOKENS tokens, empty if the query has none
+    """
+    tokens = []
+    for token in tokenize(value):
+        if token not in tokens:
+            tokens.append(token)
+    return tokens[:MAX_QUERY_TOKENS]
+
+def rank(query_tokens, matches, limit):
+    """
+    Rank the tasks matching every query token
+    
+    Args:
+        query_tokens: Tokens from parse_query
+        matches: One list per query token of (term, task_id, weight) postings
+            whose term starts with that token
+        limit: Maximum number of task IDs to return
+    
+    Returns:
+        list: Task IDs, best match first and newest first among equals
+    """
+    scores = None
+    for token, postings in zip(query_tokens, matches):
+        token_scores = {}
+        for term, task_id, weight in postings:
+            factor = 1 if term == token else PREFIX_MATCH_FACTOR
+            token_scores[task_id] = token_scores.get(task_id, 0) + weight * factor
+        
+        # Every query token must match
+        if scores is None:
+            scores = token_scores
+        else:
+            scores = {
+                task_id: score + token_scores[task_id]
+                for task_id, score in scores.items()
+                if task_id in token_scores
+            }
+        if not scores:
+            return []
+    
+    ranked = sorted((scores or {}).items(), key=lambda item: (item[1], item[0]), reverse=True)
+    return [task_id for task_id, _ in ranked[:limit]]
@@ -0,0 +1,184 @@
+from boto3.dynamodb.conditions import Key
+from ..db import get_table, batch_write, TASKS_TABLE, TASK_SEARCH_TABLE
+from .search import task_postings, MAX_POSTINGS_PER_TOKEN
+
+def posting_term(token, task_id):
+    """
+    Build the sort key of a posting, "<token>#<task_id>"
+    
+    Tokens never contain '#', so a begins_with on a token prefix only
+    matches terms starting with it.
+    """
+    return f'{token}#{task_id}'
+
+def index_changes(user_id, task_id, old_postings, new_postings):
+    """
+    Build the BatchWriteItem requests moving a task between two postings
+    
+    Args:
+        user_id: Owner of the task
+        task_id: Task being indexed
+        old_postings: Token to weight the task is indexed under, {} if new
+        new_postings: Token to weight it should be indexed under, {} if deleted
+    
+    Returns:
+        list: Put and delete requests, only for the terms that changed
+    """
+    requests = []
+    for token in old_postings.keys() - new_postings.keys():
+        requests.append({'DeleteRequest': {'Key': {
+            'user_id': user_id,
+            'term': posting_term(token, task_id)
+        }}})
+    for token, weight in new_postings.items():
+        if old_postings.get(token) != weight:
+            requests.append({'PutRequest': {'Item': {
+                'user_id': user_id,
+                'term': posting_term(token, task_id),
+                'task_id': task_id,
+                'weight': weight
+            }}})
+    return requests
+
+def update_index(user_id, changed_tasks):
+    """
+    Apply the postings changes of many tasks with BatchWriteItem
+    
+    Args:
+        user_id: Owner of the tasks
+        changed_tasks: (old task or None, new task or None) pairs
+    
+    Raises:
+        RuntimeError: If some postings could not be written
+    """
+    requests = []
+    for old_task, new_task in changed_tasks:
+        task_id = (new_task or old_task)['task_id']
+        old_postings = task_postings(old_task) if old_task else {}
+        new_postings = task_postings(new_task) if new_task else {}
+        requests.extend(index_changes(user_id, task_id, old_postings, new_postings))
+    if not requests:
+        return
+    
+    unprocessed = batch_write(TASK_SEARCH_TABLE, requests)
+    if unprocessed:
+        raise RuntimeError(f"{len(unprocessed)} search posting(s) could not be written")
+
+def find_postings(user_id, token):
+    """
+    Get the postings of a user whose term starts with a token
+    
+    One Query on the user's partition, so the cost grows with the matches
+    and not with the number of tasks.
+    
+    Args:
+        user_id: Owner of the tasks
+        token: Query token, matched as a prefix
+    
+    Returns:
+        tuple: Up to MAX_POSTINGS_PER_TOKEN (term, task_id, weight) tuples,
+        and True if more postings matched
+    """
+    search_table = get_table(TASK_SEARCH_TABLE)
+    query_kwargs = {
+        'KeyConditionExpression': Key('user_id').eq(user_id) & Key('term').begins_with(token),
+        'ProjectionExpression': '#term, #task_id, #weight',
+        'ExpressionAttributeNames': {'#term': 'term', '#task_id': 'task_id', '#weight': 'weight'}
+    }
+    
+    # One posting past the limit tells whether any were left out
+    postings = []
+    while len(postings) <= MAX_POSTINGS_PER_TOKEN:
+        query_kwargs['Limit'] = MAX_POSTINGS_PER_TOKEN + 1 - len(postings)
+        response = search_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            postings.append((item['term'].rpartition('#')[0], item['task_id'], int(item['weight'])))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return postings[:MAX_POSTINGS_PER_TOKEN], len(postings) > MAX_POSTINGS_PER_TOKEN
+
+def stale_postings(matches, tasks):
+    """
+    Find the postings whose task no longer carries their term
+    
+    Writes that do not read the task they replace cannot remove the
+    postings of its previous text, so a search checks the postings of the
+    tasks it read instead.
+    
+    Args:
+        matches: Lists of (term, task_id, weight) postings, as found per token
+        tasks: task_id to the task read for it, None if it no longer exists
+    
+    Returns:
+        list: (term, task_id) of the stale postings
+    """
+    stale = set()
+    for postings in matches:
+        for term, task_id, _ in postings:
+            if task_id not in tasks:
+                continue
+            task = tasks[task_id]
+            if task is None or term not in task_postings(task):
+                stale.add((term, task_id))
+    return sorted(stale)
+
+def remove_postings(user_id, postings):
+    """
+    Delete postings with BatchWriteItem
+    
+    Args:
+        user_id: Owner of the tasks
+        postings: (term, task_id) pairs, as returned by stale_postings
+    
+    Raises:
+        RuntimeError: If some postings could not be deleted
+    """
+    unprocessed = batch_write(TASK_SEARCH_TABLE, [
+        {'DeleteRequest': {'Key': {'user_id': user_id, 'term': posting_term(term, task_id)}}}
+        for term, task_id in postings
+    ])
+    if unprocessed:
+        raise RuntimeError(f"{len(unprocessed)} search posting(s) could not be deleted")
+
+def rebuild_search_index(user_ids=None):
+    """
+    Index every task again, e.g. for tasks stored before search existed
+    
+    Postings are only added or overwritten, the rebuild is safe to re-run.
+    
+    Args:
+        user_ids: Users to index; every user with tasks when omitted
+    
+    Returns:
+        int: Number of tasks indexed
+    """
+    tasks_table = get_table(TASKS_TABLE)
+    scan_kwargs = {
+        'ProjectionExpression': '#user_id, #task_id, #title, #description',
+        'ExpressionAttributeNames': {
+            '#user_id': 'user_id',
+            '#task_id': 'task_id',
+            '#title': 'title',
+            '#description': 'description'
+        }
+    }
+    
+    indexed = 0
+    while True:
+        response = tasks_table.scan(**scan_kwargs)
+        by_user = {}
+        for task in response.get('Items', []):
+            if user_ids is None or task['user_id'] in user_ids:
+                by_user.setdefault(task['user_id'], []).append((None, task))
+        for user_id, changed_tasks in by_user.items():
+            update_index(user_id, changed_tasks)
+            indexed += len(changed_tasks)
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return indexed
+
+if __name__ == '__main__':
+    # Run with `python -m src_backup.tasks.search_index` to index existing tasks
+    print(f"Tasks indexed for search: {rebuild_search_index()}")
@@ -0,0 +1,52 @@
+import json
+import os
+from ..auth.utils import verify_token
+from ..compression import compressible
+from ..events import get_query_params
+from ..metrics import track_invocation
+from ..responses import create_error_response, create_success_response, storage_error_response
+from ..storage import get_storage, run
+from .search import parse_query, DEFAULT_RESULTS, MAX_RESULTS
+
+@track_invocation
+@compressible
+def lambda_handler(event, context):
+    """
+    Lambda function to search a user's tasks by title and description
+    
+    Query parameters:
+        q: Search words; every word must match, the last letters may be
+        left out (prefix matching)
+        limit: Maximum number of results (default 20, max 50)
+    
+    Results come from the user's inverted index, best match first. Each
+    word ranks at most MAX_POSTINGS_PER_TOKEN indexed words of tasks; when a
+    word (usually a very short prefix) matches more, truncated is true and
+    better matches may be missing: a longer word narrows the search.
+    """
+    # Verify token
+    user = verify_token(event)
+    if not user:
+        return create_error_response(401, 'Unauthorized')
+    
+    params = get_query_params(event)
+    
+    query_tokens = parse_query(params.get('q'))
+    if not query_tokens:
+        return create_error_response(400, 'Search query is required')
+    
+    try:
+        limit = min(int(params.get('limit') or DEFAULT_RESULTS), MAX_RESULTS)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return create_error_response(400, 'Invalid limit')
+    
+    try:
+        items, truncated = run(get_storage().tasks.search_tasks(user['user_id'], query_tokens, limit))
+    except Exception as e:
+        print(f"Error searching tasks in storage: {str(e)}")
+        return storage_error_response(e, 'Error searching tasks')
+    
+    # Return response
+    return create_success_response(200, {'items': items, 'truncated': truncated})
@@ -0,0 +1,286 @@
+from boto3.dynamodb.conditions import Key
+from ..db import get_table, is_conditional_check_failed, TASKS_TABLE, TASK_STATS_TABLE
+from .indexes import STATUS_CREATED_INDEX, USER_STATUS, user_status
+
+STATUSES = ('todo', 'in_progress', 'completed')
+COUNTERS = ('total',) + STATUSES
+
+# Stats attribute incremented on every write to a user's tasks
+VERSION = 'version'
+
+# Stats attribute set once the counters include every stored task
+SEEDED = 'seeded'
+
+def empty_stats():
+    """
+    Create a zeroed statistics dict
+    
+    Returns:
+        dict: Counters for total and every status
+    """
+    return {counter: 0 for counter in COUNTERS}
+
+def new_stats_item(user_id):
+    """
+    Build the seeded stats item of a user who has no tasks yet
+    
+    Args:
+        user_id: Owner of the tasks
+        
+    Returns:
+        dict: TaskStats item with zeroed counters
+    """
+    return {'user_id': user_id, VERSION: 0, SEEDED: True, **empty_stats()}
+
+def status_delta(old_status=None, new_status=None):
+    """
+    Build the counter changes for a task moving between statuses
+    
+    Args:
+        old_status: Status before the change (None for a created task)
+        new_status: Status after the change (None for a deleted task)
+        
+    Returns:
+        dict: Counter name to increment
+    """
+    deltas = {}
+    if old_status is None and new_status is not None:
+        deltas['total'] = 1
+    elif old_status is not None and new_status is None:
+        deltas['total'] = -1
+    if old_status in STATUSES:
+        deltas[old_status] = deltas.get(old_status, 0) - 1
+    if new_status in STATUSES:
+        deltas[new_status] = deltas.get(new_status, 0) + 1
+    return {counter: delta for counter, delta in deltas.items() if delta}
+
+def stats_update(user_id, deltas):
+    """
+    Build the TransactWriteItems entry applying counter changes
+    
+    Every entry also increments the item's version, the change marker list
+    ETags are built from. It is written in the same transaction as the task
+    writes it counts, so the version changes exactly when the tasks do, even
+    when no counter changes.
+    
+    The update is conditioned on the counters having been seeded. Without
+    the condition, ADD would create an item counting only this write for a
+    user whose tasks predate the counters, and that item would never be
+    recounted. The caller seeds the counters with seed_stats when the
+    condition fails and writes again.
+    
+    Args:
+        user_id: Owner of the tasks
+        deltas: Counter name to increment, as returned by status_delta
+        
+    Returns:
+        dict: Update entry for the user's stats item
+    """
+    deltas = {counter: delta for counter, delta in deltas.items() if delta}
+    deltas[VERSION] = 1
+    
+    names = {'#seeded': SEEDED}
+    values = {}
+    clauses = []
+    for counter, delta in deltas.items():
+        names[f'#{counter}'] = counter
+        values[f':{counter}'] = delta
+        clauses.append(f'#{counter} :{counter}')
+    return {'Update': {
+        'TableName': TASK_STATS_TABLE,
+        'Key': {'user_id': user_id},
+        'UpdateExpression': 'ADD ' + ', '.join(clauses),
+        'ConditionExpression': 'attribute_exists(#seeded)',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }}
+
+def get_stats(user_id):
+    """
+    Get a user's task counters with a single GetItem
+    
+    Args:
+        user_id: Owner of the tasks
+        
+    Returns:
+        dict: Counters for total and every status
+    """
+    response = get_table(TASK_STATS_TABLE).get_item(Key={'user_id': user_id})
+    item = response.get('Item')
+    if not item or not item.get(SEEDED):
+        return seed_stats(user_id)
+    
+    stats = empty_stats()
+    for counter in COUNTERS:
+        stats[counter] = int(item.get(counter, 0))
+    return stats
+
+def count_tasks(user_id, exclude=()):
+    """
+    Count a user's tasks by status from the status index
+    
+    Each status is one query on the user's partition of the keys-only
+    index, so only task keys are read. Tasks stored before the index existed
+    are only counted once the index keys are backfilled.
+    
+    Args:
+        user_id: Owner of the tasks
+        exclude: IDs of tasks to leave out, e.g. ones whose counters are
+            about to be added separately
+        
+    Returns:
+        dict: Counters for total and every status
+    """
+    tasks_table = get_table(TASKS_TABLE)
+    exclude = set(exclude)
+    
+    stats = empty_stats()
+    for status in STATUSES:
+        query_kwargs = {
+            'IndexName': STATUS_CREATED_INDEX,
+            'KeyConditionExpression': Key(USER_STATUS).eq(user_status(user_id, status)),
+            'ProjectionExpression': 'task_id'
+        }
+        while True:
+            response = tasks_table.query(**query_kwargs)
+            stats[status] += sum(1 for item in response.get('Items', []) if item['task_id'] not in exclude)
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        stats['total'] += stats[status]
+    return stats
+
+def seed_stats(user_id, exclude=()):
+    """
+    Store the counters of a user whose counters were never seeded
+    
+    Tasks stored before the counters existed are counted from the status
+    index, and the counts replace whatever a write made before seeding
+    existed added to the item. The item is only updated while it is still
+    unseeded, so two writers seeding at once count the tasks once.
+    
+    Args:
+        user_id: Owner of the tasks
+        exclude: IDs of stored tasks the caller counts itself afterwards
+        
+    Returns:
+        dict: Counters for total and every status
+    """
+    stats = count_tasks(user_id, exclude)
+    names = {f'#{counter}': counter for counter in stats}
+    values = {f':{counter}': value for counter, value in stats.items()}
+    names.update({'#seeded': SEEDED, '#version': VERSION})
+    values.update({':seeded': True, ':one': 1})
+    try:
+        get_table(TASK_STATS_TABLE).update_item(
+            Key={'user_id': user_id},
+            UpdateExpression=(
+                'SET ' + ', '.join(f'#{counter} = :{counter}' for counter in stats)
+                + ', #seeded = :seeded ADD #version :one'
+            ),
+            ConditionExpression='attribute_not_exists(#seeded)',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+    except Exception as e:
+        if not is_conditional_check_failed(e):
+            raise
+        return get_stats(user_id)
+    return stats
+
+def store_stats(user_id, stats):
+    """
+    Overwrite a user's counters and increment the version
+    
+    The version is never reset, so an ETag issued before the counters were
+    rebuilt cannot match again.
+    
+    Args:
+        user_id: Owner of the tasks
+        stats: Counters for total and every status
+    """
+    names = {f'#{counter}': counter for counter in stats}
+    values = {f':{counter}': value for counter, value in stats.items()}
+    names.update({'#seeded': SEEDED, '#version': VERSION})
+    values.update({':seeded': True, ':one': 1})
+    get_table(TASK_STATS_TABLE).update_item(
+        Key={'user_id': user_id},
+        UpdateExpression=(
+            'SET ' + ', '.join(f'#{counter} = :{counter}' for counter in stats)
+            + ', #seeded = :seeded ADD #version :one'
+        ),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+def get_version(user_id):
+    """
+    Get a user's change marker with a single strongly consistent GetItem
+    
+    A consistent read guarantees a client sees its own writes invalidate
+    the ETags it holds.
+    
+    Args:
+        user_id: Owner of the tasks
+        
+    Returns:
+        int: Version of the user's tasks
+    """
+    stats_table = get_table(TASK_STATS_TABLE)
+    get_kwargs = {
+        'Key': {'user_id': user_id},
+        'ProjectionExpression': '#version',
+        'ExpressionAttributeNames': {'#version': VERSION},
+        'ConsistentRead': True
+    }
+    # Without an item no write was counted yet, and the first one seeds it
+    item = stats_table.get_item(**get_kwargs).get('Item') or {}
+    return int(item.get(VERSION, 0))
+
+def reconcile_stats(user_ids=None):
+    """
+    Compare stored counters with the Tasks table and fix the ones that drifted
+    
+    Args:
+        user_ids: Users to check; every user with tasks when omitted
+        
+    Returns:
+        dict: user_id to corrected counters, for the users that were fixed
+    """
+    if user_ids is None:
+        user_ids = scan_task_owners()
+    
+    stats_table = get_table(TASK_STATS_TABLE)
+    fixed = {}
+    for user_id in user_ids:
+        expected = count_tasks(user_id)
+        item = stats_table.get_item(Key={'user_id': user_id}).get('Item') or {}
+        stored = {counter: int(item.get(counter, 0)) for counter in COUNTERS}
+        if not item.get(SEEDED) or stored != expected:
+            store_stats(user_id, expected)
+            fixed[user_id] = expected
+    return fixed
+
+def scan_task_owners():
+    """
+    Collect the ids of every user that owns at least one task
+    
+    Returns:
+        set: user_id values found in the Tasks table
+    """
+    tasks_table = get_table(TASKS_TABLE)
+    scan_kwargs = {'ProjectionExpression': 'user_id'}
+    
+    user_ids = set()
+    while True:
+        response = tasks_table.scan(**scan_kwargs)
+        user_ids.update(item['user_id'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return user_ids
+
+if __name__ == '__main__':
+    # Run with `python -m src_backup.tasks.stats` to repair every user's counters
+    fixed = reconcile_stats()
+    print(f"Reconciled task stats for {len(fixed)} user(s).")
@@ -0,0 +1,51 @@
+from boto3.dynamodb.conditions import Key
+from ..db import get_table, TASK_TOMBSTONES_TABLE
+
+def deleted_key(deleted_at, task_id):
+    """
+    Build the sort key of a tombstone, "<deleted_at>#<task_id>"
+    
+    '#' sorts before the digits and '.' of a timestamp, so keys are in
+    (deleted_at, task_id) order even when a timestamp has no microseconds.
+    """
+    return f'{deleted_at}#{task_id}'
+
+def tombstone_item(user_id, tombstone):
+    """
+    Build the TaskTombstones item of a tombstone
+    
+    Args:
+        user_id: Owner of the task
+        tombstone: Record built by tasks.changes.new_tombstone
+        
+    Returns:
+        dict: Item keyed by user_id and deleted_key
+    """
+    return {
+        'user_id': user_id,
+        'deleted_key': deleted_key(tombstone['deleted_at'], tombstone['task_id']),
+        **tombstone
+    }
+
+def find_tombstones(user_id, since, limit):
+    """
+    Read the tasks a user deleted after a position, oldest first
+    
+    Args:
+        user_id: Owner of the tasks
+        since: (time, task_id) to read after, None to read every tombstone
+        limit: Maximum number of tombstones to return
+    
+    Returns:
+        list: Tombstones with task_id and deleted_at
+    """
+    key_condition = Key('user_id').eq(user_id)
+    if since:
+        key_condition &= Key('deleted_key').gt(deleted_key(*since))
+    query_kwargs = {
+        'KeyConditionExpression': key_condition,
+        'ProjectionExpression': 'task_id, deleted_at',
+        'Limit': limit
+    }
+    response = get_table(TASK_TOMBSTONES_TABLE).query(**query_kwargs)
+    return response.get('Items', [])
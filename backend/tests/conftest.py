@@ -0,0 +1,55 @@
+import json
+import os
+
+# Handlers read their settings at import time
+os.environ.setdefault('JWT_SECRET', 'test-secret')
+os.environ['STORAGE_BACKEND'] = 'dynamodb'
+os.environ['TASK_CACHE'] = 'false'
+os.environ['INVOCATION_METRICS'] = 'false'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ.pop('DYNAMODB_ENDPOINT', None)
+os.environ.pop('DYNAMODB_FAULT_RATE', None)
+
+import pytest
+from moto import mock_aws
+from src_backup import db, resilience, storage
+
+@pytest.fixture
+def dynamodb():
+    """
+    Fresh moto tables, client and resilience guards for one test
+    """
+    with mock_aws():
+        db.reset()
+        resilience.reset()
+        storage._storage = None
+        from src_backup.setup import create_dynamodb_tables
+        create_dynamodb_tables()
+        yield db.get_dynamodb().meta.client
+        db.reset()
+        resilience.reset()
+        storage._storage = None
+
+def call(handler, body=None, headers=None, path=None, query=None):
+    """
+    Invoke a Lambda handler with an API Gateway event
+    """
+    event = {
+        'headers': headers or {},
+        'body': json.dumps(body) if body is not None else None,
+        'pathParameters': path,
+        'queryStringParameters': query
+    }
+    return handler(event, None)
+
+@pytest.fixture
+def auth_headers(dynamodb):
+    """
+    Authorization header of a freshly registered user
+    """
+    from src_backup.auth import login, register
+    call(register.lambda_handler, {'username': 'tester', 'password': 'secret123', 'email': 'tester@example.com'})
+    response = call(login.lambda_handler, {'username': 'tester', 'password': 'secret123'})
+    return {'Authorization': f"Bearer {json.loads(response['body'])['token']}"}
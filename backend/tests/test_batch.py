@@ -0,0 +1,102 @@
+import json
+from conftest import call
+from src_backup.db import TASKS_TABLE
+from src_backup.tasks import batch_tasks, create_task, get_stats, get_tasks
+
+def batch(headers, *operations):
+    response = call(batch_tasks.lambda_handler, {'operations': list(operations)}, headers=headers)
+    return response['statusCode'], json.loads(response['body'])
+
+def operations(dynamodb):
+    """
+    Record the name of every DynamoDB call made from now on
+    """
+    called = []
+    dynamodb.meta.events.register('before-call.dynamodb', lambda model, **kwargs: called.append(model.name))
+    return called
+
+def task_batches(dynamodb):
+    """
+    Record the requests of every BatchWriteItem call to the Tasks table
+    """
+    sent = []
+    
+    def record(params, **kwargs):
+        requests = json.loads(params['body'])['RequestItems']
+        if TASKS_TABLE in requests:
+            sent.append(requests[TASKS_TABLE])
+    dynamodb.meta.events.register('before-call.dynamodb.BatchWriteItem', record)
+    return sent
+
+def new_task(headers, title, status='todo'):
+    response = call(create_task.lambda_handler, {'title': title, 'description': '', 'status': status}, headers=headers)
+    return json.loads(response['body'])
+
+def current_stats(headers):
+    return json.loads(call(get_stats.lambda_handler, headers=headers)['body'])
+
+def titles(headers):
+    body = json.loads(call(get_tasks.lambda_handler, headers=headers, query={'limit': '100'})['body'])
+    return [task['title'] for task in body['items']]
+
+def test_creates_are_batch_written_and_counted(dynamodb, auth_headers):
+    called = operations(dynamodb)
+    sent = task_batches(dynamodb)
+    
+    status, body = batch(auth_headers, *[{'action': 'create', 'title': f'Task {n:02}', 'status': 'todo'} for n in range(30)])
+    
+    assert status == 200
+    assert [result['status'] for result in body['results']] == [201] * 30
+    # Two BatchWriteItem chunks of at most 25, no transaction
+    assert [len(requests) for requests in sent] == [25, 5] and 'TransactWriteItems' not in called
+    assert titles(auth_headers) == [f'Task {n:02}' for n in range(30)]
+    assert current_stats(auth_headers) == {'total': 30, 'todo': 30, 'in_progress': 0, 'completed': 0}
+
+def test_unprocessed_creates_are_retried(dynamodb, auth_headers):
+    sent = task_batches(dynamodb)
+    
+    def throttle_first(parsed, **kwargs):
+        # Report the first write of the first call as unprocessed
+        if len(sent) == 1:
+            parsed['UnprocessedItems'] = {TASKS_TABLE: sent[0][:1]}
+    dynamodb.meta.events.register('after-call.dynamodb.BatchWriteItem', throttle_first)
+    
+    status, body = batch(auth_headers, {'action': 'create', 'title': 'First'}, {'action': 'create', 'title': 'Second'})
+    
+    assert status == 200
+    assert [result['status'] for result in body['results']] == [201, 201]
+    assert [len(requests) for requests in sent] == [2, 1]
+    assert titles(auth_headers) == ['First', 'Second']
+
+def test_updates_and_deletes_report_one_result_each(auth_headers):
+    done = new_task(auth_headers, 'Finish')
+    removed = new_task(auth_headers, 'Remove', status='in_progress')
+    
+    status, body = batch(
+        auth_headers,
+        {'action': 'update', 'task_id': done['task_id'], 'status': 'completed'},
+        {'action': 'delete', 'task_id': removed['task_id']},
+        {'action': 'delete', 'task_id': 'missing'},
+        {'action': 'update', 'task_id': done['task_id'], 'title': 'Again'},
+        {'action': 'update', 'task_id': removed['task_id'], 'status': 'unknown'},
+        {'action': 'archive', 'task_id': done['task_id']},
+    )
+    
+    assert status == 200
+    results = body['results']
+    assert [result['status'] for result in results] == [200, 204, 404, 400, 400, 400]
+    assert results[0]['task']['status'] == 'completed'
+    assert results[3]['message'] == 'Duplicate task ID in batch'
+    assert titles(auth_headers) == ['Finish']
+    assert current_stats(auth_headers) == {'total': 1, 'todo': 0, 'in_progress': 0, 'completed': 1}
+
+def test_batch_is_validated_like_the_single_item_handlers(auth_headers):
+    status, body = batch(auth_headers, {'action': 'create', 'title': ''}, {'action': 'update', 'title': 'No ID'})
+    
+    assert status == 200
+    assert [result['status'] for result in body['results']] == [400, 400]
+    assert body['results'][1]['message'] == 'Task ID is required'
+    assert titles(auth_headers) == []
+    
+    status, _ = batch(auth_headers)
+    assert status == 400
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+import pytest
+from conftest import call
+from src_backup import bulk
+from src_backup.db import get_table, TASKS_TABLE
+from src_backup.tasks import create_task
+
+def new_tasks(headers, count):
+    for n in range(count):
+        call(create_task.lambda_handler, {'title': f'Task {n}', 'status': 'todo'}, headers=headers)
+
+def stored_tasks():
+    return sorted(get_table(TASKS_TABLE).scan()['Items'], key=lambda task: task['task_id'])
+
+def clear_tasks():
+    with get_table(TASKS_TABLE).batch_writer() as writer:
+        for task in stored_tasks():
+            writer.delete_item(Key={'user_id': task['user_id'], 'task_id': task['task_id']})
+
+def exported_items(output_dir):
+    items = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(bulk.EXPORT_SUFFIX):
+            with gzip.open(os.path.join(output_dir, name), 'rt', encoding='utf-8') as source:
+                items.extend(json.loads(line)['Item'] for line in source)
+    return items
+
+def fail_call(dynamodb, operation, after):
+    """
+    Make every call of an operation fail once it was made a number of times
+    """
+    calls = []
+    
+    def fail(**kwargs):
+        calls.append(operation)
+        if len(calls) > after:
+            raise ConnectionError(f'{operation} interrupted')
+    dynamodb.meta.events.register(f'before-call.dynamodb.{operation}', fail, unique_id='fail-call')
+    return lambda: dynamodb.meta.events.unregister(f'before-call.dynamodb.{operation}', unique_id='fail-call')
+
+def test_export_and_import_round_trip(auth_headers, tmp_path):
+    new_tasks(auth_headers, 5)
+    tasks = stored_tasks()
+    
+    assert bulk.export_table(TASKS_TABLE, str(tmp_path), segments=2, workers=2, page_size=2) == 5
+    clear_tasks()
+    
+    assert bulk.import_table(TASKS_TABLE, str(tmp_path), workers=2, page_size=2) == 5
+    assert stored_tasks() == tasks
+
+def test_resumed_export_cuts_the_unsaved_tail(dynamodb, auth_headers, tmp_path):
+    new_tasks(auth_headers, 5)
+    restore = fail_call(dynamodb, 'Scan', after=2)
+    with pytest.raises(RuntimeError):
+        bulk.export_table(TASKS_TABLE, str(tmp_path), segments=1, workers=1, page_size=2)
+    restore()
+    # Bytes written after the last checkpoint, e.g. a page cut off mid-write
+    path = os.path.join(str(tmp_path), f'{TASKS_TABLE}-0000{bulk.EXPORT_SUFFIX}')
+    with open(path, 'ab') as output:
+        output.write(b'\x1f\x8b partial page')
+    
+    assert bulk.export_table(TASKS_TABLE, str(tmp_path), segments=1, workers=1, page_size=2) == 5
+    
+    task_ids = sorted(item['task_id']['S'] for item in exported_items(str(tmp_path)))
+    assert task_ids == [task['task_id'] for task in stored_tasks()]
+
+def test_resumed_import_skips_the_saved_lines(dynamodb, auth_headers, tmp_path):
+    new_tasks(auth_headers, 5)
+    tasks = stored_tasks()
+    bulk.export_table(TASKS_TABLE, str(tmp_path), segments=1, workers=1)
+    clear_tasks()
+    
+    restore = fail_call(dynamodb, 'BatchWriteItem', after=1)
+    with pytest.raises(RuntimeError):
+        bulk.import_table(TASKS_TABLE, str(tmp_path), workers=1, page_size=2)
+    restore()
+    assert len(stored_tasks()) == 2
+    
+    written = []
+    dynamodb.meta.events.register(
+        'before-call.dynamodb.BatchWriteItem',
+        lambda params, **kwargs: written.extend(json.loads(params['body'])['RequestItems'][TASKS_TABLE])
+    )
+    assert bulk.import_table(TASKS_TABLE, str(tmp_path), workers=1, page_size=2) == 5
+    assert len(written) == 3
+    assert stored_tasks() == tasks
+
+def test_checkpoint_of_another_run_is_refused(auth_headers, tmp_path):
+    new_tasks(auth_headers, 1)
+    bulk.export_table(TASKS_TABLE, str(tmp_path), segments=1, workers=1)
+    
+    with pytest.raises(ValueError):
+        bulk.export_table(TASKS_TABLE, str(tmp_path), segments=2, workers=1)
@@ -0,0 +1,140 @@
+from src_backup.storage import run
+from src_backup.storage.cache import CachedTaskRepository, LocalCache, SharedCache
+from src_backup.storage.memory import MemoryTaskRepository
+from src_backup.tasks.model import new_task
+
+class FakeRedis:
+    """
+    The calls of redis.asyncio's client used by the shared tier, in memory
+    """
+    
+    def __init__(self):
+        self.values = {}
+    
+    async def get(self, key):
+        return self.values.get(key)
+    
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode('utf-8')
+        return True
+    
+    async def pexpire(self, key, px):
+        return key in self.values
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+    
+    async def execute(self):
+        return [await getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+class RacingTasks(MemoryTaskRepository):
+    """
+    Store that runs a write of another container while a task is being read
+    """
+    
+    race = None
+    
+    async def get_task(self, user_id, task_id, fields=None):
+        task = await super().get_task(user_id, task_id, fields)
+        race, self.race = self.race, None
+        if race is not None:
+            await race()
+        return task
+
+def containers(count, shared=None):
+    """
+    Cached repositories of separate containers over one store
+    """
+    tasks = RacingTasks()
+    return tasks, [CachedTaskRepository(tasks, LocalCache(16, 60), shared) for _ in range(count)]
+
+def shared_containers(count):
+    """
+    Containers sharing one store and one shared tier
+    """
+    return containers(count, SharedCache(FakeRedis(), 60))
+
+def test_task_written_elsewhere_is_never_served_stale():
+    tasks, (reader, writer) = containers(2)
+    task = new_task('user', 'Before', '', 'todo')
+    run(tasks.create_task(task))
+    
+    assert run(reader.get_task('user', task['task_id']))['title'] == 'Before'
+    run(writer.update_task('user', task['task_id'], {'title': 'After'}))
+    
+    assert run(reader.get_task('user', task['task_id']))['title'] == 'After'
+
+def test_listing_is_cached_per_version():
+    tasks, (reader, writer) = containers(2)
+    run(tasks.create_task(new_task('user', 'First', '', 'todo')))
+    version = run(reader.get_version('user'))
+    
+    first, _ = run(reader.list_tasks('user', 10, version=version))
+    run(reader.list_tasks('user', 10, version=version))
+    assert reader.stats.snapshot()['local_hits'] == 1
+    
+    run(writer.create_task(new_task('user', 'Second', '', 'todo')))
+    items, _ = run(reader.list_tasks('user', 10, version=run(reader.get_version('user'))))
+    assert len(first) == 1 and len(items) == 2
+
+def test_shared_tier_serves_tasks_until_a_write_elsewhere():
+    tasks, (reader, writer) = shared_containers(2)
+    task = new_task('user', 'Before', '', 'todo')
+    run(tasks.create_task(task))
+    
+    run(writer.get_task('user', task['task_id']))
+    assert run(reader.get_task('user', task['task_id']))['title'] == 'Before'
+    assert reader.stats.snapshot()['shared_hits'] == 1
+    
+    run(writer.update_task('user', task['task_id'], {'title': 'After'}))
+    assert run(reader.get_task('user', task['task_id']))['title'] == 'After'
+    
+    run(writer.delete_task('user', task['task_id']))
+    assert run(reader.get_task('user', task['task_id'])) is None
+
+def test_task_read_before_a_write_elsewhere_is_not_served_again():
+    tasks, (reader, writer, other) = shared_containers(3)
+    task = new_task('user', 'Before', '', 'todo')
+    run(tasks.create_task(task))
+    
+    async def write():
+        await writer.update_task('user', task['task_id'], {'title': 'After'})
+    tasks.race = write
+    # The read raced the write, so it returns the old title ...
+    assert run(reader.get_task('user', task['task_id']))['title'] == 'Before'
+    
+    # ... but no container is served it afterwards
+    assert run(other.get_task('user', task['task_id']))['title'] == 'After'
+    assert run(reader.get_task('user', task['task_id']))['title'] == 'After'
+
+def test_batch_elsewhere_invalidates_only_its_tasks_and_the_listings():
+    tasks, (reader, writer) = shared_containers(2)
+    kept, changed = new_task('user', 'Kept', '', 'todo'), new_task('user', 'Changed', '', 'todo')
+    run(tasks.create_tasks([kept, changed]))
+    for task in (kept, changed):
+        run(reader.get_task('user', task['task_id']))
+    run(reader.list_tasks('user', 10))
+    
+    run(writer.apply_changes('user', [('update', changed['task_id'], {'status': 'completed'})]))
+    
+    assert run(reader.get_task('user', kept['task_id']))['title'] == 'Kept'
+    assert reader.stats.snapshot()['shared_hits'] == 1
+    assert run(reader.get_task('user', changed['task_id']))['status'] == 'completed'
+    items, _ = run(reader.list_tasks('user', 10))
+    assert [task['status'] for task in items] == ['todo', 'completed']
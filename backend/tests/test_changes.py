@@ -0,0 +1,65 @@
+import json
+import pytest
+from conftest import call
+from src_backup.db import get_table, TASK_TOMBSTONES_TABLE
+from src_backup.tasks import batch_tasks, changes, create_task, get_changes
+
+def new_task(headers, title):
+    response = call(create_task.lambda_handler, {'title': title, 'status': 'todo'}, headers=headers)
+    return json.loads(response['body'])['task_id']
+
+def sync(headers, **query):
+    response = call(get_changes.lambda_handler, headers=headers, query={k: str(v) for k, v in query.items()} or None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+@pytest.fixture
+def settled(monkeypatch):
+    """
+    Treat every write as settled, so watermarks follow the entries
+    """
+    monkeypatch.setattr(changes, 'CHANGES_SETTLE_SECONDS', 0)
+
+def test_batch_delete_writes_tombstones_with_the_deletes(auth_headers):
+    task_ids = [new_task(auth_headers, title) for title in ('First', 'Second', 'Kept')]
+    watermark = sync(auth_headers)['watermark']
+    
+    response = call(batch_tasks.lambda_handler, {'operations': [
+        {'action': 'delete', 'task_id': task_ids[0]},
+        {'action': 'delete', 'task_id': task_ids[1]},
+        {'action': 'delete', 'task_id': 'missing'}
+    ]}, headers=auth_headers)
+    
+    statuses = [result['status'] for result in json.loads(response['body'])['results']]
+    assert statuses == [204, 204, 404]
+    tombstones = get_table(TASK_TOMBSTONES_TABLE).scan()['Items']
+    assert sorted(item['task_id'] for item in tombstones) == sorted(task_ids[:2])
+    assert [item['task_id'] for item in sync(auth_headers, since=watermark)['deleted']] == task_ids[:2]
+
+def test_paged_changes_feed_returns_every_task_once(auth_headers, settled):
+    task_ids = [new_task(auth_headers, f'Task {index}') for index in range(5)]
+    
+    seen = []
+    pages = []
+    body = sync(auth_headers, limit=2)
+    while True:
+        seen.extend(task['task_id'] for task in body['changes'])
+        pages.append(body['has_more'])
+        if not body['has_more']:
+            break
+        body = sync(auth_headers, limit=2, since=body['watermark'])
+    
+    assert seen == task_ids
+    assert pages == [True, True, False]
+    assert sync(auth_headers, since=body['watermark'])['changes'] == []
+
+def test_watermark_stays_before_unsettled_writes(auth_headers):
+    task_ids = [new_task(auth_headers, f'Task {index}') for index in range(3)]
+    
+    body = sync(auth_headers, limit=1)
+    
+    # The page reaches into the settle window, so it is the last one and the
+    # next sync sends the unsettled writes again
+    assert body['has_more'] is False
+    again = sync(auth_headers, since=body['watermark'])
+    assert [task['task_id'] for task in again['changes']] == task_ids
@@ -0,0 +1,100 @@
+import base64
+import json
+import uuid
+import pytest
+from conftest import call
+from src_backup.db import TASKS_TABLE
+from src_backup.resilience import FaultInjector
+from src_backup.tasks import create_task, get_tasks, update_task
+from src_backup.tasks.model import migrated_task_id
+from src_backup.tasks.pagination import encode_token
+
+def list_tasks(headers, **query):
+    response = call(get_tasks.lambda_handler, headers=headers, query={k: str(v) for k, v in query.items()})
+    return response['statusCode'], json.loads(response['body'])
+
+def first_cursor(headers, **query):
+    """
+    Create a few tasks and return the cursor after the first one
+    """
+    for title in ('First', 'Second', 'Third'):
+        call(create_task.lambda_handler, {'title': title, 'status': 'todo'}, headers=headers)
+    status, body = list_tasks(headers, limit=1, **query)
+    assert status == 200 and body['next_token']
+    return body['next_token']
+
+def edited(cursor, **changes):
+    """
+    Rewrite a cursor's key the way a client could
+    """
+    key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    key.update(changes)
+    return encode_token({name: value for name, value in key.items() if value is not None})
+
+def test_cursor_continues_the_listing(auth_headers):
+    cursor = first_cursor(auth_headers)
+    
+    status, body = list_tasks(auth_headers, limit=5, next_token=cursor)
+    
+    assert status == 200
+    assert [task['title'] for task in body['items']] == ['Second', 'Third']
+
+@pytest.mark.parametrize('changes', [
+    {'task_id': 123},
+    {'updated_at': ['2024-01-01']},
+    {'updated_at': None},
+    {'extra': 'value'},
+])
+def test_edited_cursor_is_rejected(auth_headers, changes):
+    cursor = first_cursor(auth_headers, sort='updated_at')
+    
+    status, body = list_tasks(auth_headers, sort='updated_at', next_token=edited(cursor, **changes))
+    
+    assert status == 400
+    assert body['message'] == 'Invalid next_token'
+
+def test_cursor_of_another_status_is_rejected(auth_headers):
+    cursor = first_cursor(auth_headers, status='todo')
+    
+    status, body = list_tasks(auth_headers, status='completed', next_token=cursor)
+    
+    assert status == 400
+    assert body['message'] == 'Invalid next_token'
+
+def test_start_key_refused_by_dynamodb_is_an_invalid_cursor(dynamodb, auth_headers):
+    cursor = first_cursor(auth_headers)
+    FaultInjector(1.0, code='ValidationException', tables=[TASKS_TABLE]).install(dynamodb)
+    
+    status, body = list_tasks(auth_headers, next_token=cursor)
+    
+    assert status == 400
+    assert body['message'] == 'Invalid next_token'
+
+def test_garbage_cursor_is_rejected(auth_headers):
+    status, _ = list_tasks(auth_headers, next_token='not-a-cursor')
+    
+    assert status == 400
+
+def test_status_listing_by_update_time_reads_no_other_status(dynamodb, auth_headers):
+    for title in ('Old', 'Open', 'New'):
+        call(create_task.lambda_handler, {'title': title, 'status': 'todo'}, headers=auth_headers)
+    _, body = list_tasks(auth_headers)
+    ids = {task['title']: task['task_id'] for task in body['items']}
+    for title in ('New', 'Old'):
+        call(update_task.lambda_handler, {'status': 'completed'}, headers=auth_headers, path={'id': ids[title]})
+    queries = []
+    dynamodb.meta.events.register('before-call.dynamodb.Query', lambda params, **kwargs: queries.append(params))
+    
+    status, body = list_tasks(auth_headers, status='completed', sort='updated_at', order='desc')
+    
+    assert status == 200
+    assert [task['title'] for task in body['items']] == ['Old', 'New']
+    assert len(queries) == 1 and 'FilterExpression' not in queries[0]
+
+def test_migrated_task_ids_follow_creation_order():
+    created = ['2023-05-01T10:00:00', '2023-05-01T10:00:01', '2024-01-01T00:00:00']
+    migrated = [migrated_task_id(str(uuid.uuid4()), created_at) for created_at in created]
+    
+    assert migrated == sorted(migrated)
+    assert all(uuid.UUID(task_id).version == 7 for task_id in migrated)
+    assert [migrated_task_id(task_id, '2020-01-01T00:00:00') for task_id in migrated] == migrated
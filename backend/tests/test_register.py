@@ -0,0 +1,46 @@
+import json
+from conftest import call
+from src_backup.auth import login, register
+from src_backup.db import get_table, USERNAMES_TABLE, USERS_TABLE
+
+def register_user(username, password='secret123'):
+    response = call(register.lambda_handler, {'username': username, 'password': password})
+    return response['statusCode'], json.loads(response['body'])
+
+def operations(dynamodb):
+    """
+    Record the name of every DynamoDB call made from now on
+    """
+    called = []
+    dynamodb.meta.events.register('before-call.dynamodb', lambda model, **kwargs: called.append(model.name))
+    return called
+
+def test_registration_is_one_transaction(dynamodb):
+    called = operations(dynamodb)
+    
+    status, body = register_user('alice')
+    
+    assert status == 201 and body['username'] == 'alice'
+    assert called == ['TransactWriteItems']
+    claim = get_table(USERNAMES_TABLE).get_item(Key={'username': 'alice'})['Item']
+    assert claim['user_id'] == body['user_id']
+    response = call(login.lambda_handler, {'username': 'alice', 'password': 'secret123'})
+    assert response['statusCode'] == 200
+
+def test_taken_username_is_rejected_by_the_transaction(dynamodb):
+    _, first = register_user('alice')
+    called = operations(dynamodb)
+    
+    status, body = register_user('alice', password='other-secret')
+    
+    assert status == 400
+    assert body['message'] == 'Username already exists'
+    assert called == ['TransactWriteItems']
+    users = get_table(USERS_TABLE).scan()['Items']
+    assert [user['user_id'] for user in users] == [first['user_id']]
+
+def test_username_and_password_are_required(dynamodb):
+    status, body = register_user('alice', password='')
+    
+    assert status == 400
+    assert body['message'] == 'Username and password are required'
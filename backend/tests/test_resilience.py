@@ -0,0 +1,163 @@
+import time
+import pytest
+from botocore.exceptions import ClientError
+from conftest import call
+from src_backup import resilience
+from src_backup.db import get_table, TASKS_TABLE, TASK_STATS_TABLE
+from src_backup.resilience import CircuitBreaker, FaultInjector, TokenBucket, Unavailable
+
+MISSING_TASK = '00000000-0000-0000-0000-000000000000'
+
+class FailFirst(FaultInjector):
+    """
+    Fail the first attempts of a table's calls, then let them through
+    """
+    
+    def __init__(self, failures, tables):
+        super().__init__(1.0, tables=tables)
+        self.failures = failures
+    
+    def __call__(self, request, **kwargs):
+        if self.injected >= self.failures:
+            return None
+        return super().__call__(request, **kwargs)
+
+def get_missing_task():
+    return get_table(TASKS_TABLE).get_item(Key={'user_id': 'nobody', 'task_id': MISSING_TASK})
+
+def use_breaker(table, threshold, cooldown):
+    breaker = CircuitBreaker(threshold, cooldown)
+    resilience._breakers[table] = breaker
+    return breaker
+
+def test_throttled_call_is_attempted_max_attempts_times(dynamodb):
+    injector = FaultInjector(1.0, tables=[TASKS_TABLE]).install(dynamodb)
+    
+    with pytest.raises(ClientError) as raised:
+        get_missing_task()
+    
+    assert resilience.is_throttling_error(raised.value)
+    assert injector.injected == resilience.MAX_ATTEMPTS
+
+def test_throttled_call_succeeds_once_capacity_is_back(dynamodb):
+    injector = FailFirst(resilience.MAX_ATTEMPTS - 1, [TASKS_TABLE]).install(dynamodb)
+    
+    response = get_missing_task()
+    
+    assert 'Item' not in response
+    assert response['ResponseMetadata']['RetryAttempts'] == resilience.MAX_ATTEMPTS - 1
+    assert injector.injected == resilience.MAX_ATTEMPTS - 1
+
+def test_other_errors_are_not_retried_as_throttling(dynamodb):
+    injector = FaultInjector(1.0, code='ValidationException', tables=[TASKS_TABLE]).install(dynamodb)
+    
+    with pytest.raises(ClientError):
+        get_missing_task()
+    
+    assert injector.injected == 1
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(resilience, 'THROTTLE_MAX_DELAY', 0.2)
+    assert all(0 <= resilience.backoff_delay(attempt) <= 0.2 for attempt in range(1, 20))
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() > 0
+    
+    time.sleep(0.06)
+    assert breaker.allow() == 0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial call at a time
+    assert breaker.allow() > 0
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() == 0
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow() == 0
+    
+    breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() > 0
+
+def test_open_circuit_sheds_calls_until_a_trial_succeeds(dynamodb):
+    breaker = use_breaker(TASKS_TABLE, threshold=resilience.MAX_ATTEMPTS, cooldown=0.2)
+    injector = FaultInjector(1.0, tables=[TASKS_TABLE]).install(dynamodb)
+    
+    with pytest.raises(ClientError):
+        get_missing_task()
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    # Shed before anything is sent
+    with pytest.raises(Unavailable) as raised:
+        get_missing_task()
+    assert raised.value.reason == 'circuit_open'
+    assert injector.injected == resilience.MAX_ATTEMPTS
+    
+    injector.rate = 0
+    time.sleep(0.25)
+    get_missing_task()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_token_bucket_refuses_tokens_beyond_the_wait():
+    bucket = TokenBucket(rate=10, capacity=2)
+    
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.1, abs=0.02)
+    
+    time.sleep(0.1)
+    assert bucket.try_acquire() == 0
+
+def test_rate_limit_sheds_calls_over_the_rate(dynamodb, monkeypatch):
+    monkeypatch.setattr(resilience, 'RATE_LIMIT', 1)
+    monkeypatch.setattr(resilience, 'RATE_LIMIT_WAIT', 0)
+    
+    get_missing_task()
+    with pytest.raises(Unavailable) as raised:
+        get_missing_task()
+    
+    assert raised.value.table == TASKS_TABLE
+    assert raised.value.reason == 'rate_limited'
+    # Other tables have their own bucket
+    get_table(TASK_STATS_TABLE).get_item(Key={'user_id': 'nobody'})
+
+def test_throttled_request_gets_503_with_retry_after(dynamodb, auth_headers):
+    from src_backup.tasks import get_task
+    FaultInjector(1.0, tables=[TASKS_TABLE]).install(dynamodb)
+    
+    response = call(get_task.lambda_handler, headers=auth_headers, path={'id': MISSING_TASK})
+    
+    assert response['statusCode'] == 503
+    assert response['headers']['Retry-After'] == '1'
+
+def test_retry_after_comes_from_the_throttled_table(dynamodb, auth_headers):
+    from src_backup.tasks import get_task
+    use_breaker(TASKS_TABLE, threshold=resilience.MAX_ATTEMPTS, cooldown=5)
+    # Another table's circuit is open for longer
+    use_breaker(TASK_STATS_TABLE, threshold=1, cooldown=60).record_failure()
+    FaultInjector(1.0, tables=[TASKS_TABLE]).install(dynamodb)
+    
+    response = call(get_task.lambda_handler, headers=auth_headers, path={'id': MISSING_TASK})
+    
+    assert response['statusCode'] == 503
+    assert response['headers']['Retry-After'] == '5'
+
+def test_shed_request_gets_503_with_retry_after(dynamodb, auth_headers):
+    from src_backup.tasks import get_task
+    use_breaker(TASKS_TABLE, threshold=1, cooldown=30).record_failure()
+    
+    response = call(get_task.lambda_handler, headers=auth_headers, path={'id': MISSING_TASK})
+    
+    assert response['statusCode'] == 503
+    assert 29 <= int(response['headers']['Retry-After']) <= 30
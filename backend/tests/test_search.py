@@ -0,0 +1,31 @@
+import json
+from conftest import call
+from src_backup.tasks import create_task, search_index, search_tasks
+
+def new_task(headers, title, description=''):
+    call(create_task.lambda_handler, {'title': title, 'description': description, 'status': 'todo'}, headers=headers)
+
+def search(headers, q):
+    response = call(search_tasks.lambda_handler, headers=headers, query={'q': q})
+    body = json.loads(response['body'])
+    return [task['title'] for task in body['items']], body['truncated']
+
+def test_prefix_matches_rank_titles_first(auth_headers):
+    new_task(auth_headers, 'Groceries', 'Milk and planning')
+    new_task(auth_headers, 'Plan the trip')
+    new_task(auth_headers, 'Unrelated')
+    
+    assert search(auth_headers, 'plan') == (['Plan the trip', 'Groceries'], False)
+
+def test_search_over_the_postings_limit_is_truncated(monkeypatch, auth_headers):
+    monkeypatch.setattr(search_index, 'MAX_POSTINGS_PER_TOKEN', 2)
+    for title in ('Plan one', 'Plan two', 'Plan three', 'Planet'):
+        new_task(auth_headers, title)
+    
+    titles, truncated = search(auth_headers, 'pla')
+    
+    assert truncated is True
+    assert len(titles) == 2
+    # A longer word matching at most the limit is complete
+    assert search(auth_headers, 'planet') == (['Planet'], False)
+    assert search(auth_headers, 'two') == (['Plan two'], False)
@@ -0,0 +1,49 @@
+import json
+from conftest import call
+from src_backup.db import get_table, TASKS_TABLE, TASK_STATS_TABLE
+from src_backup.tasks import create_task, get_stats
+from src_backup.tasks.indexes import with_index_keys
+from src_backup.tasks.model import new_task
+
+def stats_user():
+    """
+    Get the id of the only user with a stats item
+    """
+    items = get_table(TASK_STATS_TABLE).scan()['Items']
+    assert len(items) == 1
+    return items[0]['user_id']
+
+def store_legacy_task(user_id, title, status):
+    """
+    Put a task the way tasks stored before the counters existed were
+    """
+    get_table(TASKS_TABLE).put_item(Item=with_index_keys(new_task(user_id, title, '', status)))
+
+def current_stats(headers):
+    response = call(get_stats.lambda_handler, headers=headers)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+def test_registration_starts_seeded_counters(auth_headers):
+    call(create_task.lambda_handler, {'title': 'First', 'status': 'todo'}, headers=auth_headers)
+    
+    assert current_stats(auth_headers) == {'total': 1, 'todo': 1, 'in_progress': 0, 'completed': 0}
+
+def test_first_write_of_a_legacy_user_counts_older_tasks(auth_headers):
+    user_id = stats_user()
+    get_table(TASK_STATS_TABLE).delete_item(Key={'user_id': user_id})
+    store_legacy_task(user_id, 'Legacy', 'completed')
+    
+    response = call(create_task.lambda_handler, {'title': 'New', 'status': 'todo'}, headers=auth_headers)
+    
+    assert response['statusCode'] == 201
+    assert current_stats(auth_headers) == {'total': 2, 'todo': 1, 'in_progress': 0, 'completed': 1}
+
+def test_unseeded_partial_counters_are_recounted(auth_headers):
+    user_id = stats_user()
+    # What an unconditioned ADD left behind for a legacy user's first write
+    get_table(TASK_STATS_TABLE).put_item(Item={'user_id': user_id, 'version': 1, 'total': 1, 'todo': 1})
+    store_legacy_task(user_id, 'Legacy', 'in_progress')
+    store_legacy_task(user_id, 'New', 'todo')
+    
+    assert current_stats(auth_headers) == {'total': 2, 'todo': 1, 'in_progress': 1, 'completed': 0}
@@ -0,0 +1,76 @@
+import json
+from conftest import call
+from src_backup.auth import login, register
+from src_backup.db import get_table, TASK_SEARCH_TABLE
+from src_backup.tasks import create_task, delete_task, get_stats, search_tasks, update_task
+
+def register_user(username):
+    """
+    Authorization header of another registered user
+    """
+    call(register.lambda_handler, {'username': username, 'password': 'secret123', 'email': f'{username}@example.com'})
+    response = call(login.lambda_handler, {'username': username, 'password': 'secret123'})
+    return {'Authorization': f"Bearer {json.loads(response['body'])['token']}"}
+
+def operations(dynamodb):
+    """
+    Record the name of every DynamoDB call made from now on
+    """
+    called = []
+    dynamodb.meta.events.register('before-call.dynamodb', lambda model, **kwargs: called.append(model.name))
+    return called
+
+def new_task(headers, title, status='todo'):
+    response = call(create_task.lambda_handler, {'title': title, 'description': '', 'status': status}, headers=headers)
+    return json.loads(response['body'])
+
+def current_stats(headers):
+    return json.loads(call(get_stats.lambda_handler, headers=headers)['body'])
+
+def search(headers, q):
+    body = json.loads(call(search_tasks.lambda_handler, headers=headers, query={'q': q})['body'])
+    return [task['title'] for task in body['items']]
+
+def test_update_of_another_users_task_is_404_without_a_read(dynamodb, auth_headers):
+    task = new_task(auth_headers, 'Mine')
+    other_headers = register_user('other')
+    called = operations(dynamodb)
+    
+    response = call(update_task.lambda_handler, {'title': 'Theirs'}, headers=other_headers, path={'id': task['task_id']})
+    
+    assert response['statusCode'] == 404
+    assert 'GetItem' not in called and 'TransactWriteItems' in called
+
+def test_delete_of_a_missing_task_is_404(auth_headers):
+    response = call(delete_task.lambda_handler, headers=auth_headers, path={'id': 'missing'})
+    
+    assert response['statusCode'] == 404
+
+def test_status_change_returns_the_stored_task_and_moves_the_counters(auth_headers):
+    task = new_task(auth_headers, 'Write report')
+    
+    response = call(update_task.lambda_handler, {'status': 'completed'}, headers=auth_headers, path={'id': task['task_id']})
+    
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['status'] == 'completed'
+    assert body['title'] == 'Write report' and body['created_at'] == task['created_at']
+    assert current_stats(auth_headers) == {'total': 1, 'todo': 0, 'in_progress': 0, 'completed': 1}
+
+def test_delete_counts_the_status_it_found(auth_headers):
+    new_task(auth_headers, 'Kept', status='completed')
+    removed = new_task(auth_headers, 'Removed', status='in_progress')
+    
+    response = call(delete_task.lambda_handler, headers=auth_headers, path={'id': removed['task_id']})
+    
+    assert response['statusCode'] == 204
+    assert current_stats(auth_headers) == {'total': 1, 'todo': 0, 'in_progress': 0, 'completed': 1}
+
+def test_search_drops_postings_of_replaced_text(auth_headers):
+    task = new_task(auth_headers, 'Alpha plan')
+    call(update_task.lambda_handler, {'title': 'Beta plan'}, headers=auth_headers, path={'id': task['task_id']})
+    
+    assert search(auth_headers, 'alpha') == []
+    assert search(auth_headers, 'beta') == ['Beta plan']
+    terms = [item['term'] for item in get_table(TASK_SEARCH_TABLE).scan()['Items']]
+    assert not any(term.startswith('alpha#') for term in terms)
@@ -20,6 +20,11 @@ export interface TaskStats {
   completed: number;
 }
 
+export interface TaskPage {
+  items: Task[];
+  next_token: string | null;
+}
+
 interface ErrorResponse {
   message?: string;
 }
@@ -33,8 +38,17 @@ export const useTaskService = () => {
     setError(null);
     
     try {
-      const response = await axios.get('/tasks');
-      return response.data;
+      // Follow the cursor so each response stays bounded
+      const tasks: Task[] = [];
+      let nextToken: string | null = null;
+      do {
+        const response: { data: TaskPage } = await axios.get('/tasks', {
+          params: nextToken ? { next_token: nextToken } : undefined,
+        });
+        tasks.push(...response.data.items);
+        nextToken = response.data.next_token;
+      } while (nextToken);
+      return tasks;
     } catch (err) {
       const error = err as AxiosError<ErrorResponse>;
       const errorMessage = error.response?.data?.message || 'Failed to fetch tasks';